@@ -1,9 +1,7 @@
 import os
 import sys
-import json
 import requests
 import pandas as pd
-import time
 from datetime import datetime
 from typing import List, Dict, Any
 
@@ -14,6 +12,15 @@ try:
 except ImportError:
     TOKEN = "YOUR_FALLBACK_TOKEN_HERE"
     print("⚠️ Aviso: TOKEN não encontrado, usando fallback.")
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("duplicata-pagar")
 
 # === CONFIGURAÇÕES ===
 BASE_URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/accounts-payable/v2"
@@ -63,7 +70,7 @@ def fetch_all_duplicates(start_date: str,
     while True:
         payload = make_payload(page, page_size, branch_codes, start_date, end_date)
         try:
-            response = requests.post(f"{BASE_URL}/duplicates/search", headers=HEADERS, json=payload, timeout=120)
+            response = rate_limited(session.post, f"{BASE_URL}/duplicates/search", headers=HEADERS, json=payload, timeout=120)
             response.raise_for_status()
             data = response.json()
 
@@ -79,7 +86,6 @@ def fetch_all_duplicates(start_date: str,
                 break
 
             page += 1
-            time.sleep(0.3)
 
         except requests.RequestException as e:
             log(f"❌ Erro ao buscar página {page}: {e}")
@@ -143,10 +149,7 @@ if __name__ == "__main__":
 
     duplicates = fetch_all_duplicates(START_DATE, END_DATE, BRANCH_CODES)
 
-    debug_file = f"debug_duplicates_{datetime.now():%Y%m%d_%H%M%S}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(duplicates, f, ensure_ascii=False, indent=2)
-    log(f"💾 JSON bruto salvo: {debug_file}")
+    debug.capture(duplicates, tag="duplicates")
 
     if not duplicates:
         log("⚠️ Nenhuma duplicata encontrada.")
@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -8,6 +7,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-dados-boleto")
 
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/accounts-receivable/v2/invoices-print/search"
@@ -39,7 +46,7 @@ payload = {
 
 # === REQUISIÇÃO POST ===
 try:
-    response = requests.post(URL, headers=headers, json=payload, timeout=120)
+    response = session.post(URL, headers=headers, json=payload, timeout=120)
 except requests.exceptions.RequestException as e:
     print(f"❌ Erro na conexão com a API: {e}")
     sys.exit(1)
@@ -58,10 +65,7 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === SALVA DEBUG ===
-debug_file = f"debug_invoices_print_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="invoices_print")
 
 # === PROCESSA DADOS ===
 items = data.get("items", [])
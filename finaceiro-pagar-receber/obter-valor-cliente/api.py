@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -8,6 +7,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-valor-cliente")
 
 # === FUNÇÃO AUXILIAR ===
 def safe_list(value):
@@ -59,7 +66,7 @@ payload = {
 
 # === REQUISIÇÃO POST ===
 try:
-    response = requests.post(URL, headers=headers, json=payload, timeout=90)
+    response = session.post(URL, headers=headers, json=payload, timeout=90)
 except requests.exceptions.RequestException as e:
     print(f"❌ Erro na conexão com a API: {e}")
     sys.exit(1)
@@ -78,10 +85,7 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === SALVA DEBUG ===
-debug_file = f"debug_customer_financial_balance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="customer_financial_balance")
 
 # === PROCESSA DADOS ===
 items = data.get("items", [])
@@ -8,6 +8,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Consulta-duplicata")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/accounts-payable/v2/duplicates/search"
@@ -60,7 +68,7 @@ while True:
     print(f"\n📄 Consultando página {page}…")
 
     try:
-        response = requests.post(URL, headers=headers, json=payload, timeout=60)
+        response = session.post(URL, headers=headers, json=payload, timeout=60)
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro na conexão: {e}")
         sys.exit(1)
@@ -86,17 +94,15 @@ while True:
         sys.exit(1)
 
     # === SALVA DEBUG JSON (POR PÁGINA, NA RAIZ) ===
-    debug_file = f"debug_duplicates_page_{page}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Debug salvo em: {debug_file}")
+    debug.capture(data, tag="duplicates_page", page=page)
 
     # === INSPEÇÃO DE CHAVES ===
-    print("\n🔍 Estrutura principal da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+    if debug.enabled:
+        print("\n🔍 Estrutura principal da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+            print(f"   - {key} ({tipo}) tamanho: {tamanho}")
     print("-" * 60)
 
     # === RESUMO DE PAGINAÇÃO ===
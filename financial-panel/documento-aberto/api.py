@@ -8,6 +8,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("documento-aberto")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/financial-panel/v2/open-amount-document/search"
@@ -27,7 +35,7 @@ print(f"📦 Payload enviado:\n{json.dumps(payload, indent=2)}")
 
 # === REQUISIÇÃO POST ===
 try:
-    response = requests.post(URL, headers=headers, json=payload, timeout=60)
+    response = session.post(URL, headers=headers, json=payload, timeout=60)
 except requests.exceptions.RequestException as e:
     print(f"❌ Erro na conexão: {e}")
     sys.exit(1)
@@ -47,17 +55,15 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === SALVA DEBUG ===
-debug_file = f"debug_open_amount_document_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="open_amount_document")
 
 # === INSPEÇÃO DE CHAVES ===
-print("\n🔍 Estrutura principal da resposta:")
-for key, value in data.items():
-    tipo = type(value).__name__
-    tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-    print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+if debug.enabled:
+    print("\n🔍 Estrutura principal da resposta:")
+    for key, value in data.items():
+        tipo = type(value).__name__
+        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
 print("-" * 60)
 
 # === ESTRUTURAÇÃO DOS DADOS ===
@@ -1,128 +1,113 @@
-import requests
+import asyncio
 import pandas as pd
-import json
 import sys
 import os
 from datetime import datetime
 
-# === IMPORTA TOKEN ===
+# === IMPORTA CLIENTE TOTVS ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+from totvs.async_client import TotvsAsyncClient
+from totvs.excel_stream import StreamingExcelWriter
+from totvs.debug_capture import DebugCapture
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("01-fiscal-moviment-boa")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/fiscal-movement/search"
 
-headers = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
-
 # === PAGINAÇÃO ===
-page = 1  # Primeira página
 page_size = 100  # Tamanho da página
-all_movements = []  # Para armazenar todos os dados
 all_summaries = []  # Para armazenar os resumos das páginas
 
-print("🚀 Iniciando consulta de Movimentos Fiscais (Analytics + DEBUG)...")
+MOVEMENT_COLUMNS = [
+    "BranchCode", "ProductCode", "PersonCode", "RepresentativeCode", "MovementDate",
+    "OperationCode", "OperationModel", "StockCode", "BuyerCode", "SellerCode",
+    "GrossValue", "DiscountValue", "NetValue", "Quantity",
+]
+
+payload = {
+      "filter": {
+        "branchCodeList": [5],  
+        
+        # === INTERVALO DE DATAS ===
+        "startMovementDate": "2025-12-01T00:00:00Z",
+        "endMovementDate": "2025-12-16T23:59:59Z",
+    },
+}
 
-while True:
-    payload = {
-          "filter": {
-            "branchCodeList": [5],  
-            
-            # === INTERVALO DE DATAS ===
-            "startMovementDate": "2025-12-01T00:00:00Z",
-            "endMovementDate": "2025-12-16T23:59:59Z",
-        },
-        "page": page,
-        "pageSize": page_size,
-    }
-
-    print(f"\n📄 Consultando página {page + 1} de movimentos fiscais…")
-    resp = requests.post(URL, headers=headers, json=payload)
-    print(f"📡 Status: {resp.status_code}")
-
-    if resp.status_code != 200:
-        print("❌ Erro na requisição:", resp.text)
-        break
 
-    try:
-        data = resp.json()
-    except requests.exceptions.JSONDecodeError:
-        print("❌ Erro ao decodificar JSON da resposta.")
-        break
-
-    # === DEBUG: SALVAR RESPOSTA ===
-    debug_file = f"debug_response_fiscal_movement_page_{page + 1}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
-
-    # === PROCESSAMENTO DE DADOS ===
-    items = data.get("items", [])
-    if not items:
-        print("⚠️ Nenhum registro encontrado nesta página.")
-        break
-
-    for item in items:
-        all_movements.append({
-            "BranchCode": item.get("branchCode"),
-            "ProductCode": item.get("productCode"),
-            "PersonCode": item.get("personCode"),
-            "RepresentativeCode": item.get("representativeCode"),
-            "MovementDate": item.get("movementDate"),
-            "OperationCode": item.get("operationCode"),
-            "OperationModel": item.get("operationModel"),
-            "StockCode": item.get("stockCode"),
-            "BuyerCode": item.get("buyerCode"),
-            "SellerCode": item.get("sellerCode"),
-            "GrossValue": item.get("grossValue"),
-            "DiscountValue": item.get("discountValue"),
-            "NetValue": item.get("netValue"),
-            "Quantity": item.get("quantity"),
+async def fetch_movements(client, xl):
+    page = 0
+    async for data in client.paginate(URL, payload, page_size=page_size):
+        page += 1
+        print(f"\n📄 Página {page} de movimentos fiscais recebida")
+
+        # === DEBUG: SALVAR RESPOSTA ===
+        debug.capture(data, tag="response_fiscal_movement", page=page)
+
+        # === PROCESSAMENTO DE DADOS (direto para o Excel) ===
+        for item in data.get("items", []):
+            xl.write_row({
+                "BranchCode": item.get("branchCode"),
+                "ProductCode": item.get("productCode"),
+                "PersonCode": item.get("personCode"),
+                "RepresentativeCode": item.get("representativeCode"),
+                "MovementDate": item.get("movementDate"),
+                "OperationCode": item.get("operationCode"),
+                "OperationModel": item.get("operationModel"),
+                "StockCode": item.get("stockCode"),
+                "BuyerCode": item.get("buyerCode"),
+                "SellerCode": item.get("sellerCode"),
+                "GrossValue": item.get("grossValue"),
+                "DiscountValue": item.get("discountValue"),
+                "NetValue": item.get("netValue"),
+                "Quantity": item.get("quantity"),
+            })
+
+        # Resumo da página
+        all_summaries.append({
+            "Page": page,
+            "Count": data.get("count"),
+            "TotalItems": data.get("totalItems"),
+            "TotalPages": data.get("totalPages"),
         })
 
-    # Resumo da página
-    summary = {
-        "Page": page + 1,
-        "Count": data.get("count"),
-        "TotalItems": data.get("totalItems"),
-        "TotalPages": data.get("totalPages"),
-    }
-    all_summaries.append(summary)
+    if page == 0:
+        print("⚠️ Nenhum registro encontrado.")
+    else:
+        print("✅ Todas as páginas foram processadas.")
 
-    # === PAGINAÇÃO ===
-    total_pages = data.get("totalPages")
-    has_next = data.get("hasNext", False)
 
-    if total_pages and page >= total_pages - 1:
-        print("✅ Todas as páginas foram processadas.")
-        break
-    elif not has_next or len(items) < page_size:
-        print("✅ Última página (sem próxima).")
-        break
+async def main(xl):
+    async with TotvsAsyncClient() as client:
+        await fetch_movements(client, xl)
 
-    page += 1
 
-# === EXPORTAÇÃO ===
-df_movements = pd.DataFrame(all_movements)
-df_summary = pd.DataFrame(all_summaries).drop_duplicates(subset=["Page"])
+print("🚀 Iniciando consulta de Movimentos Fiscais (Analytics + DEBUG)...")
 
-print("-" * 40)
+# === EXPORTAÇÃO (streaming: cada página vai para o arquivo assim que chega) ===
+date_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+excel_file = f"movimentos_fiscais_{date_now}.xlsx"
 
-if df_movements.empty:
-    print("⚠️ Nenhum dado encontrado para exportar.")
-else:
-    date_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    excel_file = f"movimentos_fiscais_{date_now}.xlsx"
+with StreamingExcelWriter(excel_file) as xl:
+    xl.add_sheet("Movimentos Fiscais", MOVEMENT_COLUMNS)
 
     try:
-        with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
-            df_movements.to_excel(writer, sheet_name="Movimentos Fiscais", index=False)
-            if not df_summary.empty:
-                df_summary.to_excel(writer, sheet_name="ResumoPáginas", index=False)
-
-        print(f"✅ Relatório gerado: {excel_file}")
-        print(f"Total de registros exportados: {len(df_movements)}")
+        asyncio.run(main(xl))
     except Exception as e:
-        print(f"❌ Erro ao exportar para Excel: {e}")
+        print("❌ Erro na requisição:", e)
+
+    total_rows = xl.rows_written
+    df_summary = pd.DataFrame(all_summaries).drop_duplicates(subset=["Page"]) if all_summaries else pd.DataFrame()
+    if not df_summary.empty:
+        xl.write_dataframe(df_summary, "ResumoPáginas")
+
+print("-" * 40)
+
+if total_rows == 0:
+    os.remove(excel_file)
+    print("⚠️ Nenhum dado encontrado para exportar.")
+else:
+    print(f"✅ Relatório gerado: {excel_file}")
+    print(f"Total de registros exportados: {total_rows}")
@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 import sys
 import os
 from datetime import datetime
@@ -8,6 +7,14 @@ from datetime import datetime
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("02-fiscal-emp")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://treino.bhan.com.br:9443/api/totvsmoda/analytics/v2/branch-fiscal-movement/search"
@@ -35,7 +42,7 @@ while True:
     }
 
     print(f"\n📄 Consultando página {page} de parceiros…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -49,10 +56,7 @@ while True:
         break
 
     # === DEBUG: SALVAR RESPOSTA ===
-    debug_file = f"debug_response_partners_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_partners", page=page)
 
  
 
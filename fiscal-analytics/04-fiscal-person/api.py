@@ -8,6 +8,14 @@ from datetime import datetime
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("04-fiscal-person")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/person-fiscal-movement/search"
@@ -36,7 +44,7 @@ while True:
     }
 
     print(f"\n📄 Consultando página {page} de pessoas…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -50,21 +58,19 @@ while True:
         break
 
     # === DEBUG: SALVAR RESPOSTA ===
-    debug_file = f"debug_response_people_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_people", page=page)
 
     # === DEBUG: ESTRUTURA ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    print("🧩 Amostra (primeiros 1000 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else "1"
+            print(f"   - {key}: {tipo} ({tam})")
+
+        print("🧩 Amostra (primeiros 1000 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+        print("-" * 60)
 
     # === PROCESSAMENTO DE DADOS ===
     items = data.get("items", [])
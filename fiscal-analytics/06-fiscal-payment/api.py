@@ -8,6 +8,14 @@ from datetime import datetime
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("06-fiscal-payment")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/payment-fiscal-movement/search"
@@ -37,7 +45,7 @@ while True:
     
  
     print(f"\n📄 Consultando página {page} de condições de pagamento…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -51,21 +59,19 @@ while True:
         break
 
     # === DEBUG: SALVAR RESPOSTA ===
-    debug_file = f"debug_response_payment_conditions_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_payment_conditions", page=page)
 
     # === DEBUG: EXIBIR ESTRUTURA ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    print("🧩 Amostra (primeiros 1000 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else "1"
+            print(f"   - {key}: {tipo} ({tam})")
+
+        print("🧩 Amostra (primeiros 1000 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+        print("-" * 60)
 
     # === PROCESSAMENTO DE DADOS ===
     items = data.get("items", [])
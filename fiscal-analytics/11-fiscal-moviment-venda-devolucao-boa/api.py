@@ -8,6 +8,15 @@ import json
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.shards import branch_windows, plan_shards, run_shards
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("11-fiscal-moviment-venda-devolucao-boa")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/branch-sale"
@@ -17,99 +26,154 @@ headers = {
     "Authorization": f"Bearer {TOKEN}"
 }
 
-page = 1
 page_size = 1000
-all_sales = []
 pagination_summary = []
 
+# === FILIAIS (a rota filtra por CNPJ; todas consultadas em paralelo) ===
+BRANCH_CNPJS = [
+    "41791600000445",  # Atacado
+    "45877608000218",  # CJ
+    "45877608000137",  # MG
+    "41791600000526",  # ECOM
+]
+
 # === PARÂMETROS ===
 params = {
-    # "BranchCnpj": "41791600000445", #Atacado
-    # "BranchCnpj": "45877608000218",#CJ
-     "BranchCnpj": "45877608000137", #MG
-    # "BranchCnpj": "41791600000526",  # ECOM
     "StartDate": "2025-12-01T00:00:00Z",
     "EndDate": "2025-12-09T23:59:59Z",
     "pageSize": page_size
 }
 
-print("\n🚀 Iniciando consulta de Branch Sales com DEBUG...\n")
-
-# === LOOP DE PAGINAÇÃO ===
-while True:
-    print(f"\n📄 Consultando página {page}…")
-    
-    # Atualiza página atual no params
-    params["page"] = page
-
-    resp = requests.get(URL, headers=headers, params=params)
-    print(f"📡 Status: {resp.status_code}")
+# === FATIAS DE PERÍODO ===
+# A janela StartDate..EndDate de cada filial é dividida em fatias de 1 a 7 dias
+# (conforme o totalItems informado pela API), todas buscadas em paralelo;
+# False = uma janela única por filial
+SHARD_WINDOW = True
+SHARD_WORKERS = 4
+SHARD_TARGET_ITEMS = 20 * page_size
 
-    if resp.status_code != 200:
-        print("❌ Erro na requisição:", resp.text)
-        break
 
-    # === TENTA DECODIFICAR JSON ===
+def count_sales(shard):
+    """totalItems da janela (uma página com pageSize=1); None se a consulta falhar."""
+    probe = dict(params, BranchCnpj=shard.branch, StartDate=shard.start_str, EndDate=shard.end_str, page=1, pageSize=1)
     try:
-        data = resp.json()
-    except json.JSONDecodeError:
-        print("❌ Erro ao decodificar JSON.")
-        break
-
-    # === DEBUG: SALVAR RESPOSTA ===
-    debug_file = f"debug_branch_sale_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-    print(f"💾 Resposta salva em: {debug_file}")
-
-    # === DEBUG: MOSTRAR ESTRUTURA ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tamanho = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"  - {key}: {tipo} ({tamanho})")
-
-    # === DEBUG: AMOSTRA PARCIAL DO JSON ===
-    print("\n🧩 Amostra dos dados (1000 chars):")
-    print(json.dumps(data, ensure_ascii=False, indent=2)[:1000])
-    print("-" * 80)
-
-    # === PROCESSAR ITENS ===
-    items = data.get("items", [])
-
-    if not items:
-        print("⚠️ Nenhum registro encontrado nesta página.")
-        break
-
-    for item in items:
-        all_sales.append({
-            "CNPJ Filial": item.get("branchCnpj"),
-            "Sequência NF": item.get("invoiceSequence"),
-            "Valor Venda": item.get("SaleValue"),
-            "Data Venda": item.get("saleDate"),
-            "Hora Venda": item.get("SaleHour"),
-            "Status NF": item.get("invoiceStatus"),
-            "Tipo Operação": item.get("operationType"),
-            "Código Operação": item.get("operationCode"),
+        resp = session.get(URL, headers=headers, params=probe, timeout=60)
+        resp.raise_for_status()
+        total = resp.json().get("totalItems")
+        return int(total) if total is not None else None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"⚠️ Filial {shard.branch}: total não disponível ({e}); fatias de 1 dia.")
+        return None
+
+
+def fetch_window(cnpj, start, end):
+    """Todas as páginas de uma filial na janela StartDate..EndDate."""
+    window_params = dict(params, BranchCnpj=cnpj, StartDate=start, EndDate=end)
+    window_items = []
+    page = 1
+
+    # === LOOP DE PAGINAÇÃO ===
+    while True:
+        print(f"\n📄 Consultando {cnpj} {start[:10]}..{end[:10]} página {page}…")
+
+        # Atualiza página atual no params
+        window_params["page"] = page
+
+        resp = session.get(URL, headers=headers, params=window_params)
+        print(f"📡 Status: {resp.status_code}")
+
+        if resp.status_code != 200:
+            print("❌ Erro na requisição:", resp.text)
+            break
+
+        # === TENTA DECODIFICAR JSON ===
+        try:
+            data = resp.json()
+        except json.JSONDecodeError:
+            print("❌ Erro ao decodificar JSON.")
+            break
+
+        # === DEBUG: SALVAR RESPOSTA ===
+        debug.capture(data, tag="branch_sale", page=page, branch=cnpj, start=start, end=end)
+
+        # === DEBUG: MOSTRAR ESTRUTURA ===
+        if debug.enabled:
+            print("🔍 Estrutura da resposta:")
+            for key, value in data.items():
+                tipo = type(value).__name__
+                tamanho = len(value) if isinstance(value, (list, dict)) else "1"
+                print(f"  - {key}: {tipo} ({tamanho})")
+
+            # === DEBUG: AMOSTRA PARCIAL DO JSON ===
+            print("\n🧩 Amostra dos dados (1000 chars):")
+            print(json.dumps(data, ensure_ascii=False, indent=2)[:1000])
+            print("-" * 80)
+
+        # === PROCESSAR ITENS ===
+        items = data.get("items", [])
+
+        if not items:
+            print("⚠️ Nenhum registro encontrado nesta página.")
+            break
+
+        window_items.extend(items)
+
+        # === RESUMO DE PAGINAÇÃO ===
+        pagination_summary.append({
+            "branchCnpj": cnpj,
+            "startDate": start,
+            "endDate": end,
+            "page": page,
+            "totalItems": data.get("totalItems"),
+            "count": data.get("count"),
+            "totalPages": data.get("totalPages"),
         })
 
-    # === RESUMO DE PAGINAÇÃO ===
-    pagination_summary.append({
-        "page": page,
-        "totalItems": data.get("totalItems"),
-        "count": data.get("count"),
-        "totalPages": data.get("totalPages"),
-    })
+        total_pages = data.get("totalPages", 1)
+        print(f"📖 Página {page}/{total_pages}")
 
-    total_pages = data.get("totalPages", 1)
-    print(f"📖 Página {page}/{total_pages}")
+        if page >= total_pages:
+            print("✅ Todas as páginas processadas.")
+            break
 
-    if page >= total_pages:
-        print("✅ Todas as páginas processadas.")
-        break
+        page += 1
 
-    page += 1
+    return window_items
+
+
+print("\n🚀 Iniciando consulta de Branch Sales com DEBUG...\n")
+
+if SHARD_WINDOW:
+    # fatias filial × período
+    shards = plan_shards(
+        BRANCH_CNPJS,
+        params["StartDate"],
+        params["EndDate"],
+        count_items=count_sales,
+        target_items=SHARD_TARGET_ITEMS,
+    )
+else:
+    # uma janela inteira por filial
+    shards = branch_windows(BRANCH_CNPJS, params["StartDate"], params["EndDate"])
+
+print(f"🧩 {len(shards)} fatia(s), {SHARD_WORKERS} em paralelo")
+# fatias disjuntas: cada venda vem de uma fatia só; os itens de cada fatia
+# viram linhas assim que a fatia chega
+sale_items = run_shards(
+    shards, lambda shard: fetch_window(shard.branch, shard.start_str, shard.end_str), max_workers=SHARD_WORKERS
+)
+
+all_sales = [{
+    "CNPJ Filial": item.get("branchCnpj"),
+    "Sequência NF": item.get("invoiceSequence"),
+    "Valor Venda": item.get("SaleValue"),
+    "Data Venda": item.get("saleDate"),
+    "Hora Venda": item.get("SaleHour"),
+    "Status NF": item.get("invoiceStatus"),
+    "Tipo Operação": item.get("operationType"),
+    "Código Operação": item.get("operationCode"),
+} for item in sale_items]
+pagination_summary.sort(key=lambda r: (r["branchCnpj"], r["startDate"], r["page"]))
 
 # === EXPORTAÇÃO ===
 if all_sales:
@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 import sys
 import os
 from datetime import datetime
@@ -8,6 +7,14 @@ from datetime import datetime
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("12-fiscal-moviment+person-boa")
 
 # === CONFIGURAÇÕES DA API - MOVIMENTOS FISCAIS ===
 URL_MOVEMENT = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/fiscal-movement/search"
@@ -41,7 +48,7 @@ while True:
     }
 
     print(f"\n📄 Consultando página {page} de Movimentos Fiscais…")
-    resp = requests.post(URL_MOVEMENT, headers=headers, json=payload)
+    resp = session.post(URL_MOVEMENT, headers=headers, json=payload)
     print(f"📡 Status HTTP: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -55,10 +62,7 @@ while True:
         break
 
     # === SALVAR RESPOSTA - MOVIMENTOS FISCAIS ===
-    debug_file = f"debug_fiscal_movement_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Armazenado: {debug_file}")
+    debug.capture(data, tag="fiscal_movement", page=page)
 
     # === PROCESSAMENTO DE DADOS - MOVIMENTOS FISCAIS ===
     items = data.get("items", [])
@@ -112,7 +116,7 @@ while True:
     }
 
     print(f"\n📄 Consultando página {page} de Pessoas…")
-    resp = requests.post(URL_PEOPLE, headers=headers, json=payload)
+    resp = session.post(URL_PEOPLE, headers=headers, json=payload)
     print(f"📡 Status HTTP: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -126,10 +130,7 @@ while True:
         break
 
     # === SALVAR RESPOSTA - PESSOAS ===
-    debug_file = f"debug_response_people_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_people", page=page)
 
     # === PROCESSAMENTO DE DADOS - PESSOAS ===
     items = data.get("items", [])
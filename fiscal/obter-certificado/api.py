@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -9,6 +8,14 @@ import base64
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-certificado")
 
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/fiscal/v2/digital-certificates"
@@ -27,7 +34,7 @@ print("🚀 Consultando certificados digitais da empresa...")
 
 # === REQUISIÇÃO GET ===
 try:
-    response = requests.get(URL, headers=HEADERS, params=PARAMS, timeout=60)
+    response = session.get(URL, headers=HEADERS, params=PARAMS, timeout=60)
     response.raise_for_status()
     data = response.json()
 except requests.exceptions.RequestException as e:
@@ -35,10 +42,7 @@ except requests.exceptions.RequestException as e:
     sys.exit(1)
 
 # === SALVA DEBUG ===
-debug_file = f"debug_digital_certificates_{datetime.now():%Y%m%d_%H%M%S}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="digital_certificates")
 
 # === TRATAMENTO DOS DADOS ===
 # Pode vir um único objeto ou lista, então padronizamos
@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -9,6 +8,14 @@ import time # Adicionado para consistência
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-detalhe-nfe-unica")
 
 # === FUNÇÃO AUXILIAR ===
 def safe_list(value):
@@ -34,7 +41,7 @@ print("🚀 Consultando itens da fatura (item-detail-search)...")
 
 # === REQUISIÇÃO ===
 try:
-    response = requests.get(URL, headers=HEADERS, params=PARAMS, timeout=60)
+    response = session.get(URL, headers=HEADERS, params=PARAMS, timeout=60)
     response.raise_for_status()
     data = response.json()
 except requests.exceptions.RequestException as e:
@@ -42,10 +49,7 @@ except requests.exceptions.RequestException as e:
     sys.exit(1)
 
 # === SALVA DEBUG ===
-debug_file = f"debug_item_detail_{datetime.now():%Y%m%d_%H%M%S}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="item_detail")
 
 # === TRATAMENTO DOS DADOS ===
 items_data = data.get("items", [])
@@ -1,14 +1,21 @@
 import os
 import sys
-import json
 import requests
 import pandas as pd
 from typing import Dict, Any, List
 from datetime import datetime
-import time 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN 
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-lista-produto-chaveAcesso")
 
 # === CONFIGURAÇÕES GERAIS ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/fiscal/v2/invoice-products/search"
@@ -45,7 +52,7 @@ def fetch_all_invoice_products() -> List[Dict[str, Any]]:
         payload = make_payload(page, page_size)
         try:
             log(f"   - Buscando página {page}...")
-            response = requests.post(URL, headers=HEADERS, json=payload, timeout=120)
+            response = rate_limited(session.post, URL, headers=HEADERS, json=payload, timeout=120)
             response.raise_for_status()
             data = response.json()
             items = data.get("items", [])
@@ -63,7 +70,6 @@ def fetch_all_invoice_products() -> List[Dict[str, Any]]:
                 break
                 
             page += 1
-            time.sleep(0.3) # Adiciona um pequeno delay para evitar sobrecarga
         
         except requests.RequestException as e:
             log(f"❌ Erro ao consultar itens de NF na página {page}: {e}")
@@ -147,10 +153,7 @@ if __name__ == "__main__":
     all_items = fetch_all_invoice_products()
 
     # === SALVA DEBUG ===
-    debug_file = f"debug_invoice_products_{datetime.now():%Y%m%d_%H%M%S}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(all_items, f, ensure_ascii=False, indent=2)
-    log(f"💾 Arquivo debug salvo: {debug_file}")
+    debug.capture(all_items, tag="invoice_products")
 
     if not all_items:
         sys.exit(0)
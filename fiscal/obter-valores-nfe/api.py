@@ -1,14 +1,23 @@
 import os
 import sys
-import json
 import requests
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any
 from datetime import datetime
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN 
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import FieldMap
+from totvs.streaming import post_items
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-valores-nfe")
 
 # === CONFIGURAÇÕES GERAIS ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/fiscal/v2/invoices/search"
@@ -44,8 +53,13 @@ def make_payload(page: int = 1, pageSize: int = 100) -> Dict[str, Any]:
         "expand": "eletronic, shippingCompany, person, payments, items"
     }
 
-def fetch_all_invoices() -> List[Dict[str, Any]]:
-    all_items = []
+def fetch_all_invoices(on_invoice: Callable[[Dict[str, Any]], None]) -> int:
+    """Percorre as páginas e entrega cada NF a `on_invoice` assim que ela é lida.
+
+    A resposta é lida em fluxo (totvs.streaming): a página de 100 NFs com
+    itens/pagamentos expandidos não fica inteira em memória.
+    """
+    total = 0
     page = 1
     page_size = 100 
 
@@ -54,19 +68,20 @@ def fetch_all_invoices() -> List[Dict[str, Any]]:
         payload = make_payload(page, page_size)
         try:
             log(f"   - Buscando página {page}...")
-            response = requests.post(URL, headers=HEADERS, json=payload, timeout=120)
-            response.raise_for_status()
-            data = response.json()
-            items = data.get("items", [])
-            
-            if not items:
+            with post_items(URL, payload, session=session, timeout=120) as invoices:
+                for nf in invoices:
+                    debug.capture(nf, tag="fiscal", page=page)
+                    on_invoice(nf)
+                count = invoices.count
+
+            if not count:
                 log(f"   - Página {page} não retornou itens. Fim da busca.")
                 break 
             
-            all_items.extend(items)
-            log(f"   - {len(items)} notas fiscais retornadas na página {page}. Total acumulado: {len(all_items)}")
+            total += count
+            log(f"   - {count} notas fiscais retornadas na página {page}. Total acumulado: {total}")
             
-            if len(items) < page_size:
+            if count < page_size:
                 log("   - Número de itens menor que o page_size. Fim da busca.")
                 break
                 
@@ -76,157 +91,156 @@ def fetch_all_invoices() -> List[Dict[str, Any]]:
             log(f"❌ Erro ao consultar notas fiscais na página {page}: {e}")
             break 
 
-    log(f"✅ Total final de notas fiscais retornadas: {len(all_items)}")
-    return all_items
+    log(f"✅ Total final de notas fiscais retornadas: {total}")
+    return total
 
 
-def process_invoice(nf: Dict[str, Any]) -> Dict[str, Any]:
-    eletronic = nf.get("eletronic", {}) or {}
-    shipping = nf.get("shippingCompany", {}) or {}
-    person = nf.get("person", {}) or {}
-
-    pg_first = (nf.get("payments") or [{}])[0]
-    card_info = pg_first.get("cardInformation", {}) or {}
-
-    items = nf.get("items", []) or []
-
-    total_produtos = 0
-    for item in items:
+def total_products(nf: Dict[str, Any]) -> float:
+    """Soma das quantidades de todos os produtos de todos os itens da NF."""
+    total = 0
+    for item in nf.get("items") or []:
         for prod in item.get("products") or []:
-            total_produtos += prod.get("quantity", 0)
-
-    first_item = items[0] if items else {}
-
-    return {
-        # Dados principais
-        "Empresa": nf.get("branchCode"),
-        "Emissao": nf.get("issueDate"),
-        "Transacao": nf.get("transactionCode"),
-        "Operacao": nf.get("operationCode"),
-        "CFOP": first_item.get("cfop"),
-        "Codigo": nf.get("personCode"),
-        "Cliente": nf.get("personName"),
-
-        # Pessoa
-        "Cidade": person.get("city"),
-        "UF": person.get("stateAbbreviation"),
-        "CEP": person.get("cep"),
-        "Telefone": person.get("foneNumber"),
-
-        # Transportadora
-        "Transportadora": shipping.get("shippingCompanyName"),
-
-        # Pagamento
-        "Total_Produtos": total_produtos,
-        "Desconto": first_item.get("discountValue"),
-        "Valor_liquido": first_item.get("netValue"),
-        "Valor_Bruto": first_item.get("unitGrossValue"),
-        "Valor_Total": nf.get("totalValue"),
-  
-        "Liquidacao": pg_first.get("documentType"),
-        "Banco": card_info.get("cardOperatorName"),
-        "Cartao": card_info.get("cardFlag"),
-        "NSU": card_info.get("nsu"),
-        "Autorizacao": card_info.get("authorizationCode"),
-
-        # Eletronic
-        "Serie": nf.get("serialCode"),
-        "Chave": eletronic.get("accessKey"),
-        "Status_NFe": eletronic.get("electronicInvoiceStatus"),
-    }
-
-def process_related_data(nf: Dict[str, Any], df_dicts: Dict[str, list]):
-    person = nf.get("person", {}) or {}
-    shipping = nf.get("shippingCompany", {}) or {}
+            total += prod.get("quantity", 0)
+    return total
+
+# === MAPEAMENTO DAS COLUNAS ===
+INVOICES_MAP = FieldMap({
+    # Dados principais
+    "Empresa": "branchCode",
+    "Emissao": "issueDate",
+    "Transacao": "transactionCode",
+    "Operacao": "operationCode",
+    "CFOP": "items.0.cfop",
+    "Codigo": "personCode",
+    "Cliente": "personName",
 
     # Pessoa
-    if person:
-        df_dicts["pessoas"].append({
-            "invoiceCode": nf.get("invoiceCode"),
-            "personName": person.get("personName"),
-            "cpfCnpj": person.get("personCpfCnpj"),
-            "city": person.get("city"),
-            "state": person.get("stateAbbreviation"),
-        })
+    "Cidade": "person.city",
+    "UF": "person.stateAbbreviation",
+    "CEP": "person.cep",
+    "Telefone": "person.foneNumber",
 
     # Transportadora
-    if shipping:
-        df_dicts["transportadoras"].append({
-            "invoiceCode": nf.get("invoiceCode"),
-            "shippingCompanyName": shipping.get("shippingCompanyName"),
-            "cpfCnpj": shipping.get("cpfCnpj"),
-            "city": shipping.get("cityName"),
-            "state": shipping.get("stateAbbreviation"),
-            "plaqueCode": shipping.get("plaqueCode"),
-            "freightValue": shipping.get("freightValue"),
-        })
-
-    # Pagamentos
-    for pg in nf.get("payments") or []:
-        card_info = pg.get("cardInformation", {}) or {}
-        df_dicts["pagamentos"].append({
-            "invoiceCode": nf.get("invoiceCode"),
-            "paymentValue": pg.get("paymentValue"),
-            "installment": pg.get("installment"),
-            "documentType": pg.get("documentType"),
-            "cardFlag": card_info.get("cardFlag"),
-            "nsu": card_info.get("nsu"),
-            "authorizationCode": card_info.get("authorizationCode")
-        })
-
-    # Itens e Produtos
-    for item in nf.get("items") or []:
-        df_dicts["itens"].append({
-            "invoiceCode": nf.get("invoiceCode"),
-            "cfop": item.get("cfop"),
-            "productCode": item.get("code"),
-            "description": item.get("name"),
-            "quantity": item.get("quantity"),
-            "discountValue": item.get("discountValue"),
-            "netValue": item.get("netValue"),
-            "unitNetValue": item.get("unitNetValue"),
-            "unitGrossValue": item.get("unitGrossValue"),
-            "unitDiscountValue": item.get("unitDiscountValue"),
-        })
-
-        for prod in item.get("products") or []:
-            df_dicts["products"].append({
-                "invoiceCode": nf.get("invoiceCode"),
-                "productCode": prod.get("productCode"),
-                "productName": prod.get("productName"),
-                "dealerCode": prod.get("dealerCode"),
-                "quantity": prod.get("quantity"),
-            })
+    "Transportadora": "shippingCompany.shippingCompanyName",
+
+    # Pagamento
+    "Total_Produtos": total_products,
+    "Desconto": "items.0.discountValue",
+    "Valor_liquido": "items.0.netValue",
+    "Valor_Bruto": "items.0.unitGrossValue",
+    "Valor_Total": "totalValue",
+
+    "Liquidacao": "payments.0.documentType",
+    "Banco": "payments.0.cardInformation.cardOperatorName",
+    "Cartao": "payments.0.cardInformation.cardFlag",
+    "NSU": "payments.0.cardInformation.nsu",
+    "Autorizacao": "payments.0.cardInformation.authorizationCode",
+
+    # Eletronic
+    "Serie": "serialCode",
+    "Chave": "eletronic.accessKey",
+    "Status_NFe": "eletronic.electronicInvoiceStatus",
+})
+
+PEOPLE_MAP = FieldMap({
+    "invoiceCode": "invoiceCode",
+    "personName": "person.personName",
+    "cpfCnpj": "person.personCpfCnpj",
+    "city": "person.city",
+    "state": "person.stateAbbreviation",
+})
+
+SHIPPING_MAP = FieldMap({
+    "invoiceCode": "invoiceCode",
+    "shippingCompanyName": "shippingCompany.shippingCompanyName",
+    "cpfCnpj": "shippingCompany.cpfCnpj",
+    "city": "shippingCompany.cityName",
+    "state": "shippingCompany.stateAbbreviation",
+    "plaqueCode": "shippingCompany.plaqueCode",
+    "freightValue": "shippingCompany.freightValue",
+})
+
+# Listas aninhadas: uma linha por elemento (NF sem elementos não gera linha)
+PAYMENTS_MAP = FieldMap(
+    {"invoiceCode": "invoiceCode"},
+    explode=("payments", {
+        "paymentValue": "paymentValue",
+        "installment": "installment",
+        "documentType": "documentType",
+        "cardFlag": "cardInformation.cardFlag",
+        "nsu": "cardInformation.nsu",
+        "authorizationCode": "cardInformation.authorizationCode",
+    }),
+    keep_empty=False,
+)
+
+ITEMS_MAP = FieldMap(
+    {"invoiceCode": "invoiceCode"},
+    explode=("items", {
+        "cfop": "cfop",
+        "productCode": "code",
+        "description": "name",
+        "quantity": "quantity",
+        "discountValue": "discountValue",
+        "netValue": "netValue",
+        "unitNetValue": "unitNetValue",
+        "unitGrossValue": "unitGrossValue",
+        "unitDiscountValue": "unitDiscountValue",
+    }),
+    keep_empty=False,
+)
+
+PRODUCTS_MAP = FieldMap(
+    {"invoiceCode": "invoiceCode"},
+    explode=("products", {
+        "productCode": "productCode",
+        "productName": "productName",
+        "dealerCode": "dealerCode",
+        "quantity": "quantity",
+    }),
+    keep_empty=False,
+)
+
+def process_invoice(nf: Dict[str, Any]) -> None:
+    INVOICES_MAP.extend((nf,))
+
+def process_related_data(nf: Dict[str, Any]) -> None:
+    batch = (nf,)
+    if nf.get("person"):
+        PEOPLE_MAP.extend(batch)
+    if nf.get("shippingCompany"):
+        SHIPPING_MAP.extend(batch)
+    PAYMENTS_MAP.extend(batch)
+    ITEMS_MAP.extend(batch)
+
+    # produtos ficam dentro de cada item: herdam o invoiceCode da NF
+    code = nf.get("invoiceCode")
+    PRODUCTS_MAP.extend(
+        {"invoiceCode": code, "products": item.get("products")}
+        for item in nf.get("items") or []
+    )
 
 # === EXECUÇÃO ===
 if __name__ == "__main__":
     log("🚀 Iniciando consulta de notas fiscais...")
-    items = fetch_all_invoices()
-
-    debug_file = f"debug_fiscal_{datetime.now():%Y%m%d_%H%M%S}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    log(f"💾 Arquivo debug salvo: {debug_file}")
 
-    # Inicializa dicionários
-    df_dicts = {"pessoas": [], "pagamentos": [], "transportadoras": [], "itens": [], "products": []}
-    invoices = []
-
-    for nf in items:
+    def process(nf: Dict[str, Any]) -> None:
         try:
-            invoices.append(process_invoice(nf))
-            process_related_data(nf, df_dicts)
+            process_invoice(nf)
+            process_related_data(nf)
         except Exception as e:
             log(f"⚠️ Erro ao processar NF {nf.get('invoiceCode')}: {e}")
 
+    fetch_all_invoices(process)
+
     # === CONVERTE EM DATAFRAMES ===
     dfs = {
-        "NotasFiscais": pd.DataFrame(invoices),
-        "Pessoas": pd.DataFrame(df_dicts["pessoas"]),
-        "Pagamentos": pd.DataFrame(df_dicts["pagamentos"]),
-        "Transportadoras": pd.DataFrame(df_dicts["transportadoras"]),
-        "Itens": pd.DataFrame(df_dicts["itens"]),
-        "Products": pd.DataFrame(df_dicts["products"]),
+        "NotasFiscais": INVOICES_MAP.frame(),
+        "Pessoas": PEOPLE_MAP.frame(),
+        "Pagamentos": PAYMENTS_MAP.frame(),
+        "Transportadoras": SHIPPING_MAP.frame(),
+        "Itens": ITEMS_MAP.frame(),
+        "Products": PRODUCTS_MAP.frame(),
     }
 
     # === EXPORTA PARA EXCEL ===
@@ -237,4 +251,4 @@ if __name__ == "__main__":
                 df.to_excel(writer, index=False, sheet_name=name)
 
     log(f"✅ Excel completo gerado: {excel_file}")
-    log(f"📊 Total de notas exportadas: {len(invoices)}")
\ No newline at end of file
+    log(f"📊 Total de notas exportadas: {len(dfs['NotasFiscais'])}")
\ No newline at end of file
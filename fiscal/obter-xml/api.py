@@ -8,6 +8,14 @@ import base64
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-xml")
 
 # === CONFIGURAÇÕES ===
 ACCESS_KEY = "32251041791600000445550010000027241197481362"  # 👉 substitua pela chave de acesso da NF-e
@@ -22,7 +30,7 @@ print(f"🚀 Consultando XML da NF-e (chave: {ACCESS_KEY})...")
 
 # === REQUISIÇÃO GET ===
 try:
-    response = requests.get(URL, headers=HEADERS, timeout=60)
+    response = session.get(URL, headers=HEADERS, timeout=60)
     response.raise_for_status()
     data = response.json()
 except requests.exceptions.RequestException as e:
@@ -35,10 +43,7 @@ except json.JSONDecodeError:
 print(f"📡 Status HTTP: {response.status_code}")
 
 # === SALVA DEBUG ===
-debug_file = f"debug_invoice_{datetime.now():%Y%m%d_%H%M%S}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="invoice")
 
 # === CAMPOS ===
 processing_type = data.get("processingType")
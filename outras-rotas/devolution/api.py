@@ -1,4 +1,3 @@
-import requests
 import json
 import sys
 import os
@@ -7,6 +6,14 @@ import time
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.retry import NO_RETRY
+from totvs.session import get_session, make_session
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+# Criação não é idempotente: sessão sem retentativas (um timeout depois de o
+# servidor gravar não pode gerar uma segunda devolução)
+create_session = make_session(retry=NO_RETRY)
 
 # Definindo URL da API para criação de devolução
 create_url = "https://treino.bhan.com.br:9443/api/totvsmoda/general/v2/devolutions/create"
@@ -50,7 +57,7 @@ payload = {
 }
 
 # Enviando a requisição POST para a API para criar a devolução
-response = requests.post(create_url, json=payload, headers=headers)
+response = create_session.post(create_url, json=payload, headers=headers)
 
 # Verificando a resposta da criação
 if response.status_code == 201:  # Código 201 indica sucesso na criação do recurso
@@ -74,7 +81,7 @@ if response.status_code == 201:  # Código 201 indica sucesso na criação do re
             }
             
             # Realizando a requisição GET para consultar a devolução criada
-            status_response = requests.get(search_url, headers=headers, params=search_payload)
+            status_response = session.get(search_url, headers=headers, params=search_payload)
             
             if status_response.status_code == 200:
                 print("✅ Status da devolução obtido com sucesso!")
@@ -1,13 +1,19 @@
-import requests
 import pandas as pd
-import json
-import time
 from datetime import datetime
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("geral_operations")
 
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/general/v2/operations"
 
@@ -32,7 +38,7 @@ while True:
     
     print(f"\n📄 Buscando página {PAGE} de operações...")
 
-    resp = requests.get(URL, headers=HEADERS, params=params)
+    resp = rate_limited(session.get, URL, headers=HEADERS, params=params)
     print("📡 Status HTTP:", resp.status_code)
 
     if resp.status_code != 200:
@@ -46,17 +52,15 @@ while True:
         break
 
     # === SALVAR JSON CRU PARA DEBUG ===
-    debug_file = f"debug_operations_page_{PAGE}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 JSON cru salvo em: {debug_file}")
+    debug.capture(data, tag="operations", page=PAGE)
 
     # === INSPEÇÃO DAS CHAVES PRINCIPAIS ===
-    print("🔍 Estrutura da resposta desta página:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+    if debug.enabled:
+        print("🔍 Estrutura da resposta desta página:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+            print(f"   - {key} ({tipo}) tamanho: {tamanho}")
     print("-" * 50)
 
     records = data.get("items", [])
@@ -73,7 +77,6 @@ while True:
         break
 
     PAGE += 1
-    time.sleep(0.3)
 
 # === CRIAÇÃO DO DATAFRAME PRINCIPAL ===
 if not all_records:
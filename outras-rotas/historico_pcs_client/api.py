@@ -1,4 +1,3 @@
-import requests
 import pandas as pd
 import json
 from datetime import datetime, timezone
@@ -7,6 +6,14 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN 
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("historico_pcs_client")
 
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/seller-panel/seller/customer-purchased-products"
 
@@ -33,7 +40,7 @@ while True:
 
     print(f"\n🛒 Consultando página {page} de itens vendidos…")
 
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -47,21 +54,19 @@ while True:
         break
 
     # === DEBUG: SALVAR RESPOSTA JSON ===
-    debug_file = f"debug_response_sales_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_sales", page=page)
 
     # === DEBUG: ESTRUTURA ===
-    print("🔍 Estrutura da resposta JSON:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else 1
-        print(f"   - {key}: {tipo} ({tam})")
-
-    print("🧩 Amostra JSON (primeiros 1000 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta JSON:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else 1
+            print(f"   - {key}: {tipo} ({tam})")
+
+        print("🧩 Amostra JSON (primeiros 1000 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+        print("-" * 60)
 
     # Extração dos itens
     items_list = data.get("items", [])
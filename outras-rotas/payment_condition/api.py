@@ -1,14 +1,21 @@
 import requests
 import pandas as pd
 from datetime import datetime
-import json
-import time
 import sys
 import os
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("payment_condition")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/general/v2/payment-conditions"
@@ -37,7 +44,7 @@ while True:
     print(f"\n📄 Buscando página {page}...")
 
     try:
-        resp = requests.get(URL, headers=headers, params=params, timeout=30)
+        resp = rate_limited(session.get, URL, headers=headers, params=params, timeout=30)
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro de conexão na página {page}: {e}")
         break
@@ -56,10 +63,7 @@ while True:
         break
 
     # === Salva resposta bruta para debug ===
-    debug_file = f"debug_payment_conditions_page_{page}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Debug salvo: {debug_file}")
+    debug.capture(data, tag="payment_conditions_page", page=page)
 
     # === Extrai registros ===
     records = data.get("items", [])
@@ -76,7 +80,6 @@ while True:
         break
 
     page += 1
-    time.sleep(0.3)  # pausa para não sobrecarregar a API
 
 print("-" * 70)
 
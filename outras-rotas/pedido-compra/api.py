@@ -1,97 +1,94 @@
-import requests
+import asyncio
 from datetime import datetime, timezone
 import pandas as pd
-import json
 import sys
 import os
 
-# === CONFIGURAÇÕES DE PATH E TOKEN ===
+# === CONFIGURAÇÕES DE PATH E CLIENTE ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+from totvs.async_client import TotvsAsyncClient
+from totvs.branches import fan_out_async, token_branches
+from totvs.debug_capture import DebugCapture
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("pedido-compra")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/purchase-order/v2/search"  # 🔁 rota de compra
 
-HEADERS = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
-
 # === PAGINAÇÃO ===
-page = 1
 page_size = 100
-all_items = []
 
-while True:
-    payload = {
+# === FILIAIS (claim `branches` do token; TOTVS_BRANCHES sobrepõe) ===
+branch_codes = token_branches()
+
+
+def payload_filial(branch):
+    return {
         "filter": {
             "change": {
                 "startDate": "2025-09-01T00:00:00Z",
                 "endDate": "2025-09-30T00:00:00Z",
             },
-            "branchCodeList": [2],  
+            "branchCodeList": [branch],
         },
-        "page": page,
-        "pageSize": page_size
     }
 
 
-    resp = requests.post(URL, headers=HEADERS, json=payload)
-    print(f"\n📄 Página {page} | Status: {resp.status_code}")
-
-    if resp.status_code != 200:
-        print("❌ Erro na requisição:", resp.text)
-        break
-
-    data = resp.json()
-
-    # === DEBUG opcional ===
-    debug_file = f"debug_purchase_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 JSON cru salvo em: {debug_file}")
-
-    orders = data.get("items", [])
-    if not orders:
-        print("⚠️ Nenhum pedido encontrado nesta página.")
-        break
-
-    for order in orders:
-        all_items.append({
-            "Filial": order.get("branchCode"),
-            "Pedido": order.get("orderCode"),
-            "CodigoFornecedor": order.get("supplierCode"),
-            "Fornecedor": order.get("supplierName"),
-            "CNPJ_Fornec": order.get("supplierCpfCnpj"),
-            "CodigoComprador": order.get("buyerCode"),
-            "Comprador": order.get("buyerName"),
-            "Operacao": order.get("operationName"),
-            "CodigoOperacao": order.get("operationCode"),
-            "Transportadora": order.get("shippingCompanyName"),
-            "CondicaoPagamento": order.get("paymentConditionName"),
-            "CodigoCondicaoPagamento": order.get("paymentConditionCode"),
-            "TipoPagamento": order.get("paymentType"),
-            "Status": order.get("status"),
-            "TipoFrete": order.get("freightType"),
-            "DataRegistro": order.get("registrationDate"),
-            "PrevisaoEntrega": order.get("deliveryForecastDate"),
-            "LimiteEntrega": order.get("deliveryDeadlineDate"),
-            "DataBasePagamento": order.get("basePaymentDate"),
-            "ValorProduto": order.get("productValue"),
-            "IPI": order.get("ipiValue"),
-            "Quantidade": order.get("quantity"),
-            "TotalPedido": order.get("totalAmountOrder")
-        })
-
-    if not data.get("hasNext", False):
-        print("✅ Paginação finalizada.")
-        break
-
-    page += 1
+async def fetch_orders(client, branch):
+    all_items = []
+    page = 0
+    async for data in client.paginate(URL, payload_filial(branch), page_size=page_size):
+        page += 1
+        print(f"\n📄 Filial {branch}: página {page} recebida")
+
+        # === DEBUG opcional ===
+        debug.capture(data, tag="purchase", page=page, branch=branch)
+
+        for order in data.get("items", []):
+            all_items.append({
+                "Filial": order.get("branchCode"),
+                "Pedido": order.get("orderCode"),
+                "CodigoFornecedor": order.get("supplierCode"),
+                "Fornecedor": order.get("supplierName"),
+                "CNPJ_Fornec": order.get("supplierCpfCnpj"),
+                "CodigoComprador": order.get("buyerCode"),
+                "Comprador": order.get("buyerName"),
+                "Operacao": order.get("operationName"),
+                "CodigoOperacao": order.get("operationCode"),
+                "Transportadora": order.get("shippingCompanyName"),
+                "CondicaoPagamento": order.get("paymentConditionName"),
+                "CodigoCondicaoPagamento": order.get("paymentConditionCode"),
+                "TipoPagamento": order.get("paymentType"),
+                "Status": order.get("status"),
+                "TipoFrete": order.get("freightType"),
+                "DataRegistro": order.get("registrationDate"),
+                "PrevisaoEntrega": order.get("deliveryForecastDate"),
+                "LimiteEntrega": order.get("deliveryDeadlineDate"),
+                "DataBasePagamento": order.get("basePaymentDate"),
+                "ValorProduto": order.get("productValue"),
+                "IPI": order.get("ipiValue"),
+                "Quantidade": order.get("quantity"),
+                "TotalPedido": order.get("totalAmountOrder")
+            })
+
+    print(f"✅ Filial {branch}: paginação finalizada ({len(all_items)} registros).")
+    return pd.DataFrame(all_items)
+
+
+async def main():
+    # todas as filiais ao mesmo tempo; o cliente limita as conexões por host
+    async with TotvsAsyncClient() as client:
+        return await fan_out_async(lambda branch: fetch_orders(client, branch), branch_codes, column="Filial")
+
+
+try:
+    df = asyncio.run(main())
+except Exception as e:
+    print("❌ Erro na requisição:", e)
+    df = pd.DataFrame()
 
 # === EXPORTAÇÃO PARA EXCEL ===
-df = pd.DataFrame(all_items)
-
 if df.empty:
     print("⚠️ Nenhum registro encontrado no período.")
 else:
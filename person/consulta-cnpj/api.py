@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json   
 from datetime import datetime
 import sys
 import os
@@ -8,6 +7,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("consulta-cnpj")
 
 # === CONFIGURAÇÕES ===
 branch_id = "45877608000137"  # Pode ser o código interno ou CNPJ da empresa
@@ -22,7 +29,7 @@ print(f"🚀 Consultando dados da empresa branchId={branch_id}...")
 
 # === REQUISIÇÃO GET ===
 try:
-    response = requests.get(URL, headers=headers, timeout=30)
+    response = session.get(URL, headers=headers, timeout=30)
 except requests.exceptions.RequestException as e:
     print(f"❌ Erro na conexão: {e}")
     sys.exit(1)
@@ -41,10 +48,7 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === SALVA DEBUG ===
-debug_file = f"debug_branch_{branch_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="branch", branch_id=branch_id)
 
 # === EXTRAÇÃO DE DADOS ===
 df_main = pd.DataFrame([{
@@ -1,4 +1,3 @@
-import requests
 import pandas as pd
 from datetime import datetime
 import json
@@ -8,130 +7,127 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 # Certifique-se de que o TOKEN está configurado corretamente
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.dimensions import CODES_PER_REQUEST, URL_INDIVIDUALS, fetch_codes
 
-# === CONFIGURAÇÕES DA API ===
-URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/person/v2/individuals/search"
+# Sessão HTTP compartilhada (pool keep-alive, já com o token)
+session = get_session()
 
-headers = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
+# === CONFIGURAÇÕES DA API ===
+URL = URL_INDIVIDUALS
 
 # Lista de diferentes códigos de pessoa (exemplo)
 person_code_list = list(range(200,300)) 
 
-# DataFrame para acumular todos os dados
-df_all_main = pd.DataFrame()
-
-# Loop para realizar múltiplas consultas
-for person_code in person_code_list:
-    payload = {
-        "filter": {
-            "change": {
-                "startDate": "2024-11-16T23:06:55.925Z",
-                "endDate": "2025-11-16T23:06:55.925Z",
-                "inPerson": True,
-                "inAddress": True, 
-                "inPhone": True,    
-                "inObservation": True
-            },
-            "personCodeList": [person_code]
-        },
-        "expand": "addresses,phones,emails", 
-        "page": 1,
-        "pageSize": 1000
-    }
+# Códigos por requisição (personCodeList) e lotes em paralelo
+CODES_PER_CHUNK = CODES_PER_REQUEST
+CHUNK_WORKERS = 4
+
+payload = {
+    "filter": {
+        "change": {
+            "startDate": "2024-11-16T23:06:55.925Z",
+            "endDate": "2025-11-16T23:06:55.925Z",
+            "inPerson": True,
+            "inAddress": True, 
+            "inPhone": True,    
+            "inObservation": True
+        }
+    },
+    "expand": "addresses,phones,emails"
+}
+
+print(f"\n🚀 Iniciando consulta de {len(person_code_list)} indivíduos (lotes de até {CODES_PER_CHUNK} códigos)")
+
+# === REQUISIÇÕES POST (lotes de personCodeList em paralelo) ===
+# (um lote com erro é avisado e fica de fora; os demais seguem)
+items, failed = fetch_codes(
+    URL,
+    person_code_list,
+    payload,
+    code_filter="personCodeList",
+    chunk_size=CODES_PER_CHUNK,
+    max_workers=CHUNK_WORKERS,
+    page_size=1000,
+    session=session,
+)
+for chunk, e in failed:
+    print(f"❌ Erro na requisição/JSON para os códigos {chunk[0]}..{chunk[-1]}: {e}")
 
-    print(f"\n🚀 Iniciando consulta de indivíduo com código: {person_code}")
-
-    # === REQUISIÇÃO POST ===
-    try:
-        response = requests.post(URL, headers=headers, json=payload, timeout=60)
-        if response.status_code != 200:
-            print(f"❌ Erro HTTP {response.status_code} para {person_code}: {response.text[:100]}...")
-            continue
-        data = response.json()
-    except Exception as e:
-        print(f"❌ Erro na requisição/JSON para {person_code}: {e}")
-        continue
+# === EXTRAÇÃO E NORMALIZAÇÃO DE DADOS ===
+extracted_data = [] 
+
+for item in items:
+    p_code = item.get("code")
+    p_name = item.get("name")
+    addresses = item.get("addresses", [])
+    phones = item.get("phones", [])
+    emails = item.get("emails", [])
     
-    # === EXTRAÇÃO E NORMALIZAÇÃO DE DADOS ===
-    items = data.get("items", [])
+    # --- 1. Extração de Endereço Principal (Campos separados + campo 'address') ---
+    address_fields = {
+        "publicPlace": "N/D",
+        "addressNumber": "S/N",
+        "complement": "",
+        "neighborhood": "N/D",
+        "cityName": "N/D",
+        "stateAbbreviation": "UF N/D",
+        "cep": "N/D",
+        "address": "N/D" # O campo 'address' do JSON
+    }
     
-    if items:
-        extracted_data = [] 
+    if addresses:
+        first_address = addresses[0]
         
-        for item in items:
-            p_code = item.get("code")
-            p_name = item.get("name")
-            addresses = item.get("addresses", [])
-            phones = item.get("phones", [])
-            emails = item.get("emails", [])
-            
-            # --- 1. Extração de Endereço Principal (Campos separados + campo 'address') ---
-            address_fields = {
-                "publicPlace": "N/D",
-                "addressNumber": "S/N",
-                "complement": "",
-                "neighborhood": "N/D",
-                "cityName": "N/D",
-                "stateAbbreviation": "UF N/D",
-                "cep": "N/D",
-                "address": "N/D" # O campo 'address' do JSON
-            }
-            
-            if addresses:
-                first_address = addresses[0]
-                
-                address_fields["publicPlace"] = first_address.get('publicPlace', 'Rua N/D')
-                address_fields["addressNumber"] = str(first_address.get('addressNumber', 'S/N')) 
-                address_fields["complement"] = first_address.get('complement', '')
-                address_fields["neighborhood"] = first_address.get('neighborhood', 'Bairro N/D')
-                address_fields["cityName"] = first_address.get('cityName', 'Cidade N/D')
-                address_fields["stateAbbreviation"] = first_address.get('stateAbbreviation', 'UF N/D')
-                address_fields["cep"] = first_address.get('cep', 'N/D')
-                address_fields["address"] = first_address.get('address', 'N/D') # Adicionando o campo 'address'
-
-            # Formata a string de Rua/Número/Complemento para uma coluna mais legível
-            street_number_part = f"{address_fields['publicPlace']}"
-            if address_fields['addressNumber'] and address_fields['addressNumber'] != 'S/N':
-                street_number_part += f", {address_fields['addressNumber']}"
-            if address_fields['complement']:
-                street_number_part += f" ({address_fields['complement']})"
-
-            # --- 2. Extração de Contatos Principais ---
-            phone_number = "N/D"
-            if phones and phones[0].get('number'):
-                phone_raw = phones[0]['number']
-                phone_number = phone_raw
-
-            email_address = "N/D"
-            if emails and emails[0].get('email'):
-                email_address = emails[0]['email']
-            
-            extracted_data.append({
-                "code": p_code,
-                "name": p_name,
-                # Novo Endereço Formatado
-                "Rua_Numero_Complemento": street_number_part,
-                "Bairro": address_fields["neighborhood"],
-                "Cidade_UF": f"{address_fields['cityName']}-{address_fields['stateAbbreviation']}",
-                "CEP": address_fields["cep"],
-                # Campo 'address' original da API
-                "address_original": address_fields["address"], 
-                # Contatos
-                "Telefone_Principal": phone_number,
-                "Email_Principal": email_address,
-            })
-
-        # Cria o DataFrame para esta iteração e concatena
-        df_main = pd.DataFrame(extracted_data)
-        print(f"✅ {len(df_main)} registros encontrados e normalizados para o código {person_code}.")
-        df_all_main = pd.concat([df_all_main, df_main], ignore_index=True)
+        address_fields["publicPlace"] = first_address.get('publicPlace', 'Rua N/D')
+        address_fields["addressNumber"] = str(first_address.get('addressNumber', 'S/N')) 
+        address_fields["complement"] = first_address.get('complement', '')
+        address_fields["neighborhood"] = first_address.get('neighborhood', 'Bairro N/D')
+        address_fields["cityName"] = first_address.get('cityName', 'Cidade N/D')
+        address_fields["stateAbbreviation"] = first_address.get('stateAbbreviation', 'UF N/D')
+        address_fields["cep"] = first_address.get('cep', 'N/D')
+        address_fields["address"] = first_address.get('address', 'N/D') # Adicionando o campo 'address'
 
-    else:
-        print(f"⚠️ Nenhum registro encontrado para o código {person_code}.")
+    # Formata a string de Rua/Número/Complemento para uma coluna mais legível
+    street_number_part = f"{address_fields['publicPlace']}"
+    if address_fields['addressNumber'] and address_fields['addressNumber'] != 'S/N':
+        street_number_part += f", {address_fields['addressNumber']}"
+    if address_fields['complement']:
+        street_number_part += f" ({address_fields['complement']})"
+
+    # --- 2. Extração de Contatos Principais ---
+    phone_number = "N/D"
+    if phones and phones[0].get('number'):
+        phone_raw = phones[0]['number']
+        phone_number = phone_raw
+
+    email_address = "N/D"
+    if emails and emails[0].get('email'):
+        email_address = emails[0]['email']
+    
+    extracted_data.append({
+        "code": p_code,
+        "name": p_name,
+        # Novo Endereço Formatado
+        "Rua_Numero_Complemento": street_number_part,
+        "Bairro": address_fields["neighborhood"],
+        "Cidade_UF": f"{address_fields['cityName']}-{address_fields['stateAbbreviation']}",
+        "CEP": address_fields["cep"],
+        # Campo 'address' original da API
+        "address_original": address_fields["address"], 
+        # Contatos
+        "Telefone_Principal": phone_number,
+        "Email_Principal": email_address,
+    })
+
+# DataFrame montado uma vez só, com todos os registros
+df_all_main = pd.DataFrame(extracted_data)
+print(f"✅ {len(df_all_main)} registros encontrados e normalizados.")
+missing = set(person_code_list) - {c for chunk, _ in failed for c in chunk}
+if not df_all_main.empty:
+    missing -= set(df_all_main["code"])
+if missing:
+    print(f"⚠️ Nenhum registro encontrado para {len(missing)} código(s).")
 
 # ---
 # === EXPORTAÇÃO PARA EXCEL ===
@@ -1,161 +1,142 @@
-import requests
 import pandas as pd
 from datetime import datetime
-import json
 import sys
 import os
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.dimensions import CODES_PER_REQUEST, URL_LEGAL_ENTITIES, fetch_codes
 
-# === CONFIGURAÇÕES DA API ===
-URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/person/v2/legal-entities/search"
+# Sessão HTTP compartilhada (pool keep-alive, já com o token)
+session = get_session()
 
-headers = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("consulta-pessoa-juridica-multiplos")
+
+# === CONFIGURAÇÕES DA API ===
+URL = URL_LEGAL_ENTITIES
 
 person_code_list = list(range(575, 580)) 
 
-df_all_main = pd.DataFrame() 
-
-all_raw_data = [] 
-
-for person_code in person_code_list:
-    payload = {
-        "filter": {
-            "change": {
-                "startDate": "2024-11-16T23:06:55.925Z",
-                "endDate": "2025-11-16T23:06:55.925Z",
-                "inAddress": True, 
-                "inPhone": True, 
-                "inObservation": True,
-                "inPerson": True 
-            },
-            "personCodeList": [person_code] 
-        },
-        "expand": "addresses,phones,emails", 
-        "page": 1,
-        "pageSize": 500
-    }
+# Códigos por requisição (personCodeList) e lotes em paralelo
+CODES_PER_CHUNK = CODES_PER_REQUEST
+CHUNK_WORKERS = 4
+
+payload = {
+    "filter": {
+        "change": {
+            "startDate": "2024-11-16T23:06:55.925Z",
+            "endDate": "2025-11-16T23:06:55.925Z",
+            "inAddress": True, 
+            "inPhone": True, 
+            "inObservation": True,
+            "inPerson": True 
+        }
+    },
+    "expand": "addresses,phones,emails"
+}
 
-    print(f"\n🚀 Iniciando consulta de PJ com código: {person_code}")
+print(f"\n🚀 Iniciando consulta de {len(person_code_list)} PJs (lotes de até {CODES_PER_CHUNK} códigos)")
+
+# === REQUISIÇÕES POST (lotes de personCodeList em paralelo) E TRATAMENTO DE ERROS ===
+# (um lote com erro é avisado e fica de fora; os demais seguem)
+all_raw_data, failed = fetch_codes(
+    URL,
+    person_code_list,
+    payload,
+    code_filter="personCodeList",
+    chunk_size=CODES_PER_CHUNK,
+    max_workers=CHUNK_WORKERS,
+    page_size=500,
+    session=session,
+)
+for chunk, e in failed:
+    if isinstance(e, ValueError):
+        print(f"❌ Erro ao decodificar JSON da resposta para os códigos {chunk[0]}..{chunk[-1]}.")
+    else:
+        print(f"❌ Erro na requisição/conexão para os códigos {chunk[0]}..{chunk[-1]}: {e}")
 
-    # === REQUISIÇÃO POST E TRATAMENTO DE ERROS ===
-    data = None
-    try:
-        response = requests.post(URL, headers=headers, json=payload, timeout=60)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data and "items" in data and data["items"]:
-                all_raw_data.extend(data["items"])
-
-        else:
-            print(f"❌ Erro HTTP {response.status_code} para {person_code}: {response.text[:100]}...")
-            continue
-            
-    except requests.exceptions.JSONDecodeError:
-        print(f"❌ Erro ao decodificar JSON da resposta para o código {person_code}.")
-        continue
-    except Exception as e:
-        print(f"❌ Erro na requisição/conexão para {person_code}: {e}")
-        continue
-    
-    if data is None:
-        continue
+# === EXTRAÇÃO E NORMALIZAÇÃO DE DADOS EM LINHA ÚNICA ===
+extracted_data = [] 
 
-    # === EXTRAÇÃO E NORMALIZAÇÃO DE DADOS EM LINHA ÚNICA ===
-    items = data.get("items", [])
+for item in all_raw_data:
+    p_code = item.get("code")
+    p_name = item.get("name")
+    p_cnpj = item.get("cnpj")
+    p_fantasy_name = item.get("fantasyName")
+    
+    addresses = item.get("addresses", [])
+    phones = item.get("phones", [])
+    emails = item.get("emails", [])
+    
+    # --- 1. Extração do Endereço Principal (APENAS O PRIMEIRO) ---
+    address_fields = {
+        "publicPlace": "N/D",
+        "addressNumber": "S/N",
+        "complement": "",
+        "neighborhood": "N/D",
+        "cityName": "N/D",
+        "stateAbbreviation": "UF N/D",
+        "cep": "N/D",
+        "address_original": "N/D"
+    }
     
-    if items:
-        extracted_data = [] 
+    if addresses:
+        first_address = addresses[0]
         
-        for item in items:
-            p_code = item.get("code")
-            p_name = item.get("name")
-            p_cnpj = item.get("cnpj")
-            p_fantasy_name = item.get("fantasyName")
-            
-            addresses = item.get("addresses", [])
-            phones = item.get("phones", [])
-            emails = item.get("emails", [])
-            
-            # --- 1. Extração do Endereço Principal (APENAS O PRIMEIRO) ---
-            address_fields = {
-                "publicPlace": "N/D",
-                "addressNumber": "S/N",
-                "complement": "",
-                "neighborhood": "N/D",
-                "cityName": "N/D",
-                "stateAbbreviation": "UF N/D",
-                "cep": "N/D",
-                "address_original": "N/D"
-            }
-            
-            if addresses:
-                first_address = addresses[0]
-                
-                address_fields["publicPlace"] = first_address.get('publicPlace', 'Rua N/D')
-                address_fields["addressNumber"] = str(first_address.get('addressNumber', 'S/N')) 
-                address_fields["complement"] = first_address.get('complement', '')
-                address_fields["neighborhood"] = first_address.get('neighborhood', 'Bairro N/D')
-                address_fields["cityName"] = first_address.get('cityName', 'Cidade N/D')
-                address_fields["stateAbbreviation"] = first_address.get('stateAbbreviation', 'UF N/D')
-                address_fields["cep"] = first_address.get('cep', 'N/D')
-                address_fields["address_original"] = first_address.get('address', 'N/D')
-
-            # Formata a string de Rua/Número/Complemento para uma coluna mais legível
-            street_number_part = f"{address_fields['publicPlace']}"
-            if address_fields['addressNumber'] and address_fields['addressNumber'] != 'S/N':
-                street_number_part += f", {address_fields['addressNumber']}"
-            if address_fields['complement']:
-                street_number_part += f" ({address_fields['complement']})"
-
-            # --- 2. Extração de Contatos Principais (O primeiro encontrado) ---
-            phone_number = phones[0]['number'] if phones and phones[0].get('number') else "N/D"
-            email_address = emails[0]['email'] if emails and emails[0].get('email') else "N/D"
-
-            # Adiciona a linha de dados ao DataFrame
-            extracted_data.append({
-                "code": p_code,
-                "cnpj": p_cnpj,
-                "name": p_name,
-                "Nome_Fantasia": p_fantasy_name,
-                
-                # Campos de Endereço Formatado (Primeiro Endereço)
-                "Numero_Complemento": street_number_part,
-                "Bairro": address_fields["neighborhood"],
-                "Cidade_UF": f"{address_fields['cityName']}-{address_fields['stateAbbreviation']}",
-                "CEP": address_fields["cep"],
-                "Endereco": address_fields["address_original"], 
-                
-                # Contatos
-                "Contato": phone_number,
-                "Email": email_address,
-            })
-
-        # Cria o DataFrame para esta iteração e concatena
-        df_main = pd.DataFrame(extracted_data)
-        print(f"✅ {len(df_main)} registro encontrado e normalizado para o código {person_code}.")
-        df_all_main = pd.concat([df_all_main, df_main], ignore_index=True)
-
-    else:
-        print(f"⚠️ Nenhum registro encontrado para o código {person_code}.")
+        address_fields["publicPlace"] = first_address.get('publicPlace', 'Rua N/D')
+        address_fields["addressNumber"] = str(first_address.get('addressNumber', 'S/N')) 
+        address_fields["complement"] = first_address.get('complement', '')
+        address_fields["neighborhood"] = first_address.get('neighborhood', 'Bairro N/D')
+        address_fields["cityName"] = first_address.get('cityName', 'Cidade N/D')
+        address_fields["stateAbbreviation"] = first_address.get('stateAbbreviation', 'UF N/D')
+        address_fields["cep"] = first_address.get('cep', 'N/D')
+        address_fields["address_original"] = first_address.get('address', 'N/D')
+
+    # Formata a string de Rua/Número/Complemento para uma coluna mais legível
+    street_number_part = f"{address_fields['publicPlace']}"
+    if address_fields['addressNumber'] and address_fields['addressNumber'] != 'S/N':
+        street_number_part += f", {address_fields['addressNumber']}"
+    if address_fields['complement']:
+        street_number_part += f" ({address_fields['complement']})"
+
+    # --- 2. Extração de Contatos Principais (O primeiro encontrado) ---
+    phone_number = phones[0]['number'] if phones and phones[0].get('number') else "N/D"
+    email_address = emails[0]['email'] if emails and emails[0].get('email') else "N/D"
+
+    # Adiciona a linha de dados ao DataFrame
+    extracted_data.append({
+        "code": p_code,
+        "cnpj": p_cnpj,
+        "name": p_name,
+        "Nome_Fantasia": p_fantasy_name,
+        
+        # Campos de Endereço Formatado (Primeiro Endereço)
+        "Numero_Complemento": street_number_part,
+        "Bairro": address_fields["neighborhood"],
+        "Cidade_UF": f"{address_fields['cityName']}-{address_fields['stateAbbreviation']}",
+        "CEP": address_fields["cep"],
+        "Endereco": address_fields["address_original"], 
+        
+        # Contatos
+        "Contato": phone_number,
+        "Email": email_address,
+    })
+
+# DataFrame montado uma vez só, com todos os registros
+df_all_main = pd.DataFrame(extracted_data)
+print(f"✅ {len(df_all_main)} registro(s) encontrado(s) e normalizado(s).")
+missing = set(person_code_list) - {c for chunk, _ in failed for c in chunk}
+if not df_all_main.empty:
+    missing -= set(df_all_main["code"])
+if missing:
+    print(f"⚠️ Nenhum registro encontrado para {len(missing)} código(s).")
 
 # ---
-## 💾 Consolidação Final de Debug
-if all_raw_data:
-    consolidated_debug_file = f"DEBUG_CONSOLIDADO_LEGAL_ENTITIES_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    try:
-        with open(consolidated_debug_file, "w", encoding="utf-8") as f:
-            # Salva a lista de todos os itens brutos consultados
-            json.dump(all_raw_data, f, ensure_ascii=False, indent=2)
-        print(f"\n✨ JSON de debug CONSOLIDADO salvo (Todos os {len(all_raw_data)} itens) em: {consolidated_debug_file}")
-    except Exception as e:
-        print(f"\n❌ Erro ao salvar JSON consolidado: {e}")
+## 💾 Consolidação Final de Debug (só com TOTVS_DEBUG=1)
+debug.capture(all_raw_data, tag="legal_entities_consolidated", total=len(all_raw_data))
 
 # ---
 ## 📝 EXPORTAÇÃO PARA EXCEL (Uma única aba)
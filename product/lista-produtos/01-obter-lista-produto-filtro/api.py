@@ -1,14 +1,21 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
-import time
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from auth.config import TOKEN
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("01-obter-lista-produto-filtro")
 
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/product/v2/product-codes/search"
@@ -57,7 +64,7 @@ while True:
     payload["pageSize"] = page_size
 
     try:
-        response = requests.post(URL, headers=headers, json=payload, timeout=60)
+        response = rate_limited(session.post, URL, headers=headers, json=payload, timeout=60)
         response.raise_for_status()
         data = response.json()
     except requests.exceptions.RequestException as e:
@@ -67,10 +74,7 @@ while True:
     # === DEBUG PARCIAL ===
     print(f"📡 Status HTTP: {response.status_code}")
     if page == 1:
-        debug_file = f"debug_product_codes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(debug_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"💾 Debug salvo em: {debug_file}")
+        debug.capture(data, tag="product_codes", page=page)
 
     items = data.get("items", [])
     if not items:
@@ -84,7 +88,6 @@ while True:
         break
 
     page += 1
-    time.sleep(0.2)
 
 print(f"\n✅ Total de produtos retornados: {len(all_items)}")
 
@@ -1,18 +1,38 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
-import time
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from auth.config import TOKEN
+from totvs.branches import fan_out, token_branches
+from totvs.checkpoint import PageCheckpoint
+from totvs.columnar import PageTables
+from totvs.mapping import FieldMap
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.warehouse import write_table
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("02-lista-produto-preco-saldo")
+
+# === FUNÇÕES AUXILIARES ===
+def estoque_atual(b):
+    return (
+        (b.get("stock") or 0)
+        + (b.get("inputTransaction") or 0)
+        - (b.get("outputTransaction") or 0)
+        - (b.get("salesOrder") or 0)
+    )
 
-# === FUNÇÃO AUXILIAR ===
-def safe_list(value):
-    return value if isinstance(value, list) else []
+def total_geral(item):
+    return sum((estoque_atual(b) for b in item.get("balances") or []), 0)
 
 # ============================================
 # CONFIGURAÇÕES
@@ -23,157 +43,179 @@ headers = {
     "Content-Type": "application/json"
 }
 
-BRANCH_CODE = 1        # filial real
+BRANCH_CODES = token_branches()  # filiais liberadas no token (TOTVS_BRANCHES sobrepõe)
+BRANCH_WORKERS = 4     # filiais consultadas em paralelo
 STOCK_CODE = 1         # código do estoque físico
 PAGE_SIZE = 1000       # máximo permitido pela API
+CHECKPOINT_MAX_AGE = 2 * 3600  # saldo é uma foto do momento: checkpoint vale 2 h
 
-print("🚀 Iniciando consulta de estoque atual TOTVS...")
+WRITE_WAREHOUSE = True # Parquet + DuckDB em warehouse/
+EXPORT_EXCEL = True    # Excel é opcional
 
 # ============================================
-# PAGINAÇÃO
+# MAPEAMENTO DAS TABELAS (explodidas página a página)
 # ============================================
-all_items = []
-page = 1
+PRODUTOS = FieldMap({
+    "productCode": "productCode",
+    "productName": "productName",
+    "productSku": "productSku",
+    "referenceCode": "referenceCode",
+    "colorCode": "colorCode",
+    "colorName": "colorName",
+    "sizeName": "sizeName",
+    "maxChangeFilterDate": "maxChangeFilterDate",
+})
+
+SALDOS = FieldMap(
+    {"productCode": "productCode"},
+    explode=("balances", {
+        "stock": "stock",
+        "salesOrder": "salesOrder",
+        "inputTransaction": "inputTransaction",
+        "outputTransaction": "outputTransaction",
+        "estoqueAtual": estoque_atual,
+        "productionPlanning": "productionPlanning",
+        "purchaseOrder": "purchaseOrder",
+        "productionOrderProgress": "productionOrderProgress",
+        "productionOrderWaitLib": "productionOrderWaitLib",
+        "stockTemp": "stockTemp",
+    }),
+    keep_empty=False,
+)
+
+LOCALIZACOES = FieldMap(
+    {"productCode": "productCode"},
+    explode=("locations", {
+        "branchCode": "branchCode",
+        "locationCode": "locationCode",
+        "description": "description",
+    }),
+    keep_empty=False,
+)
+
+SALDOS_CONSOLIDADOS = FieldMap({
+    "productCode": "productCode",
+    "totalBalanceAllBranches": total_geral,
+})
+
+TABLES = PageTables({
+    "produtos": PRODUTOS,
+    "saldos": SALDOS,
+    "localizacoes": LOCALIZACOES,
+    "consolidados": SALDOS_CONSOLIDADOS,
+})
 
-while True:
-    payload = {
+# ============================================
+# PAGINAÇÃO (uma filial)
+# ============================================
+def payload_filial(branch):
+    return {
         "filter": {
             "change": {
                 "startDate": "2025-12-09T00:00:00Z",
                 "endDate": "2025-12-09T23:59:59Z",
                 "inBranchInfo": True,
-                "branchInfoCodeList": [1],
+                "branchInfoCodeList": [branch],
 
                 "inStock": True,
-                "branchStockCodeList": [1],
-                
-                "stockCodeList": [1],
+                "branchStockCodeList": [branch],
+
+                "stockCodeList": [STOCK_CODE],
                 "hasStock": True
             },
-         
-             
         },
         "option": {
             "balances": [
                 {
-                    "branchCode": 1,
-                    "stockCodeList": [1],
+                    "branchCode": branch,
+                    "stockCodeList": [STOCK_CODE],
                 }
             ]
         },
         "order": "productCode",
-        "page": page,
         "pageSize": PAGE_SIZE
     }
 
-    print(f"📄 Consultando página {page}...")
-
-    try:
-        response = requests.post(URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Erro ao conectar na API: {e}")
-        sys.exit(1)
-
-    items = data.get("items", [])
 
-    if not items:
-        print("⚠️ Nenhum dado encontrado nesta página.")
-        break
+def extrair_filial(branch):
+    tables = TABLES.copy()
+    payload_base = payload_filial(branch)
+    total_items = 0
+    page = 1
 
-    all_items.extend(items)
-
-    if not data.get("hasNext", False):
-        break
+    # Páginas já baixadas ficam em .checkpoints/: se a execução falhar no meio,
+    # rodar de novo (dentro de CHECKPOINT_MAX_AGE) retoma da página que falhou.
+    checkpoint = PageCheckpoint(
+        "estoque_atual", {"url": URL, "payload": payload_base}, max_age=CHECKPOINT_MAX_AGE
+    )
 
-    page += 1
-    time.sleep(0.2)
+    while True:
+        payload = {**payload_base, "page": page}
 
-# ============================================
-# RESULTADO
-# ============================================
-print(f"\n✅ Total de produtos retornados: {len(all_items)}")
+        data = checkpoint.load(page)
+        if data is not None:
+            print(f"♻️ Filial {branch}: página {page} recuperada do checkpoint.")
+        else:
+            print(f"📄 Filial {branch}: consultando página {page}...")
 
-debug_file = f"debug_balances_{datetime.now():%Y%m%d_%H%M%S}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(all_items, f, ensure_ascii=False, indent=2)
+            try:
+                response = rate_limited(session.post, URL, headers=headers, json=payload, timeout=60)
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.RequestException as e:
+                print(f"💾 Filial {branch}: páginas 1..{page - 1} salvas em {checkpoint.dir}; rode novamente para retomar da página {page}.")
+                raise RuntimeError(f"erro ao conectar na API: {e}") from e
 
-print(f"💾 Debug salvo em: {debug_file}")
+            checkpoint.save(page, data)
 
-# ============================================
-# ESTRUTURAÇÃO DOS DADOS
-# ============================================
-produtos = []
-saldos = []
-localizacoes = []
-saldos_consolidados = []
+        items = data.get("items", [])
 
-for item in all_items:
+        if not items:
+            print(f"⚠️ Filial {branch}: nenhum dado encontrado nesta página.")
+            break
 
-    produtos.append({
-        "productCode": item.get("productCode"),
-        "productName": item.get("productName"),
-        "productSku": item.get("productSku"),
-        "referenceCode": item.get("referenceCode"),
-        "colorCode": item.get("colorCode"),
-        "colorName": item.get("colorName"),
-        "sizeName": item.get("sizeName"),
-        "maxChangeFilterDate": item.get("maxChangeFilterDate")
-    })
+        total_items += len(items)
+        tables.add_page(items)
+        debug.capture(items, tag="balances", page=page, branch=branch)
 
-    total_geral = 0
+        if not data.get("hasNext", False):
+            break
 
-    for b in safe_list(item.get("balances")):
+        page += 1
 
-        estoque_atual = (
-            (b.get("stock") or 0)
-            + (b.get("inputTransaction") or 0)
-            - (b.get("outputTransaction") or 0)
-            - (b.get("salesOrder") or 0)
-        )
+    checkpoint.clear()
+    print(f"✅ Filial {branch}: {total_items} produtos")
+    return tables.frames()
 
-        total_geral += estoque_atual
 
-        saldos.append({
-            "productCode": item.get("productCode"),
-            "stock": b.get("stock"),
-            "salesOrder": b.get("salesOrder"),
-            "inputTransaction": b.get("inputTransaction"),
-            "outputTransaction": b.get("outputTransaction"),
-            "estoqueAtual": estoque_atual,
-            "productionPlanning": b.get("productionPlanning"),
-            "purchaseOrder": b.get("purchaseOrder"),
-            "productionOrderProgress": b.get("productionOrderProgress"),
-            "productionOrderWaitLib": b.get("productionOrderWaitLib"),
-            "stockTemp": b.get("stockTemp"),
-        })
+print("🚀 Iniciando consulta de estoque atual TOTVS...")
 
-    for loc in safe_list(item.get("locations")):
-        localizacoes.append({
-            "productCode": item.get("productCode"),
-            "branchCode": loc.get("branchCode"),
-            "locationCode": loc.get("locationCode"),
-            "description": loc.get("description")
-        })
+# ============================================
+# TODAS AS FILIAIS (em paralelo, unidas com a coluna branchCode)
+# ============================================
+try:
+    frames = fan_out(extrair_filial, BRANCH_CODES, max_workers=BRANCH_WORKERS, column="branchCode")
+except RuntimeError as e:
+    print(f"❌ {e}")
+    sys.exit(1)
 
-    saldos_consolidados.append({
-        "productCode": item.get("productCode"),
-        "totalBalanceAllBranches": total_geral
-    })
+# ============================================
+# RESULTADO
+# ============================================
+print(f"\n✅ Total de produtos retornados: {len(frames['produtos'])}")
 
 # ============================================
 # DATAFRAMES
 # ============================================
-df_produtos = pd.DataFrame(produtos)
-df_saldos = pd.DataFrame(saldos)
-df_localizacoes = pd.DataFrame(localizacoes)
-df_consolidados = pd.DataFrame(saldos_consolidados)
+df_produtos = frames["produtos"]
+df_saldos = frames["saldos"]
+df_localizacoes = frames["localizacoes"]
+df_consolidados = frames["consolidados"]
 
 # Resumo por produto
 if not df_saldos.empty:
     df_resumo = (
-        df_saldos.groupby("productCode")
+        df_saldos.groupby(["branchCode", "productCode"])
         .agg({
             "estoqueAtual": "sum",
             "stock": "sum",
@@ -186,18 +228,33 @@ else:
     df_resumo = pd.DataFrame()
 
 # ============================================
-# EXPORTAÇÃO EXCEL
+# ARMAZÉM LOCAL (foto diária dos saldos por filial)
+# ============================================
+if WRITE_WAREHOUSE and not df_saldos.empty:
+    snapshot_date = datetime.now().strftime("%Y-%m-%d")
+    write_table(
+        df_saldos.assign(snapshotDate=snapshot_date),
+        "saldos",
+        branch_col="branchCode",
+        date_col="snapshotDate",
+    )
+    write_table(df_produtos, "produtos_saldo")
+    print(f"\n✅ Parquet atualizado em: {os.path.abspath('warehouse')}")
+
+# ============================================
+# EXPORTAÇÃO EXCEL (opcional)
 # ============================================
-excel_file = f"estoque_atual_totvs_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
+if EXPORT_EXCEL:
+    excel_file = f"estoque_atual_totvs_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
 
-with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
-    df_produtos.to_excel(writer, index=False, sheet_name="Produtos")
-    df_saldos.to_excel(writer, index=False, sheet_name="Saldos_Detalhados")
-    df_localizacoes.to_excel(writer, index=False, sheet_name="Localizacoes")
-    df_consolidados.to_excel(writer, index=False, sheet_name="Consolidado")
-    df_resumo.to_excel(writer, index=False, sheet_name="Resumo_Estoque")
+    with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
+        df_produtos.to_excel(writer, index=False, sheet_name="Produtos")
+        df_saldos.to_excel(writer, index=False, sheet_name="Saldos_Detalhados")
+        df_localizacoes.to_excel(writer, index=False, sheet_name="Localizacoes")
+        df_consolidados.to_excel(writer, index=False, sheet_name="Consolidado")
+        df_resumo.to_excel(writer, index=False, sheet_name="Resumo_Estoque")
 
-print(f"\n✅ Relatório gerado com sucesso: {excel_file}")
+    print(f"\n✅ Relatório gerado com sucesso: {excel_file}")
 print(f"📦 Produtos: {len(df_produtos)}")
 print(f"📊 Registros de saldos: {len(df_saldos)}")
 print(f"📍 Localizações: {len(df_localizacoes)}")
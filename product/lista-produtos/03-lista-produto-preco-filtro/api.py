@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -9,6 +8,16 @@ import time
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.columnar import PageTables
+from totvs.mapping import FieldMap
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("03-lista-produto-preco-filtro")
 
 # === FUNÇÕES AUXILIARES (ADICIONADAS PARA CORRIGIR O ERRO) ===
 def safe_list(value):
@@ -19,14 +28,97 @@ def safe_dict(value):
     """Garante que o valor é um dicionário ou retorna um dicionário vazio."""
     return value if isinstance(value, dict) else {}
 
+def join_branchs(promo):
+    return ", ".join(map(str, safe_list(promo.get("branchs"))))
+
+def digital_promotions(item):
+    """Promoção digital principal seguida das outras promoções digitais."""
+    promo_digital = safe_dict(item.get("digitalPromotionPrices"))
+    if not promo_digital:
+        return []
+    rows = [dict(promo_digital, type="Principal")]
+    for outra_digital in safe_list(promo_digital.get("informationOtherDigitalPromotions")):
+        rows.append(dict(outra_digital, type="Outra Digital"))
+    return rows
+
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/product/v2/prices/search"
+PAGE_SIZE = 1000  # produtos por página (cada página vira um RecordBatch por tabela)
 
 headers = {
     "Authorization": f"Bearer {TOKEN}",
     "Content-Type": "application/json"
 }
 
+# === MAPEAMENTO DAS TABELAS ===
+PRODUTOS = FieldMap({
+    "productCode": "productCode",
+    "productName": "productName",
+    "productSku": "productSku",
+    "referenceCode": "referenceCode",
+    "colorCode": "colorCode",
+    "colorName": "colorName",
+    "sizeName": "sizeName",
+    "maxChangeFilterDate": "maxChangeFilterDate",
+})
+
+# Registro principal de Preços (aba 'Precos')
+PRECOS = FieldMap(
+    {"productCode": "productCode"},
+    explode=("prices", {
+        "branchCode": "branchCode",
+        "priceCode": "priceCode",
+        "priceName": "priceName",
+        "price": "price",
+        "promotionalPrice": "promotionalPrice",
+        "promo_branchCode": "promotionalInformation.branchCode",
+        "promo_code": "promotionalInformation.code",
+        "promo_description": "promotionalInformation.description",
+        "promo_startDate": "promotionalInformation.startDate",
+        "promo_endDate": "promotionalInformation.endDate",
+    }),
+    keep_empty=False,
+)
+
+# Outras promoções de cada preço (aba 'Outras_Promocoes')
+OUTRAS_PROMOCOES = FieldMap(
+    {"productCode": "productCode"},
+    explode=[
+        ("prices", {"priceCode": "priceCode"}),  # Associa à tabela de Preços
+        ("informationOtherPromotions", {
+            "branchCode": "branchCode",
+            "promo_code": "code",
+            "promo_description": "description",
+            "promo_startDate": "startDate",
+            "promo_endDate": "endDate",
+            "price": "price",
+        }),
+    ],
+    keep_empty=False,
+)
+
+# Promoção digital principal + outras digitais (aba 'Promocoes_Digitais')
+PROMOCOES_DIGITAIS = FieldMap(
+    {"productCode": "productCode"},
+    explode=(digital_promotions, {
+        "type": "type",
+        "code": "code",
+        "description": "description",
+        "startDate": "startDate",
+        "endDate": "endDate",
+        "price": "price",
+        "branchs": join_branchs,
+    }),
+    keep_empty=False,
+)
+
+tables = PageTables({
+    "produtos": PRODUTOS,
+    "precos": PRECOS,
+    "outras_promocoes": OUTRAS_PROMOCOES,
+    "promocoes_digitais": PROMOCOES_DIGITAIS,
+})
+
 print("🚀 Consultando preços de produtos...")
 
 payload = {
@@ -57,125 +149,48 @@ payload = {
     "expand": "digitalPromotionPrices" 
 }
 
-# === REQUISIÇÃO POST ===
-try:
-    response = requests.post(URL, headers=headers, json=payload, timeout=60)
-except requests.exceptions.RequestException as e:
-    print(f"❌ Erro na conexão: {e}")
-    sys.exit(1)
-
-print(f"📡 Status HTTP: {response.status_code}")
-if response.status_code != 200:
-    print("❌ Erro na resposta da API:")
-    print(response.text)
-    sys.exit(1)
-
-# === TRATAMENTO DO JSON ===
-try:
-    data = response.json()
-except requests.exceptions.JSONDecodeError:
-    print("❌ Erro ao decodificar JSON da resposta.")
-    sys.exit(1)
-
-# === SALVA DEBUG ===
-debug_file = f"debug_product_prices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
-
-# === PROCESSA RESPOSTA ===
-items = data.get("items", [])
-if not items:
+# === REQUISIÇÃO POST (PÁGINA A PÁGINA) ===
+page = 1
+while True:
+    try:
+        response = session.post(URL, headers=headers, json={**payload, "page": page, "pageSize": PAGE_SIZE}, timeout=60)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Erro na conexão: {e}")
+        sys.exit(1)
+
+    print(f"📡 Página {page} - Status HTTP: {response.status_code}")
+    if response.status_code != 200:
+        print("❌ Erro na resposta da API:")
+        print(response.text)
+        sys.exit(1)
+
+    # === TRATAMENTO DO JSON ===
+    try:
+        data = response.json()
+    except requests.exceptions.JSONDecodeError:
+        print("❌ Erro ao decodificar JSON da resposta.")
+        sys.exit(1)
+
+    # === SALVA DEBUG ===
+    debug.capture(data, tag="product_prices", page=page)
+
+    # === PROCESSA A PÁGINA (um RecordBatch por tabela) ===
+    items = data.get("items", [])
+    tables.add_page(items)
+
+    if not items or not data.get("hasNext", False):
+        break
+    page += 1
+
+if not tables.rows("produtos"):
     print("⚠️ Nenhum produto retornado pela API.")
     sys.exit(0)
 
-# Inicializa novas listas para armazenar os dados complexos
-produtos = []
-precos = []
-outras_promocoes = []
-promocoes_digitais = []
-
-for item in items:
-    product_code = item.get("productCode")
-
-    # === TABELA PRINCIPAL: PRODUTOS ===
-    produtos.append({
-        "productCode": product_code,
-        "productName": item.get("productName"),
-        "productSku": item.get("productSku"),
-        "referenceCode": item.get("referenceCode"),
-        "colorCode": item.get("colorCode"),
-        "colorName": item.get("colorName"),
-        "sizeName": item.get("sizeName"),
-        "maxChangeFilterDate": item.get("maxChangeFilterDate")
-    })
-
-    # === PREÇOS E PROMOÇÕES REGULARES ===
-    for preco in safe_list(item.get("prices")):
-        promo_info = safe_dict(preco.get("promotionalInformation"))
-
-        # Registro principal de Preços (aba 'Precos')
-        precos.append({
-            "productCode": product_code,
-            "branchCode": preco.get("branchCode"),
-            "priceCode": preco.get("priceCode"),
-            "priceName": preco.get("priceName"),
-            "price": preco.get("price"),
-            "promotionalPrice": preco.get("promotionalPrice"),
-            "promo_branchCode": promo_info.get("branchCode"),
-            "promo_code": promo_info.get("code"),
-            "promo_description": promo_info.get("description"),
-            "promo_startDate": promo_info.get("startDate"),
-            "promo_endDate": promo_info.get("endDate"),
-        })
-
-        # Lista de Outras Promoções (aba 'Outras_Promocoes')
-        for outra_promo in safe_list(preco.get("informationOtherPromotions")):
-            outras_promocoes.append({
-                "productCode": product_code,
-                "priceCode": preco.get("priceCode"), # Associa à tabela de Preços
-                "branchCode": outra_promo.get("branchCode"),
-                "promo_code": outra_promo.get("code"),
-                "promo_description": outra_promo.get("description"),
-                "promo_startDate": outra_promo.get("startDate"),
-                "promo_endDate": outra_promo.get("endDate"),
-                "price": outra_promo.get("price")
-            })
-
-    # === PROMOÇÕES DIGITAIS ===
-    promo_digital = safe_dict(item.get("digitalPromotionPrices"))
-    if promo_digital:
-        # Registro principal de Promoção Digital (aba 'Promocoes_Digitais')
-        promocoes_digitais.append({
-            "productCode": product_code,
-            "type": "Principal",
-            "code": promo_digital.get("code"),
-            "description": promo_digital.get("description"),
-            "startDate": promo_digital.get("startDate"),
-            "endDate": promo_digital.get("endDate"),
-            "price": promo_digital.get("price"),
-            "branchs": ", ".join(map(str, safe_list(promo_digital.get("branchs"))))
-        })
-
-        # Lista de Outras Promoções Digitais
-        for outra_digital in safe_list(promo_digital.get("informationOtherDigitalPromotions")):
-            promocoes_digitais.append({
-                "productCode": product_code,
-                "type": "Outra Digital",
-                "code": outra_digital.get("code"),
-                "description": outra_digital.get("description"),
-                "startDate": outra_digital.get("startDate"),
-                "endDate": outra_digital.get("endDate"),
-                "price": outra_digital.get("price"),
-                "branchs": ", ".join(map(str, safe_list(outra_digital.get("branchs"))))
-            })
-
-
 # === CONVERTE EM DATAFRAMES ===
-df_produtos = pd.DataFrame(produtos)
-df_precos = pd.DataFrame(precos)
-df_outras_promocoes = pd.DataFrame(outras_promocoes)
-df_promocoes_digitais = pd.DataFrame(promocoes_digitais)
+df_produtos = tables.frame("produtos")
+df_precos = tables.frame("precos")
+df_outras_promocoes = tables.frame("outras_promocoes")
+df_promocoes_digitais = tables.frame("promocoes_digitais")
 
 
 # === EXPORTA PARA EXCEL ===
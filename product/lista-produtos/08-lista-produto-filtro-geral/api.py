@@ -1,6 +1,4 @@
-import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -9,6 +7,14 @@ import os
 # Assumindo que o path está correto
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("08-lista-produto-filtro-geral")
 
 # === FUNÇÕES AUXILIARES ===
 def safe_list(value):
@@ -53,7 +59,7 @@ print("🚀 Consultando produtos...")
 
 # === REQUISIÇÃO ===
 try:
-    r = requests.post(URL, headers=headers, json=payload, timeout=90)
+    r = session.post(URL, headers=headers, json=payload, timeout=90)
     r.raise_for_status()
     data = r.json()
 except Exception as e:
@@ -61,10 +67,7 @@ except Exception as e:
     sys.exit(1)
 
 # === DEBUG ===
-debug_file = f"debug_products_{datetime.now():%Y%m%d_%H%M%S}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(data, tag="products")
 
 items = data.get("items", [])
 if not items:
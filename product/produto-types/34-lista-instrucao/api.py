@@ -1,14 +1,21 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
-import time
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from auth.config import TOKEN
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("34-lista-instrucao")
 
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/product/v2/instruction-items"
@@ -35,7 +42,7 @@ while True:
     }
 
     try:
-        response = requests.get(URL, headers=HEADERS, params=params, timeout=60)
+        response = rate_limited(session.get, URL, headers=HEADERS, params=params, timeout=60)
         response.raise_for_status()
         data = response.json()
     except requests.exceptions.RequestException as e:
@@ -54,15 +61,11 @@ while True:
         break
 
     page += 1
-    time.sleep(0.3)  # pequena pausa para evitar bloqueio
 
 print(f"✅ Total de itens retornados: {len(all_items)}")
 
 # === SALVA DEBUG ===
-debug_file = f"debug_instruction_items_{datetime.now():%Y%m%d_%H%M%S}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(all_items, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(all_items, tag="instruction_items")
 
 # === TRATAMENTO DOS DADOS ===
 instruction_items = []
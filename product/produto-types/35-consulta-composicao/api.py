@@ -1,14 +1,21 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
-import time
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("35-consulta-composicao")
 
 # === FUNÇÃO AUXILIAR ===
 def safe_list(value):
@@ -37,7 +44,7 @@ def get_all_compositions():
         }
 
         try:
-            response = requests.post(URL, headers=HEADERS, json=payload, timeout=90)
+            response = rate_limited(session.post, URL, headers=HEADERS, json=payload, timeout=90)
         except requests.exceptions.RequestException as e:
             print(f"❌ Erro de conexão: {e}")
             break
@@ -59,7 +66,6 @@ def get_all_compositions():
             break
 
         page += 1
-        time.sleep(0.3)
 
     return todos_itens
 
@@ -72,10 +78,7 @@ if not itens:
     sys.exit(0)
 
 # === SALVA DEBUG COMPLETO ===
-debug_file = f"debug_compositions_full_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(itens, f, ensure_ascii=False, indent=2)
-print(f"💾 Debug salvo em: {debug_file}")
+debug.capture(itens, tag="compositions_full")
 
 # === PROCESSA DADOS ===
 composicoes = []
@@ -1,6 +1,4 @@
-import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -8,6 +6,14 @@ import os
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("36-composicao-grupo-produto")
 
 
 # === FUNÇÃO AUXILIAR ===
@@ -40,7 +46,7 @@ while True:
     params["page"] = page
 
     try:
-        response = requests.get(URL, headers=headers, params=params, timeout=60)
+        response = session.get(URL, headers=headers, params=params, timeout=60)
         response.raise_for_status()
         data = response.json()
     except Exception as e:
@@ -48,10 +54,7 @@ while True:
         sys.exit(1)
 
     # === SALVA DEBUG POR PÁGINA ===
-    debug_name = f"debug_composition_group_{page}_{datetime.now():%Y%m%d_%H%M%S}.json"
-    with open(debug_name, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Debug salvo: {debug_name}")
+    debug.capture(data, tag="composition_group", page=page)
 
     items = data.get("items", [])
     all_items.extend(items)
@@ -1,14 +1,21 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
-import time
 
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("37-composicao-produto")
 
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/product/v2/composition-product"
@@ -32,7 +39,7 @@ def get_all_compositions():
         }
 
         try:
-            response = requests.get(URL, headers=HEADERS, params=params, timeout=90)
+            response = rate_limited(session.get, URL, headers=HEADERS, params=params, timeout=90)
         except requests.exceptions.RequestException as e:
             print(f"❌ Erro na conexão: {e}")
             break
@@ -53,7 +60,6 @@ def get_all_compositions():
             break
 
         page += 1
-        time.sleep(0.3)
 
     return all_items
 
@@ -67,12 +73,9 @@ if not items:
 
 # === GERA NOMES DE ARQUIVOS ===
 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-debug_file = f"debug_composition_product_{timestamp}.json"
 excel_file = f"composition_product_{timestamp}.xlsx"
 
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(items, f, ensure_ascii=False, indent=2)
-print(f"💾 JSON de debug salvo em: {debug_file}")
+debug.capture(items, tag="composition_product")
 
 produtos = []
 composicoes = []
@@ -1,116 +1,122 @@
-import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # === IMPORTA TOKEN ===
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from totvs.branches import fan_out, token_branches
+from totvs.kardex import discover_product_codes, extract_kardex, kardex_tables, refresh_kardex
+from totvs.rate_limit import AdaptiveConcurrency
+from totvs.warehouse import BatchSink, write_table
 
-URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/product/v2/kardex-movement"
+print("🚀 Iniciando consulta paralela de movimentação de estoque (Kardex)...")
 
-headers = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
+# === FILIAIS (claim `branches` do token; TOTVS_BRANCHES sobrepõe) ===
+branch_codes = token_branches()
+BRANCH_WORKERS = 4       # filiais em paralelo
 
-print("🚀 Iniciando consulta paralela de movimentação de estoque (Kardex)...")
+# === CONCORRÊNCIA (somando todas as filiais) ===
+# Começa com INITIAL_WORKERS chamadas simultâneas e ajusta pela latência/erros
+INITIAL_WORKERS = 4
+MAX_WORKERS = 32
+
+# === PRODUTOS ===
+# True: só os produtos com estoque alterado na filial dentro da janela
+# False: todos os produtos ativos da filial
+CHANGED_ONLY = True
 
-# === LISTA DE PRODUTOS ===
-product_codes = list(range(1, 99))
-branch_code = 2
+WRITE_WAREHOUSE = True   # Parquet (gravado a cada lote) + DuckDB em warehouse/
+EXPORT_EXCEL = True      # Excel é opcional (exige manter as tabelas em memória)
+
+# === MODO INCREMENTAL ===
+# True: cada filial continua de onde parou (saldos e marca d'água em .sync/),
+# pedindo só os produtos alterados desde então, até ontem 23:59:59. O saldo
+# corrente é recalculado localmente e conferido com o do servidor; start_date
+# vale só para a primeira execução e end_date é ignorado.
+INCREMENTAL = False
 
 # === INTERVALO DE DATAS ===
 start_date = "2025-10-30T00:00:00Z"
 end_date = "2025-10-31T23:59:59Z"
+period_tag = f"{start_date[:10]}_{end_date[:10]}"
 
-# === FUNÇÃO PARA CONSULTAR UM PRODUTO ===
-def consultar_produto(code):
-    params = {
-        "BranchCode": branch_code,
-        "ProductCode": code,
-        "StartDate": start_date,
-        "EndDate": end_date,
-        "BalanceType": 1
-    }
+gate = AdaptiveConcurrency(initial=INITIAL_WORKERS, maximum=MAX_WORKERS)
+
+
+def falhas(stats):
+    for code in stats["failed"]:
+        print(f"❌ Erro no produto {code} (filial {stats['branch']}): {stats['errors'][code]}")
+    return pd.DataFrame({"productCode": stats["failed"], "erro": [stats["errors"][c] for c in stats["failed"]]})
+
+
+# === UMA FILIAL (incremental) ===
+def atualizar_filial(branch_code):
+    produtos, movimentos, stats = refresh_kardex(branch_code, initial_start=start_date, gate=gate)
+    # o histórico (kardex_historico) é gravado uma vez só, depois de todas as filiais
+    return {"Produtos": produtos, "Movimentos": movimentos, "Falhas": falhas(stats)}
 
+
+# === UMA FILIAL ===
+def consultar_filial(branch_code):
+    if INCREMENTAL:
+        return atualizar_filial(branch_code)
+
+    if CHANGED_ONLY:
+        codes = discover_product_codes(branch_code, start_date, end_date)
+    else:
+        codes = discover_product_codes(branch_code)
+    print(f"🔎 Filial {branch_code}: {len(codes)} produtos a consultar")
+
+    tables = kardex_tables(keep=EXPORT_EXCEL)
+    sink = BatchSink({"branch": branch_code, "period": period_tag}) if WRITE_WAREHOUSE else None
     try:
-        response = requests.get(URL, headers=headers, params=params, timeout=60)
-        if response.status_code == 204:
-            return None, None
-        if response.status_code != 200:
-            return None, None
-
-        data = response.json()
-
-        produto = {
-            "branchCode": data.get("branchCode"),
-            "balanceType": data.get("balanceType"),
-            "productCode": data.get("productCode"),
-            "productDescription": data.get("productDescription"),
-            "groupSequenceCode": data.get("groupSequenceCode"),
-            "groupCode": data.get("groupCode"),
-            "groupDescription": data.get("groupDescription"),
-            "colorCode": data.get("colorCode"),
-            "colorDescription": data.get("colorDescription"),
-            "sizeDescription": data.get("sizeDescription"),
-            "previousBalance": data.get("previousBalance")
-        }
-
-        movimentos = []
-        for mv in data.get("movements", []):
-            movimentos.append({
-                "productCode": data.get("productCode"),
-                "movementDate": mv.get("movementDate"),
-                "historyCode": mv.get("historyCode"),
-                "historyDescription": mv.get("historyDescription"),
-                "operationCode": mv.get("operationCode"),
-                "operationDescription": mv.get("operationDescription"),
-                "documentType": mv.get("documentType"),
-                "documentNumber": mv.get("documentNumber"),
-                "unitValue": mv.get("unitValue"),
-                "inQuantity": mv.get("inQuantity"),
-                "outQuantity": mv.get("outQuantity"),
-                "balance": mv.get("balance")
-            })
-
-        return produto, movimentos
-
-    except Exception as e:
-        print(f"❌ Erro no produto {code}: {e}")
-        return None, None
-
-# === EXECUÇÃO PARALELA ===
-all_produtos = []
-all_movimentos = []
+        stats = extract_kardex(branch_code, codes, start_date, end_date, tables=tables, sink=sink, gate=gate)
+    except Exception:
+        if sink is not None:
+            sink.abort()
+        raise
+    if sink is not None:
+        sink.close()
+
+    return {
+        "Produtos": tables.frame("kardex_produtos"),
+        "Movimentos": tables.frame("kardex_movimentos"),
+        "Falhas": falhas(stats),
+    }
 
-start_time = time.time()
-with ThreadPoolExecutor(max_workers=20) as executor:  # 20 threads em paralelo
-    futures = {executor.submit(consultar_produto, code): code for code in product_codes}
 
-    for future in as_completed(futures):
-        code = futures[future]
-        produto, movimentos = future.result()
-        if produto:
-            all_produtos.append(produto)
-        if movimentos:
-            all_movimentos.extend(movimentos)
+# === TODAS AS FILIAIS (unidas com a coluna branchCode) ===
+start_time = time.time()
+try:
+    frames = fan_out(consultar_filial, branch_codes, max_workers=BRANCH_WORKERS, column="branchCode")
+except RuntimeError as e:
+    print(f"❌ {e}")
+    sys.exit(1)
 
 print(f"\n⏱️ Tempo total: {round(time.time() - start_time, 2)} segundos")
-print(f"📦 Produtos processados: {len(all_produtos)}")
 
 # === EXPORTAÇÃO ===
-df_produtos = pd.DataFrame(all_produtos)
-df_movimentos = pd.DataFrame(all_movimentos)
-
-excel_file = f"kardex_movement_parallel_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
-    df_produtos.to_excel(writer, index=False, sheet_name="Produtos")
-    if not df_movimentos.empty:
-        df_movimentos.to_excel(writer, index=False, sheet_name="Movimentos")
-
-print(f"✅ Arquivo gerado: {excel_file}")
+df_produtos = frames["Produtos"]
+df_movimentos = frames["Movimentos"]
+df_falhas = frames["Falhas"]
+
+if WRITE_WAREHOUSE:
+    if INCREMENTAL and not df_movimentos.empty:
+        # histórico por filial/dia (janelas de dias fechados não se sobrepõem)
+        write_table(df_movimentos, "kardex_historico", branch_col="branchCode", date_col="movementDate")
+    print(f"✅ Parquet atualizado em: {os.path.abspath('warehouse')}")
+
+if EXPORT_EXCEL:
+    print(f"📦 Produtos processados: {len(df_produtos)}")
+
+    excel_file = f"kardex_movement_parallel_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
+        df_produtos.to_excel(writer, index=False, sheet_name="Produtos")
+        if not df_movimentos.empty:
+            df_movimentos.to_excel(writer, index=False, sheet_name="Movimentos")
+        if not df_falhas.empty:
+            df_falhas.to_excel(writer, index=False, sheet_name="Falhas")
+
+    print(f"✅ Arquivo gerado: {excel_file}")
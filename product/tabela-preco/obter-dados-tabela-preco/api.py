@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime
 import sys
 import os
@@ -8,6 +7,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("obter-dados-tabela-preco")
 
 # === CONFIGURAÇÕES ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/product/v2/price-tables-headers"
@@ -25,7 +32,7 @@ PARAMS = {
 def fetch_page(url, headers, params):
     """Executa requisição GET com tratamento de erro."""
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=60)
+        response = session.get(url, headers=headers, params=params, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -55,10 +62,7 @@ def get_all_pages(url, headers, base_params):
 
 def save_debug(data, prefix):
     """Salva JSON bruto para análise posterior."""
-    filename = f"debug_{prefix}_{datetime.now():%Y%m%d_%H%M%S}.json"
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Debug salvo em: {filename}")
+    debug.capture(data, tag=prefix)
 
 def flatten_nested(df, field, sheet_name):
     """Desmembra listas aninhadas em DataFrames separados."""
@@ -1,19 +1,26 @@
 import requests
 import pandas as pd
-import json
 import sys
 import os
-import time
 from datetime import datetime
 
 # === CONFIGURAÇÃO DE PATH E TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN 
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Pedido_venda_NFE")
 
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sales-order/v2/invoices"
 HEADERS = {"Authorization": f"Bearer {TOKEN}"}
 
-def get_invoices(branch_code: int, order_codes: list[int], save_debug: bool = False, pause: float = 0.3) -> pd.DataFrame:
+def get_invoices(branch_code: int, order_codes: list[int]) -> pd.DataFrame:
     all_items = []
 
     for order in order_codes:
@@ -22,7 +29,7 @@ def get_invoices(branch_code: int, order_codes: list[int], save_debug: bool = Fa
         print(f"🔍 Buscando notas do pedido {order}...")
 
         try:
-            resp = requests.get(URL, params=params, headers=HEADERS, timeout=30)
+            resp = rate_limited(session.get, URL, params=params, headers=HEADERS, timeout=30)
         except requests.exceptions.RequestException as e:
             print(f"⚠️ Erro de conexão para o pedido {order}: {e}")
             continue
@@ -33,11 +40,7 @@ def get_invoices(branch_code: int, order_codes: list[int], save_debug: bool = Fa
 
         data = resp.json()
 
-        if save_debug:
-            debug_file = f"debug_invoices_order_{order}.json"
-            with open(debug_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"💾 JSON salvo: {debug_file}")
+        debug.capture(data, tag="invoices_order", order=order)
 
         invoices = data.get("invoices", [])
         if not invoices:
@@ -73,9 +76,6 @@ def get_invoices(branch_code: int, order_codes: list[int], save_debug: bool = Fa
                 "DataAutorizacao": elec.get("receivementDate")
             })
 
-        # Aguarda entre as requisições para evitar bloqueios
-        time.sleep(pause)
-
     if not all_items:
         print("⚠️ Nenhuma nota fiscal encontrada em nenhum pedido.")
         return pd.DataFrame()
@@ -99,7 +99,7 @@ if __name__ == "__main__":
     orders = [3188, 3217, 3225, 3240, 3251, 3252, 3255, 3258, 3259, 3260, 3261]
     filial = 3
 
-    df = get_invoices(branch_code=filial, order_codes=orders, save_debug=False)
+    df = get_invoices(branch_code=filial, order_codes=orders)
 
     if not df.empty:
         # Gera nome dinâmico com data e hora
@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 import sys
 import os
 from datetime import datetime
@@ -8,6 +7,14 @@ from datetime import datetime
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Pedido_venda_lista-pendent")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sales-order/v2/pending-items"
@@ -28,7 +35,7 @@ print("🚀 Iniciando consulta de Pedido de Venda (PEDFM001)...")
 print(f"📄 Parâmetros: {PARAMS}")
 
 # === REQUISIÇÃO ===
-response = requests.get(URL, headers=headers, params=PARAMS)
+response = session.get(URL, headers=headers, params=PARAMS)
 print(f"📡 Status HTTP: {response.status_code}")
 
 if response.status_code != 200:
@@ -43,16 +50,14 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === SALVA JSON PARA DEBUG ===
-debug_file = f"debug_order_{PARAMS.get('OrderCode', 'byId')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Resposta completa salva em: {debug_file}")
+debug.capture(data, tag="order")
 # === INSPEÇÃO DE CHAVES ===
-print("🔍 Estrutura principal da resposta:")
-for key, value in data.items():
-    tipo = type(value).__name__
-    tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-    print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+if debug.enabled:
+    print("🔍 Estrutura principal da resposta:")
+    for key, value in data.items():
+        tipo = type(value).__name__
+        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
 print("-" * 60)
 
 # === 1️⃣ DADOS PRINCIPAIS DO PEDIDO ===
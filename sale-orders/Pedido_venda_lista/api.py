@@ -1,103 +1,105 @@
 import requests
 from datetime import datetime, timezone
 import pandas as pd
-import json
 import sys
 import os
 
-# === CONFIGURAÇÕES DE PATH E TOKEN ===
+# === CONFIGURAÇÕES DE PATH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+from totvs.sync import SyncStore, filter_key, sync_endpoint
+from totvs.debug_capture import DebugCapture
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Pedido_venda_lista")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sales-order/v2/orders/search"
-HEADERS = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
 
-page = 1
 page_size = 200
 all_items = []
 
-while True:
-    payload = {
-        "filter": {
-            "change": {
-                "startDate": "2025-01-01T00:00:00Z",
-                "endDate": "2025-10-26T23:59:59Z",
-            },
-            "branchCodeList": [2],  # ajuste conforme sua filial
-        },
-    }
-
-    resp = requests.post(URL, headers=HEADERS, json=payload)
-    print(f"\n📄 Página {page} | Status: {resp.status_code}")
-
-    if resp.status_code != 200:
-        print("❌ Erro na requisição:", resp.text)
-        break
+# Filtro fixo; a janela filter.change.startDate/endDate é preenchida pelo
+# sync: na 1ª execução desde INITIAL_START, depois só o que mudou desde a
+# última maxChangeFilterDate vista.
+payload = {
+    "filter": {
+        "branchCodeList": [2],  # ajuste conforme sua filial
+    },
+}
+INITIAL_START = "2025-01-01T00:00:00Z"
+# Uma cópia local por filtro: exporta só os pedidos da(s) filial(is) pedida(s),
+# não tudo que já foi sincronizado com outros filtros
+DATASET = f"sales_orders_{filter_key(payload)[:12]}"
 
-    data = resp.json()
 
+def save_debug(page, data):
     # === DEBUG: salvar JSON cru para inspeção se necessário ===
-    debug_file = f"debug_orders_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 JSON cru salvo em: {debug_file}")
-
-    orders = data.get("items", [])
-    if not orders:
-        print("⚠️ Nenhum pedido encontrado nesta página.")
-        break
-
-    for order in orders:
-        # ⚡ Status original direto da API
-        status = order.get("statusOrder")
-
-        all_items.append({
-            "Filial": order.get("branchCode"),
-            "Pedido": order.get("orderCode"),
-            "OrderID": order.get("orderId"),
-            "CustomerOrderCode": order.get("customerOrderCode"),
-            "DataInsercao": order.get("insertDate"),
-            "DataPedido": order.get("orderDate"),
-            "DataChegada": order.get("arrivalDate"),
-            "DataUltimaAlteracao": order.get("maxChangeFilterDate"),
-            "Cliente": order.get("customerName"),
-            "CPF_CNPJ_Cliente": order.get("customerCpfCnpj"),
-            "CodigoCliente": order.get("customerCode"),
-            "Representante": order.get("representativeName"),
-            "CodigoRepresentante": order.get("representativeCode"),
-            "Operacao": order.get("operationName"),
-            "CodigoOperacao": order.get("operationCode"),
-            "CondicaoPagamento": order.get("paymentConditionName"),
-            "CodigoCondicaoPagamento": order.get("paymentConditionCode"),
-            "Quantidade": order.get("quantity"),
-            "ValorBruto": order.get("grossValue"),
-            "ValorDesconto": order.get("discountValue"),
-            "ValorLiquido": order.get("netValue"),
-            "ValorFrete": order.get("freightValue"),
-            "TipoFrete": order.get("freightType"),
-            "CodigoTransportadora": order.get("shippingCompanyCode"),
-            "NomeTransportadora": order.get("shippingCompanyName"),
-            "StatusPedido": status,  # ✅ pega exatamente da API
-            "TotalPedido": order.get("totalAmountOrder"),
-            "Experiencia": order.get("experienceType"),
-            "TemTransacaoPDV": order.get("hasPdvTransaction"),
-            "TemFinanceiroProcessado": order.get("hasFinancialProcessed"),
-            "CodigoIntegracao": order.get("integrationCode"),
-            "CodigoGuia": order.get("guideCode"),
-            "CPF_CNPJGuia": order.get("guideCpfCnpj"),
-            "VendedorCodigo": order.get("sellerCode"),
-            "VendedorCPF_CNPJ": order.get("sellerCpfCnpj"),
-        })
-
-    if not data.get("hasNext", False):
-        print("✅ Paginação finalizada.")
-        break
-
-    page += 1
+    debug.capture(data, tag="orders", page=page)
+
+
+store = SyncStore()
+try:
+    result = sync_endpoint(
+        URL,
+        payload,
+        dataset=DATASET,
+        key_fields=("branchCode", "orderCode"),
+        initial_start=INITIAL_START,
+        page_size=page_size,
+        store=store,
+        on_page=save_debug,
+    )
+    print(
+        f"🔄 Delta {result['start']} → {result['end']}: {result['fetched']} pedidos "
+        f"({result['inserted']} novos, {result['updated']} alterados)"
+    )
+except requests.exceptions.RequestException as e:
+    print("❌ Erro na requisição:", e)
+    print("⚠️ Exportando a cópia local sem o delta desta execução.")
+
+for order in store.load(DATASET):
+    # ⚡ Status original direto da API
+    status = order.get("statusOrder")
+
+    all_items.append({
+        "Filial": order.get("branchCode"),
+        "Pedido": order.get("orderCode"),
+        "OrderID": order.get("orderId"),
+        "CustomerOrderCode": order.get("customerOrderCode"),
+        "DataInsercao": order.get("insertDate"),
+        "DataPedido": order.get("orderDate"),
+        "DataChegada": order.get("arrivalDate"),
+        "DataUltimaAlteracao": order.get("maxChangeFilterDate"),
+        "Cliente": order.get("customerName"),
+        "CPF_CNPJ_Cliente": order.get("customerCpfCnpj"),
+        "CodigoCliente": order.get("customerCode"),
+        "Representante": order.get("representativeName"),
+        "CodigoRepresentante": order.get("representativeCode"),
+        "Operacao": order.get("operationName"),
+        "CodigoOperacao": order.get("operationCode"),
+        "CondicaoPagamento": order.get("paymentConditionName"),
+        "CodigoCondicaoPagamento": order.get("paymentConditionCode"),
+        "Quantidade": order.get("quantity"),
+        "ValorBruto": order.get("grossValue"),
+        "ValorDesconto": order.get("discountValue"),
+        "ValorLiquido": order.get("netValue"),
+        "ValorFrete": order.get("freightValue"),
+        "TipoFrete": order.get("freightType"),
+        "CodigoTransportadora": order.get("shippingCompanyCode"),
+        "NomeTransportadora": order.get("shippingCompanyName"),
+        "StatusPedido": status,  # ✅ pega exatamente da API
+        "TotalPedido": order.get("totalAmountOrder"),
+        "Experiencia": order.get("experienceType"),
+        "TemTransacaoPDV": order.get("hasPdvTransaction"),
+        "TemFinanceiroProcessado": order.get("hasFinancialProcessed"),
+        "CodigoIntegracao": order.get("integrationCode"),
+        "CodigoGuia": order.get("guideCode"),
+        "CPF_CNPJGuia": order.get("guideCpfCnpj"),
+        "VendedorCodigo": order.get("sellerCode"),
+        "VendedorCPF_CNPJ": order.get("sellerCpfCnpj"),
+    })
+
+store.close()
 
 # === EXPORTAÇÃO PARA EXCEL COM TRATAMENTO DE DATAS E VALORES ===
 df = pd.DataFrame(all_items)
@@ -8,6 +8,14 @@ from datetime import datetime
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Pedido_venda_suggestions")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sales-order/v2/billing-suggestions"
@@ -32,7 +40,7 @@ print("🚀 Iniciando consulta de Sugestões de Pedido (PEDFC001)...")
 print(f"📦 Filtros: {json.dumps(PARAMS, indent=2)}")
 
 # === REQUISIÇÃO ===
-response = requests.get(URL, headers=headers, params=PARAMS)
+response = session.get(URL, headers=headers, params=PARAMS)
 print(f"📡 Status HTTP: {response.status_code}")
 
 if response.status_code != 200:
@@ -47,17 +55,15 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === SALVA JSON PARA DEBUG ===
-debug_file = f"debug_suggestions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Resposta completa salva em: {debug_file}")
+debug.capture(data, tag="suggestions")
 
 # === INSPEÇÃO DE CHAVES ===
-print("🔍 Estrutura principal da resposta:")
-for key, value in data.items():
-    tipo = type(value).__name__
-    tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-    print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+if debug.enabled:
+    print("🔍 Estrutura principal da resposta:")
+    for key, value in data.items():
+        tipo = type(value).__name__
+        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
 print("-" * 60)
 
 # === 1️⃣ DADOS PRINCIPAIS ===
@@ -8,6 +8,16 @@ import os
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.checkpoint import PageCheckpoint
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import FieldMap
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-hours")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/hours/search"
@@ -28,9 +38,20 @@ FILTERS_PAYLOAD = {
 # === PAGINAÇÃO ===
 page = 1
 page_size = 500
-all_sales_details = []
+
+# === MAPEAMENTO DAS COLUNAS ===
+SALES_DETAILS = FieldMap({
+    "DataHoraVenda": "saledatetime_hour",
+    "Qtd": "invoice_qty",
+    "ValorLiquido": "invoice_value",
+})
 all_summaries = []
 
+# Páginas já baixadas ficam em .checkpoints/: se a consulta falhar no meio,
+# rodar de novo retoma a partir da página que falhou.
+checkpoint = PageCheckpoint("vendas_hora", {"url": URL, "filters": FILTERS_PAYLOAD, "pageSize": page_size})
+failed = False
+
 print("🚀 Iniciando consulta de Vendas por Hora (Detalhada + DEBUG)...")
 
 while True:
@@ -48,37 +69,48 @@ while True:
     if 'sellers' in FILTERS_PAYLOAD:
         payload['sellers'] = FILTERS_PAYLOAD['sellers']
 
-    print(f"\n⏰ Consultando página {page} de vendas detalhadas…")
-    resp = requests.post(URL, headers=headers, json=payload)
-    print(f"📡 Status: {resp.status_code}")
+    data = checkpoint.load(page)
+    if data is not None:
+        print(f"\n♻️ Página {page} recuperada do checkpoint.")
+    else:
+        print(f"\n⏰ Consultando página {page} de vendas detalhadas…")
+        try:
+            resp = session.post(URL, headers=headers, json=payload, timeout=60)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Erro de conexão: {e}")
+            failed = True
+            break
+        print(f"📡 Status: {resp.status_code}")
 
-    if resp.status_code != 200:
-        print("❌ Erro na requisição:", resp.text)
-        break
+        if resp.status_code != 200:
+            print("❌ Erro na requisição:", resp.text)
+            failed = True
+            break
 
-    try:
-        data = resp.json()
-    except requests.exceptions.JSONDecodeError:
-        print("❌ Erro ao decodificar JSON da resposta.")
-        break
+        try:
+            data = resp.json()
+        except requests.exceptions.JSONDecodeError:
+            print("❌ Erro ao decodificar JSON da resposta.")
+            failed = True
+            break
+
+        checkpoint.save(page, data)
 
     # === DEBUG: SALVAR RESPOSTA ===
-    debug_file = f"debug_response_sales_hour_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_sales_hour", page=page)
 
     # === DEBUG: EXIBIR ESTRUTURA ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    # === DEBUG: EXIBIR AMOSTRA ===
-    print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else "1"
+            print(f"   - {key}: {tipo} ({tam})")
+
+        # === DEBUG: EXIBIR AMOSTRA ===
+        print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
+        print("-" * 60)
 
     # === PROCESSAMENTO DE DADOS ===
     classification_items = data.get("dataRow", [])
@@ -97,12 +129,7 @@ while True:
         print("⚠️ Nenhuma venda encontrada nesta página.")
         break
 
-    for item in items_to_check:
-        all_sales_details.append({
-            "DataHoraVenda": item.get("saledatetime_hour"),
-            "Qtd": item.get("invoice_qty"),
-            "ValorLiquido": item.get("invoice_value"),
-        })
+    SALES_DETAILS.extend(items_to_check)
 
     # === PAGINAÇÃO ===
     total_pages = data.get("totalPages") or data.get("pages") or None
@@ -117,8 +144,13 @@ while True:
 
     page += 1
 
+if failed:
+    print(f"💾 Páginas 1..{page - 1} salvas em {checkpoint.dir}; rode novamente para retomar da página {page}.")
+else:
+    checkpoint.clear()
+
 # === EXPORTAÇÃO ===
-df_sales_detail = pd.DataFrame(all_sales_details)
+df_sales_detail = SALES_DETAILS.frame()
 df_summary = pd.DataFrame(all_summaries).drop_duplicates(subset=["InvoiceValue"])
 
 print("-" * 40)
@@ -8,6 +8,15 @@ import os
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import FieldMap
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-product-classific")
 
 # === CONFIGURAÇÃO DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/branch-ranking/search"
@@ -34,7 +43,24 @@ FILTERS_PAYLOAD = {
 # === PAGINAÇÃO ===
 page = 1
 page_size = 500
-all_sales_details = []
+
+# === MAPEAMENTO DAS COLUNAS ===
+SALES_DETAILS = FieldMap({
+    "BranchCode": "branchCode",
+    "BranchName": "branch_name",
+    "FaturaQty": "invoice_qty",
+    "ValorLiquido": "invoice_value",
+    "ItensQty": "itens_qty",
+    "TM": "tm",
+    "PA": "pa",
+    "PMPV": "pmpv",
+    "CashValor": "cash_value",
+    "PixValor": "pix_value",
+    "CreditoValor": "credit_value",
+    "DebitoValor": "debit_value",
+    "ValorParcela": "installment_value",
+    "OutroValor": "other_value",
+})
 all_summaries = []
 
 print("🚀 Iniciando consulta de Vendas Detalhadas (por Filial e Pagamento + DEBUG)...")
@@ -50,7 +76,7 @@ while True:
     }
 
     print(f"\n🏬 Consultando página {page} de detalhes de vendas…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -64,22 +90,20 @@ while True:
         break
 
     # === DEBUG: salvar resposta ===
-    debug_file = f"debug_response_branch_ranking_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_branch_ranking", page=page)
 
     # === DEBUG: exibir estrutura ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    # === DEBUG: amostra parcial do conteúdo ===
-    print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else "1"
+            print(f"   - {key}: {tipo} ({tam})")
+
+        # === DEBUG: amostra parcial do conteúdo ===
+        print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
+        print("-" * 60)
 
     # === PROCESSAMENTO DE DADOS ===
     detail_items = data.get("dataRow", [])
@@ -99,23 +123,7 @@ while True:
         break
 
     # Processa os itens detalhados
-    for item in detail_items:
-        all_sales_details.append({
-            "BranchCode": item.get("branchCode"),
-            "BranchName": item.get("branch_name"),
-            "FaturaQty": item.get("invoice_qty"),
-            "ValorLiquido": item.get("invoice_value"),
-            "ItensQty": item.get("itens_qty"),
-            "TM": item.get("tm"),
-            "PA": item.get("pa"),
-            "PMPV": item.get("pmpv"),
-            "CashValor": item.get("cash_value"),
-            "PixValor": item.get("pix_value"),
-            "CreditoValor": item.get("credit_value"),
-            "DebitoValor": item.get("debit_value"),
-            "ValorParcela": item.get("installment_value"),
-            "OutroValor": item.get("other_value"),
-        })
+    SALES_DETAILS.extend(detail_items)
 
     # === PAGINAÇÃO ===
     total_pages = data.get("totalPages") or data.get("pages") or None
@@ -131,7 +139,7 @@ while True:
     page += 1
 
 # === EXPORTAÇÃO ===
-df_details = pd.DataFrame(all_sales_details)
+df_details = SALES_DETAILS.frame()
 df_summary = pd.DataFrame(all_summaries)
 
 print("-" * 40)
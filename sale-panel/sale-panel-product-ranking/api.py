@@ -8,6 +8,15 @@ import os
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import FieldMap
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-product-ranking")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/product-classifications/search"
@@ -19,7 +28,14 @@ headers = {
 
 page = 1
 page_size = 100
-all_classification_details = []
+
+# === MAPEAMENTO DAS COLUNAS ===
+CLASSIFICATION_DETAILS = FieldMap({
+    "CodigoClassificacao": "classification_code",
+    "NomeClassificacao": "classification_name",
+    "ValorVenda": "invoice_value",
+    "QuantidadeItens": "item_quantity",
+})
 all_summaries = []
 
 print("🚀 Iniciando consulta de Vendas por Classificação de Produto (com DEBUG)...")
@@ -35,7 +51,7 @@ while True:
     }
 
     print(f"\n🏷️ Consultando página {page} de classificações…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status HTTP: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -49,22 +65,20 @@ while True:
         break
 
     # === DEBUG: salvar JSON cru ===
-    debug_file = f"debug_response_classification_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_classification", page=page)
 
     # === DEBUG: estrutura de chaves ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else 1
-        print(f"   - {key}: {tipo} ({tam})")
-
-    # === DEBUG: amostra parcial do JSON ===
-    print("🧩 Amostra (primeiros 1000 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else 1
+            print(f"   - {key}: {tipo} ({tam})")
+
+        # === DEBUG: amostra parcial do JSON ===
+        print("🧩 Amostra (primeiros 1000 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+        print("-" * 60)
 
     # === Processa dados ===
     classification_items = data.get("dataRow", [])
@@ -79,13 +93,7 @@ while True:
         print("⚠️ Nenhum dado encontrado nesta página.")
         break
 
-    for item in classification_items:
-        all_classification_details.append({
-            "CodigoClassificacao": item.get("classification_code"),
-            "NomeClassificacao": item.get("classification_name"),
-            "ValorVenda": item.get("invoice_value"),
-            "QuantidadeItens": item.get("item_quantity")
-        })
+    CLASSIFICATION_DETAILS.extend(classification_items)
 
     # === Controle de Paginação ===
     total_pages = data.get("totalPages") or data.get("pages") or None
@@ -101,7 +109,7 @@ while True:
     page += 1
 
 # === EXPORTAÇÃO ===
-df_details = pd.DataFrame(all_classification_details)
+df_details = CLASSIFICATION_DETAILS.frame()
 df_summary = pd.DataFrame(all_summaries)
 
 print("=" * 50)
@@ -1,13 +1,19 @@
-import requests
 import pandas as pd
 from datetime import datetime, timezone
-import json
 import sys
 import os
 
 # === CONFIGURAÇÕES ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-total-day")
 
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/weekdays/search"
 
@@ -23,7 +29,7 @@ payload = {
 }
 
 # === REQUISIÇÃO ===
-resp = requests.post(URL, headers=HEADERS, json=payload)
+resp = session.post(URL, headers=HEADERS, json=payload)
 print("Status da requisição:", resp.status_code)
 
 if resp.status_code != 200:
@@ -33,16 +39,14 @@ if resp.status_code != 200:
 data = resp.json()
 
 # === DEBUG: salvar JSON cru e mostrar resumo das chaves ===
-debug_file = "debug_totals_seller.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 JSON cru salvo em: {debug_file}")
+debug.capture(data, tag="totals_seller")
 
-print("\n🔍 Estrutura do JSON retornado:")
-for key, value in data.items():
-    tipo = type(value).__name__
-    tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-    print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+if debug.enabled:
+    print("\n🔍 Estrutura do JSON retornado:")
+    for key, value in data.items():
+        tipo = type(value).__name__
+        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
 print("-" * 50)
 
 # === TRATAMENTO DOS DADOS ===
@@ -8,6 +8,15 @@ import os
 # Caminho para importar o TOKEN
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import Const, FieldMap
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-total-emp")
 
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/totals-branch/search"
 headers = {
@@ -17,8 +26,30 @@ headers = {
 
 page = 1
 page_size = 500
-all_sales_current = []
-all_sales_last_year = []
+
+# === MAPEAMENTO DAS COLUNAS ===
+SALES_CURRENT = FieldMap({
+    "Ano": Const("Atual"),
+    "CodeLoja": "branch_code",
+    "Loja": "branch_name",
+    "Qtd": "invoice_qty",
+    "ValorLiquido": "invoice_value",
+    "QtdItens": "itens_qty",
+    "TicketMedio": "tm",
+    "PecasAtend": "pa",
+    "PMPV": "pmpv",
+})
+SALES_LAST_YEAR = FieldMap({
+    "Ano": Const("Anterior"),
+    "CodeLoja": "branch_code",
+    "Loja": "branch_name",
+    "Qtd": "invoice_qty",
+    "ValorLiquido": "invoice_value",
+    "QtdItens": "itens_qty",
+    "TicketMedio": "tm",
+    "PecasAtend": "pa",
+    "PMPV": "pmpv",
+})
 all_summaries = []
 
 SUMMARY_FIELDS = ["invoice_qty", "invoice_value", "itens_qty", "tm", "pa", "pmpv"]
@@ -35,7 +66,7 @@ while True:
     }
 
     print(f"\n⏰ Consultando página {page} de dados comparativos (filial)…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -49,22 +80,20 @@ while True:
         break
 
     # === DEBUG: salvar resposta bruta ===
-    debug_file = f"debug_response_branch_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_branch", page=page)
 
     # === DEBUG: estrutura geral ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    # === DEBUG: amostra do conteúdo ===
-    print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else "1"
+            print(f"   - {key}: {tipo} ({tam})")
+
+        # === DEBUG: amostra do conteúdo ===
+        print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
+        print("-" * 60)
 
     # === Extração ===
     current_items = data.get("dataRow", [])
@@ -86,32 +115,10 @@ while True:
         break
 
     # --- ANO ATUAL ---
-    for item in current_items:
-        all_sales_current.append({
-            "Ano": "Atual",
-            "CodeLoja": item.get("branch_code"),
-            "Loja": item.get("branch_name"),
-            "Qtd": item.get("invoice_qty"),
-            "ValorLiquido": item.get("invoice_value"),
-            "QtdItens": item.get("itens_qty"),
-            "TicketMedio": item.get("tm"),
-            "PecasAtend": item.get("pa"),
-            "PMPV": item.get("pmpv"),
-        })
+    SALES_CURRENT.extend(current_items)
 
     # --- ANO ANTERIOR ---
-    for item in last_year_items:
-        all_sales_last_year.append({
-            "Ano": "Anterior",
-            "CodeLoja": item.get("branch_code"),
-            "Loja": item.get("branch_name"),
-            "Qtd": item.get("invoice_qty"),
-            "ValorLiquido": item.get("invoice_value"),
-            "QtdItens": item.get("itens_qty"),
-            "TicketMedio": item.get("tm"),
-            "PecasAtend": item.get("pa"),
-            "PMPV": item.get("pmpv"),
-        })
+    SALES_LAST_YEAR.extend(last_year_items)
 
     # === PAGINAÇÃO ===
     total_pages = data.get("totalPages") or data.get("pages") or None
@@ -127,8 +134,8 @@ while True:
     page += 1
 
 # === EXPORTAÇÃO ===
-df_current = pd.DataFrame(all_sales_current)
-df_last_year = pd.DataFrame(all_sales_last_year)
+df_current = SALES_CURRENT.frame()
+df_last_year = SALES_LAST_YEAR.frame()
 df_summary = pd.DataFrame(all_summaries)
 
 print("-" * 40)
@@ -8,6 +8,15 @@ import os
 # Caminho para importar o TOKEN
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import FieldMap
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-total-type")
 
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/document-types/search"
 
@@ -19,7 +28,13 @@ headers = {
 # === PAGINAÇÃO ===
 page = 1
 page_size = 500
-all_payment_details = []
+
+# === MAPEAMENTO DAS COLUNAS ===
+PAYMENT_DETAILS = FieldMap({
+    "TipoDocumentoPagamento": "payment_document_type",
+    "ValorPagamento": "payment_value",
+    "BranchCode_Filtro": lambda item: item.get("branchs", [0]),
+})
 all_summaries = []
 
 print("🚀 Iniciando consulta de Vendas por Forma de Pagamento (com Debug)...")
@@ -34,7 +49,7 @@ while True:
     }
 
     print(f"\n💳 Consultando página {page} de pagamentos…")
-    resp = requests.post(URL, headers=headers, json=payload)
+    resp = session.post(URL, headers=headers, json=payload)
     print(f"📡 Status: {resp.status_code}")
 
     if resp.status_code != 200:
@@ -48,22 +63,20 @@ while True:
         break
 
     # === DEBUG: salvar resposta completa ===
-    debug_file = f"debug_response_payment_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
+    debug.capture(data, tag="response_payment", page=page)
 
     # === DEBUG: mostrar estrutura da resposta ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    # === DEBUG: amostra parcial do conteúdo ===
-    print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
-    print("-" * 60)
+    if debug.enabled:
+        print("🔍 Estrutura da resposta:")
+        for key, value in data.items():
+            tipo = type(value).__name__
+            tam = len(value) if isinstance(value, (list, dict)) else "1"
+            print(f"   - {key}: {tipo} ({tam})")
+
+        # === DEBUG: amostra parcial do conteúdo ===
+        print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
+        print("-" * 60)
 
     # === Extração dos dados ===
     payment_items = data.get("dataRow", [])
@@ -83,12 +96,7 @@ while True:
         break
 
     # --- Processamento dos itens ---
-    for item in payment_items:
-        all_payment_details.append({
-            "TipoDocumentoPagamento": item.get("payment_document_type"),
-            "ValorPagamento": item.get("payment_value"),
-            "BranchCode_Filtro": item.get("branchs", [0]),
-        })
+    PAYMENT_DETAILS.extend(payment_items)
 
     # === PAGINAÇÃO ===
     total_pages = data.get("totalPages") or data.get("pages") or None
@@ -104,7 +112,7 @@ while True:
     page += 1
 
 # === EXPORTAÇÃO ===
-df_details = pd.DataFrame(all_payment_details)
+df_details = PAYMENT_DETAILS.frame()
 df_summary = pd.DataFrame(all_summaries)
 
 print("-" * 40)
@@ -1,4 +1,4 @@
-import requests
+import asyncio
 import pandas as pd
 from datetime import datetime, timezone
 import json
@@ -7,116 +7,91 @@ import os
 
 # Caminho para importar o token
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from auth.config import TOKEN
+from totvs.async_client import TotvsAsyncClient
+from totvs.debug_capture import DebugCapture
+from totvs.mapping import Const, FieldMap
 
-URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/totals/search"
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("sale-panel-total")
 
-headers = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
+URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/sale-panel/v2/totals/search"
 
 # === PAGINAÇÃO ===
-page = 1
 page_size = 500
-all_sales_current = []
-all_sales_last_year = []
 
-print("🚀 Iniciando consulta de Vendas (Comparativo Anual)...")
+# === MAPEAMENTO DAS COLUNAS ===
+SALES_CURRENT = FieldMap({
+    "Ano": Const("Atual"),
+    "Qtd": "invoice_qty",
+    "ValorLiquido": "invoice_value",
+    "QtdItens": "itens_qty",
+    "TicketMedio": "tm",
+    "PcaAtendida": "pa",
+    "PMPV": "pmpv",
+})
+SALES_LAST_YEAR = FieldMap({
+    "Ano": Const("Anterior"),
+    "Invoice_Qty": "invoice_qty",
+    "Invoice_Value": "invoice_value",
+    "Itens_Qty": "itens_qty",
+    "TM": "tm",
+    "PA": "pa",
+    "PMPV": "pmpv",
+})
+
+payload = {
+    "branchs": [5],                       # Filial
+    "datemin": "2025-09-01T00:00:00Z",    # Início do período
+    "datemax": "2025-09-30T23:59:59Z",  
+}
 
-while True:
-    payload = {
-        "branchs": [5],                       # Filial
-        "datemin": "2025-09-01T00:00:00Z",    # Início do período
-        "datemax": "2025-09-30T23:59:59Z",  
-        "page": page,
-        "pageSize": page_size
-    }
 
-    print(f"\n⏰ Consultando página {page}...")
-    resp = requests.post(URL, headers=headers, json=payload)
-    print(f"📡 Status: {resp.status_code}")
+async def fetch_sales(client):
+    page = 0
+    async for data in client.paginate(URL, payload, page_size=page_size, items_key="dataRow"):
+        page += 1
 
-    if resp.status_code != 200:
-        print("❌ Erro na requisição:", resp.text)
-        break
+        # === DEBUG: salvar resposta bruta ===
+        debug.capture(data, tag="response", page=page)
 
-    try:
-        data = resp.json()
-    except requests.exceptions.JSONDecodeError:
-        print("❌ Erro ao decodificar JSON da resposta.")
-        break
-
-    # === DEBUG: salvar resposta bruta ===
-    debug_file = f"debug_response_page_{page}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Resposta salva em: {debug_file}")
-
-    # === DEBUG: estrutura da resposta ===
-    print("🔍 Estrutura da resposta:")
-    for key, value in data.items():
-        tipo = type(value).__name__
-        tam = len(value) if isinstance(value, (list, dict)) else "1"
-        print(f"   - {key}: {tipo} ({tam})")
-
-    # === DEBUG: mostra parte do JSON ===
-    print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
-    print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
-    print("-" * 50)
-
-    # === Extração dos dados ===
-    current_items = data.get("dataRow", [])
-    last_year_items = data.get("dataRowLastYear", [])
-
-    if not current_items and page == 1:
+        # === DEBUG: estrutura da resposta ===
+        if debug.enabled:
+            print("🔍 Estrutura da resposta:")
+            for key, value in data.items():
+                tipo = type(value).__name__
+                tam = len(value) if isinstance(value, (list, dict)) else "1"
+                print(f"   - {key}: {tipo} ({tam})")
+
+            # === DEBUG: mostra parte do JSON ===
+            print("🧩 Amostra do conteúdo (primeiros 1200 caracteres):")
+            print(json.dumps(data, indent=2, ensure_ascii=False)[:1200])
+            print("-" * 50)
+
+        # === Extração dos dados ===
+        SALES_CURRENT.extend(data.get("dataRow", []))         # ANO ATUAL
+        SALES_LAST_YEAR.extend(data.get("dataRowLastYear", []))  # ANO PASSADO
+
+    if page == 0:
         print("⚠️ Nenhuma venda encontrada para o período atual e filtros aplicados.")
-        break
-    if not current_items and page > 1:
-        print("✅ Paginação concluída (não há mais dados).")
-        break
-
-    # ANO ATUAL
-    for item in current_items:
-        all_sales_current.append({
-            "Ano": "Atual",
-            "Qtd": item.get("invoice_qty"),
-            "ValorLiquido": item.get("invoice_value"),
-            "QtdItens": item.get("itens_qty"),
-            "TicketMedio": item.get("tm"),
-            "PcaAtendida": item.get("pa"),
-            "PMPV": item.get("pmpv"),
-        })
-
-    # ANO PASSADO
-    for item in last_year_items:
-        all_sales_last_year.append({
-            "Ano": "Anterior",
-            "Invoice_Qty": item.get("invoice_qty"),
-            "Invoice_Value": item.get("invoice_value"),
-            "Itens_Qty": item.get("itens_qty"),
-            "TM": item.get("tm"),
-            "PA": item.get("pa"),
-            "PMPV": item.get("pmpv"),
-        })
-
-    # === PAGINAÇÃO: verifica se há mais páginas ===
-    total_pages = data.get("totalPages") or data.get("pages") or None
-
-    if total_pages:
-        print(f"📖 Página {page}/{total_pages}")
-        if page >= total_pages:
-            print("✅ Todas as páginas foram processadas.")
-            break
-    elif len(current_items) < page_size:
-        print("✅ Última página (parcialmente preenchida).")
-        break
-
-    page += 1
+    else:
+        print(f"✅ Paginação concluída ({page} página(s)).")
+
+
+async def main():
+    async with TotvsAsyncClient() as client:
+        await fetch_sales(client)
+
+
+print("🚀 Iniciando consulta de Vendas (Comparativo Anual)...")
+
+try:
+    asyncio.run(main())
+except Exception as e:
+    print("❌ Erro na requisição:", e)
 
 # --- EXPORTAÇÃO ---
-df_current = pd.DataFrame(all_sales_current)
-df_last_year = pd.DataFrame(all_sales_last_year)
+df_current = SALES_CURRENT.frame()
+df_last_year = SALES_LAST_YEAR.frame()
 
 print("-" * 30)
 if df_current.empty and df_last_year.empty:
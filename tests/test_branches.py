@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from totvs.branches import BranchesFailed, fan_out, union
+
+
+def test_union_adds_branch_column_in_front():
+    df = union([(1, pd.DataFrame({"a": [1]})), (2, pd.DataFrame({"a": [2, 3]}))])
+    assert list(df.columns) == ["branchCode", "a"]
+    assert df["branchCode"].tolist() == [1, 2, 2]
+
+
+def test_union_keeps_existing_branch_column_and_merges_table_names():
+    results = [
+        (1, {"x": pd.DataFrame({"branchCode": [9], "v": [1]})}),
+        (2, {"x": pd.DataFrame({"branchCode": [8], "v": [2]}), "y": pd.DataFrame({"w": [3]})}),
+    ]
+    out = union(results)
+    assert out["x"]["branchCode"].tolist() == [9, 8]
+    assert out["y"]["branchCode"].tolist() == [2]
+
+
+def test_fan_out_runs_every_branch():
+    df = fan_out(lambda b: pd.DataFrame({"v": [b * 10]}), [1, 2, 3], max_workers=2)
+    assert df["branchCode"].tolist() == [1, 2, 3]
+    assert df["v"].tolist() == [10, 20, 30]
+
+
+def test_fan_out_reports_every_failed_branch():
+    def extract(branch):
+        if branch % 2:
+            raise ValueError(f"falha {branch}")
+        return pd.DataFrame({"v": [branch]})
+
+    with pytest.raises(BranchesFailed) as info:
+        fan_out(extract, [1, 2, 3])
+    assert [b for b, _ in info.value.failures] == [1, 3]
+    assert isinstance(info.value, RuntimeError)
+
+
+def test_fan_out_without_branches():
+    with pytest.raises(RuntimeError):
+        fan_out(lambda b: pd.DataFrame(), [])
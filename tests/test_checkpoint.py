@@ -0,0 +1,54 @@
+import json
+import os
+import time
+
+from totvs.checkpoint import META_FILE, PageCheckpoint
+
+
+def test_pages_round_trip_and_clear(tmp_path):
+    cp = PageCheckpoint("rota", {"filtro": 1}, root=str(tmp_path))
+    cp.save(2, {"items": [1, 2]})
+    cp.save(1, {"items": [0]})
+    assert cp.pages() == [1, 2]
+    assert cp.load(2) == {"items": [1, 2]}
+    assert cp.load(3) is None
+    cp.clear()
+    assert cp.pages() == []
+
+
+def test_key_selects_directory(tmp_path):
+    a = PageCheckpoint("rota", {"filtro": 1}, root=str(tmp_path))
+    b = PageCheckpoint("rota", {"filtro": 2}, root=str(tmp_path))
+    assert a.dir != b.dir
+    assert PageCheckpoint("rota", {"filtro": 1}, root=str(tmp_path)).dir == a.dir
+
+
+def test_truncated_page_is_refetched(tmp_path):
+    cp = PageCheckpoint("rota", {}, root=str(tmp_path))
+    cp.save(1, {"items": []})
+    with open(cp._path(1), "wb") as f:
+        f.write(b"\x1f\x8b lixo")
+    assert cp.load(1) is None
+
+
+def test_fresh_checkpoint_is_reused(tmp_path):
+    PageCheckpoint("rota", {}, root=str(tmp_path)).save(1, {"items": []})
+    cp = PageCheckpoint("rota", {}, root=str(tmp_path), max_age=3600)
+    assert cp.pages() == [1]
+    assert cp.age() < 60
+
+
+def test_expired_checkpoint_is_cleared(tmp_path):
+    cp = PageCheckpoint("rota", {}, root=str(tmp_path))
+    cp.save(1, {"items": []})
+    with open(os.path.join(cp.dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"created": time.time() - 7200}, f)
+    assert PageCheckpoint("rota", {}, root=str(tmp_path), max_age=3600).pages() == []
+
+
+def test_checkpoint_without_meta_is_cleared_unless_unlimited(tmp_path):
+    cp = PageCheckpoint("rota", {}, root=str(tmp_path))
+    cp.save(1, {"items": []})
+    os.remove(os.path.join(cp.dir, META_FILE))
+    assert PageCheckpoint("rota", {}, root=str(tmp_path), max_age=None).pages() == [1]
+    assert PageCheckpoint("rota", {}, root=str(tmp_path)).pages() == []
@@ -0,0 +1,62 @@
+import pandas as pd
+import pyarrow as pa
+
+from totvs.columnar import PageTables, unified_schema
+from totvs.mapping import FieldMap
+
+
+def tables(**fields):
+    return PageTables({"t": FieldMap(fields)})
+
+
+def test_unified_schema_promotes_and_reports_mixed():
+    schemas = [
+        pa.schema([("a", pa.int64()), ("b", pa.null()), ("c", pa.int64())]),
+        pa.schema([("a", pa.float64()), ("b", pa.string()), ("c", pa.string())]),
+    ]
+    schema, mixed = unified_schema(schemas)
+    assert schema.field("a").type == pa.float64()
+    assert schema.field("b").type == pa.string()
+    assert schema.field("c").type == pa.string()
+    assert mixed == ["c"]
+
+
+def test_pages_are_concatenated_with_promotion():
+    t = tables(a="a")
+    t.add_page([{"a": 1}])
+    t.add_page([{"a": 1.5}])
+    t.add_page([{"a": None}])
+    assert t.rows("t") == 3 and t.pages == 3
+    assert t.frame("t")["a"].tolist()[:2] == [1.0, 1.5]
+
+
+def test_mixed_columns_keep_original_values():
+    t = tables(x="x", y="y")
+    t.add_page([{"x": 1, "y": 1}, {"x": 2, "y": "a"}])  # y misto na própria página
+    t.add_page([{"x": "B", "y": 3}])                   # x misto entre páginas
+    df = t.frame("t")
+    assert df["x"].dtype == object and df["x"].tolist() == [1, 2, "B"]
+    assert df["y"].dtype == object and df["y"].tolist() == [1, "a", 3]
+    # no Arrow a coluna mista precisa de um tipo só: texto
+    assert t.table("t").schema.field("x").type == pa.string()
+
+
+def test_nullable_ints_become_Int64():
+    t = tables(a="a", b="b")
+    t.add_page([{"a": 1, "b": 1}, {"a": None, "b": 2}])
+    t.add_page([{"a": None, "b": 3}])
+    df = t.frame("t")
+    assert df["a"].dtype == pd.Int64Dtype()
+    assert df["a"].tolist()[0] == 1 and df["a"].isna().tolist() == [False, True, True]
+    assert df["b"].dtype == "int64"
+
+
+def test_empty_table_has_spec_columns():
+    t = tables(a="a", b="b")
+    assert list(t.frame("t").columns) == ["a", "b"]
+
+
+def test_keep_false_only_returns_page_batches():
+    t = PageTables({"t": FieldMap({"a": "a"})}, keep=False)
+    batch = t.add_page([{"a": 1}, {"a": 2}])["t"]
+    assert batch.num_rows == 2 and t.rows("t") == 0
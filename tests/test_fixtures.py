@@ -0,0 +1,64 @@
+from totvs.fixtures import page_of, query_values, record, request_key, rewrite_url
+from totvs.stub_server import FixtureStore, build_response
+
+
+def test_request_key_ignores_page_and_query_types():
+    typed = request_key({"BranchCode": 5, "page": 1, "pageSize": 100, "skip": None}, None)
+    text = request_key({"BranchCode": "5", "page": "7", "pageSize": "100"}, None)
+    assert typed == text
+    assert typed != request_key({"BranchCode": "6", "pageSize": "100"}, None)
+
+
+def test_request_key_ignores_page_in_body_only():
+    a = request_key(None, {"filter": {"branchCodeList": [1]}, "page": 1, "pageSize": 1000})
+    b = request_key(None, {"filter": {"branchCodeList": [1]}, "page": 9, "pageSize": 1000})
+    c = request_key(None, {"filter": {"branchCodeList": [2]}, "page": 1, "pageSize": 1000})
+    assert a == b != c
+
+
+def test_query_values_matches_what_the_server_parses():
+    assert query_values({"a": 1, "b": [1, 2], "c": None, "d": True}) == {"a": "1", "b": "2", "d": "True"}
+
+
+def test_page_of_body_then_query():
+    assert page_of({"page": "3"}, None) == 3
+    assert page_of({"page": "3"}, {"page": 2}) == 2
+    assert page_of(None, {"filter": {}}) == 1
+
+
+def test_rewrite_url_points_to_stub(monkeypatch):
+    monkeypatch.setenv("TOTVS_STUB_URL", "http://127.0.0.1:8765/")
+    assert rewrite_url("https://apitotvsmoda.bhan.com.br/api/x?y=1") == "http://127.0.0.1:8765/apitotvsmoda.bhan.com.br/api/x?y=1"
+
+
+def test_recorded_get_replays_by_filter(tmp_path):
+    root = str(tmp_path)
+    url = "https://h.example/api/totvsmoda/x/v2/list"
+    for branch in (1, 2):
+        for page in (1, 2):
+            body = {"items": [{"branch": branch, "page": page}], "hasNext": page < 2}
+            record("GET", url, {"BranchCode": branch, "page": page}, None, 200, body, root=root)
+
+    store = FixtureStore(root)
+    pages = store.matching("GET", "h.example", "/api/totvsmoda/x/v2/list", request_key({"BranchCode": "2"}, None))
+    assert [p["response"]["items"][0]["branch"] for p in pages] == [2, 2]
+    status, body = build_response(pages, 2)
+    assert status == 200 and body["items"] == [{"branch": 2, "page": 2}]
+    # além do gravado: página vazia encerrando a paginação
+    status, body = build_response(pages, 3)
+    assert body["items"] == [] and body["hasNext"] is False
+
+
+def test_unknown_filter_falls_back_to_route_pages(tmp_path):
+    root = str(tmp_path)
+    record("POST", "https://h.example/api/x/search", None, {"page": 1}, 200, {"items": [1]}, root=root)
+    pages = FixtureStore(root).matching("POST", "h.example", "/api/x/search", "outra-chave")
+    assert len(pages) == 1
+
+
+def test_build_response_cycles_recorded_pages():
+    pages = [{"page": 1, "response": {"items": [1, 2], "hasNext": False}}]
+    status, body = build_response(pages, 3, total_pages=3)
+    assert body == {"items": [1, 2], "hasNext": False, "count": 2, "totalPages": 3, "totalItems": 6}
+    assert build_response(pages, 4, total_pages=3)[1]["items"] == []
+    assert build_response([], 1)[0] == 404
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from totvs.frames import code_key, group_first_join, join_unique, lookup
+
+
+def test_join_unique_matches_per_group_lambda():
+    df = pd.DataFrame({"k": [1, 1, 1, 2, 2, 3], "v": ["b ", "a", "b", None, "", "x"]})
+    expected = df.groupby("k")["v"].agg(
+        lambda s: " | ".join(sorted({str(v).strip() for v in s.dropna()} - {""})) or None
+    ).dropna()
+    assert join_unique(df, "k", "v").to_dict() == expected.to_dict() == {1: "a | b", 3: "x"}
+
+
+def test_group_first_join_one_row_per_key():
+    df = pd.DataFrame({
+        "k": [1, 1, 2],
+        "nome": [None, "A", "B"],
+        "cls": ["10", "20", None],
+    })
+    out = group_first_join(df, "k", first=["nome"], joined=["cls"])
+    assert list(out.columns) == ["k", "nome", "cls"]
+    assert out[["k", "nome"]].values.tolist() == [[1, "A"], [2, "B"]]
+    assert out["cls"].iloc[0] == "10 | 20" and pd.isna(out["cls"].iloc[1])
+
+
+def test_code_key_int64_when_canonical():
+    assert code_key(pd.Series([1.0, None, 3.0])).dtype == "Int64"
+    assert code_key(pd.Series([" 12", "7", None])).tolist()[:2] == [12, 7]
+    assert code_key(pd.Series(["007", "8"])).tolist() == ["007", "8"]  # zeros à esquerda: texto
+    assert code_key(pd.Series([1.5, 2.0])).dtype == "string"
+
+
+def test_lookup_matches_left_merge_across_key_types():
+    mov = pd.DataFrame({"pessoa": ["1", "2", "9", None], "valor": [10, 20, 30, 40]})
+    dim = pd.DataFrame({"Codigo": [1.0, 2.0], "Nome": ["A", "B"], "valor": [0, 0]})
+    out = lookup(mov, "pessoa", dim, "Codigo", suffix="_Pessoa")
+    assert list(out.columns) == ["pessoa", "valor", "Nome", "valor_Pessoa"]
+    assert out["Nome"].tolist()[:2] == ["A", "B"]
+    assert out["Nome"].isna().tolist() == [False, False, True, True]
+    assert out["pessoa"].dtype == "Int64"
+
+
+def test_lookup_rejects_duplicate_dimension_keys():
+    dim = pd.DataFrame({"Codigo": [1, 1], "Nome": ["A", "B"]})
+    with pytest.raises(ValueError):
+        lookup(pd.DataFrame({"k": [1]}), "k", dim, "Codigo")
@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import os
+
+from totvs.images import ImageStore, store_images
+
+JPEG_A = base64.b64encode(b"\xff\xd8imagem-a").decode("ascii")
+JPEG_B = base64.b64encode(b"\xff\xd8imagem-b").decode("ascii")
+
+
+def test_put_is_content_addressed(tmp_path):
+    store = ImageStore(str(tmp_path))
+    digest = store.put(store.key(1, 1), JPEG_A)
+    assert digest == hashlib.sha256(b"\xff\xd8imagem-a").hexdigest()
+    with open(store.object_path(digest), "rb") as f:
+        assert f.read() == b"\xff\xd8imagem-a"
+
+    # mesmo conteúdo em outro produto: um único objeto
+    assert store.put(store.key(2, 1), JPEG_A) == digest
+    assert store.stats == {"unchanged": 0, "written": 1, "shared": 1}
+
+
+def test_unchanged_image_is_skipped_across_runs(tmp_path):
+    store = ImageStore(str(tmp_path))
+    digest = store.put("1/1", JPEG_A)
+    store.save()
+
+    again = ImageStore(str(tmp_path))
+    assert again.put("1/1", JPEG_A) == digest
+    assert again.stats["unchanged"] == 1
+    assert again.put("1/1", JPEG_B) != digest
+    assert again.stats["written"] == 1
+
+
+def test_missing_object_is_rewritten(tmp_path):
+    store = ImageStore(str(tmp_path))
+    digest = store.put("1/1", JPEG_A)
+    os.remove(store.object_path(digest))
+    store.put("1/1", JPEG_A)
+    assert os.path.exists(store.object_path(digest))
+    assert store.stats["unchanged"] == 0
+
+
+def test_store_images_replaces_base64(tmp_path):
+    store = ImageStore(str(tmp_path))
+    item = {"productCode": 7, "images": [
+        {"imageCode": 1, "imageFile": JPEG_A},
+        {"imageCode": 2, "imageFile": "não é base64!"},
+        {"imageCode": 3, "imageFile": ""},
+    ]}
+    store_images(item, store)
+    assert all("imageFile" not in img for img in item["images"])
+    assert item["images"][0]["sha256"] == hashlib.sha256(b"\xff\xd8imagem-a").hexdigest()
+    assert item["images"][1]["sha256"] is None
+    assert item["images"][2]["sha256"] is None
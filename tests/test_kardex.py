@@ -0,0 +1,31 @@
+import pandas as pd
+
+from totvs.kardex import running_balance
+
+
+def test_running_balance_per_product_from_opening():
+    movements = pd.DataFrame({
+        "productCode": [1, 1, 2, 1],
+        "inQuantity": [5, None, 3, 2],
+        "outQuantity": [0, 4, None, 1],
+        "balance": [15, 11, 3, 12],
+    })
+    out = running_balance(movements, pd.Series({1: 10.0}))
+    assert out["runningBalance"].tolist() == [15, 11, 3, 12]
+    assert out["balanceDiff"].tolist() == [0, 0, 0, 0]
+
+
+def test_running_balance_flags_divergence():
+    movements = pd.DataFrame({
+        "productCode": [1], "inQuantity": [1], "outQuantity": [0], "balance": [5],
+    })
+    out = running_balance(movements, pd.Series({1: 2.0}))
+    assert out["balanceDiff"].tolist() == [-2]
+
+
+def test_running_balance_empty():
+    out = running_balance(
+        pd.DataFrame(columns=["productCode", "inQuantity", "outQuantity", "balance"]), pd.Series(dtype="float64")
+    )
+    assert out.empty
+    assert {"runningBalance", "balanceDiff"} <= set(out.columns)
@@ -0,0 +1,72 @@
+from totvs.mapping import Const, FieldMap
+
+
+def rows(fmap, items):
+    """Linhas extraídas, direto dos buffers (sem a conversão do pandas)."""
+    fmap.extend(items)
+    values = list(zip(*fmap.columns_dict().values()))
+    fmap.clear()
+    return [list(v) for v in values]
+
+
+def test_paths_indexes_consts_and_functions():
+    fmap = FieldMap({
+        "Codigo": "code",
+        "Cidade": "address.cityName",
+        "Banco": "payments.0.bank",
+        "Total": lambda item: item["quantity"] * 2,
+        "Ano": Const("Atual"),
+    })
+    assert rows(fmap, [
+        {"code": 1, "address": {"cityName": "Maringá"}, "payments": [{"bank": "X"}], "quantity": 2},
+        {"code": 2, "payments": [], "quantity": 3},
+    ]) == [[1, "Maringá", "X", 4, "Atual"], [2, None, None, 6, "Atual"]]
+
+
+def test_frame_applies_dtypes_in_spec_order():
+    df = FieldMap({"b": ("qty", "float64"), "a": "code"}).to_frame([{"code": 1, "qty": 2}])
+    assert list(df.columns) == ["b", "a"]
+    assert df["b"].dtype == "float64"
+
+
+def test_empty_items_are_skipped():
+    assert rows(FieldMap({"a": "a"}), [{}, None, {"a": 1}]) == [[1]]
+
+
+def test_explode_keep_empty_and_drop_empty():
+    items = [{"code": 1, "xs": [{"x": 10}, {"x": 11}]}, {"code": 2, "xs": []}]
+    assert rows(FieldMap({"code": "code"}, explode=("xs", {"x": "x"})), items) == [[1, 10], [1, 11], [2, None]]
+    dropped = FieldMap({"code": "code"}, explode=("xs", {"x": "x"}), keep_empty=False)
+    assert rows(dropped, items) == [[1, 10], [1, 11]]
+
+
+def test_nested_explode_levels():
+    fmap = FieldMap(
+        {"p": "p"},
+        explode=[("prices", {"price": "price"}), ("promos", {"promo": "code"})],
+        keep_empty=False,
+    )
+    items = [{"p": 1, "prices": [{"price": 5, "promos": [{"code": "A"}, {"code": "B"}]}]}]
+    assert rows(fmap, items) == [[1, 5, "A"], [1, 5, "B"]]
+
+
+def test_non_dict_values_behave_like_safe_helpers():
+    fmap = FieldMap({"city": "address.city", "first": "xs.0.x"}, explode=("xs", {"x": "x"}))
+    assert rows(fmap, [
+        {"address": "texto", "xs": {"x": 1}},      # dict no lugar da lista
+        {"address": None, "xs": ["a", {"x": 2}]},  # elemento que não é dict
+        {"address": {"city": "C"}, "xs": "abc"},
+    ]) == [
+        [None, None, None],
+        [None, None, None],
+        [None, None, 2],
+        ["C", None, None],
+    ]
+
+
+def test_row_and_copy_have_own_buffers():
+    fmap = FieldMap({"a": "a.b"})
+    assert fmap.row({"a": {"b": 1}}) == {"a": 1}
+    clone = fmap.copy()
+    clone.extend([{"a": {"b": 2}}])
+    assert len(clone) == 1 and len(fmap) == 0
@@ -0,0 +1,75 @@
+import pytest
+
+from totvs.rate_limit import AdaptiveConcurrency, AdaptiveRateLimiter, parse_retry_after, rate_limited
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_parse_retry_after_seconds_and_date():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # data no passado
+    assert parse_retry_after("lixo") is None
+    assert parse_retry_after(None) is None
+
+
+def test_throttle_halves_rate_down_to_floor():
+    limiter = AdaptiveRateLimiter(rate=4.0, max_rate=10.0, min_rate=0.5)
+    limiter.observe(429)
+    assert limiter.rate == pytest.approx(2.0)
+    limiter.observe(503)
+    limiter.observe(503)
+    limiter.observe(503)
+    assert limiter.rate == pytest.approx(0.5)
+
+
+def test_good_responses_increase_rate_up_to_max():
+    limiter = AdaptiveRateLimiter(rate=1.0, max_rate=1.5, increase=0.2)
+    limiter.observe(200)
+    assert limiter.rate == pytest.approx(1.2)
+    for _ in range(50):
+        limiter.observe(200)
+    assert limiter.rate == pytest.approx(1.5)
+
+
+def test_server_errors_leave_rate_unchanged():
+    limiter = AdaptiveRateLimiter(rate=2.0)
+    limiter.observe(500)
+    assert limiter.rate == pytest.approx(2.0)
+
+
+def test_retry_after_blocks_next_acquire():
+    limiter = AdaptiveRateLimiter(rate=100.0, burst=100.0)
+    limiter.observe(429, {"Retry-After": "0.2"})
+    assert limiter._reserve() == pytest.approx(0.2, abs=0.05)
+
+
+def test_rate_limited_sends_once_and_lowers_rate(monkeypatch):
+    limiter = AdaptiveRateLimiter(rate=4.0, burst=4.0)
+    monkeypatch.setattr("totvs.rate_limit.limiter_for", lambda url: limiter)
+    calls = []
+
+    def send(url, **kwargs):
+        calls.append(url)
+        return FakeResponse(429, {"Retry-After": "0"})
+
+    resp = rate_limited(send, "https://host/api/search")
+    assert resp.status_code == 429
+    assert calls == ["https://host/api/search"]  # sem segunda camada de retentativa
+    assert limiter.rate == pytest.approx(2.0)
+
+
+def test_concurrency_gate_halves_once_per_window_and_grows_back():
+    gate = AdaptiveConcurrency(initial=8, maximum=16)
+    for _ in range(2):
+        gate.acquire()
+        gate.release(False, 0.1)
+    assert gate.limit == 4  # o segundo erro ainda é da janela antiga
+    for _ in range(4):
+        gate.acquire()
+        gate.release(True, 0.1)
+    assert gate.limit == 5
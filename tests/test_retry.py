@@ -0,0 +1,52 @@
+import pytest
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ReadTimeoutError
+
+from totvs.retry import NO_RETRY, RetryPolicy, is_search_url
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://h/api/totvsmoda/fiscal/v2/invoices/search", True),
+        ("https://h/api/totvsmoda/fiscal/v2/invoices/item-detail-search/", True),
+        ("https://h/api/totvsmoda/sale-order/v2/devolution/create", False),
+        ("https://h/api/search/create", False),
+        (None, False),
+    ],
+)
+def test_is_search_url(url, expected):
+    assert is_search_url(url) is expected
+
+
+def test_allows_get_always_and_post_only_on_search():
+    policy = RetryPolicy()
+    assert policy.allows("get", "https://h/x/create")
+    assert policy.allows("POST", "https://h/x/search")
+    assert not policy.allows("POST", "https://h/x/create")
+    assert not NO_RETRY.allows("POST", "https://h/x/search")
+
+
+def test_delay_is_capped_exponential():
+    policy = RetryPolicy(base=1.0, cap=5.0, jitter=0.0)
+    assert [policy.delay(n) for n in (1, 2, 3, 4)] == [1.0, 2.0, 4.0, 5.0]
+
+
+def test_urllib3_retry_skips_post_outside_search():
+    retry = RetryPolicy(attempts=3).to_urllib3()
+    timeout = ReadTimeoutError(None, "/x/create", "read timed out")
+    with pytest.raises(MaxRetryError):
+        retry.increment("POST", "/x/create", error=timeout)
+    again = retry.increment("POST", "/x/search", error=timeout)
+    assert again.total == 2
+
+
+def test_urllib3_retry_repeats_connection_errors_for_any_method():
+    retry = RetryPolicy(attempts=3).to_urllib3()
+    refused = NewConnectionError(None, "connection refused")
+    assert retry.increment("POST", "/x/create", error=refused).total == 2
+
+
+def test_urllib3_retry_covers_throttle_status():
+    retry = RetryPolicy().to_urllib3()
+    assert retry.is_retry("POST", 429) and retry.is_retry("GET", 503)
+    assert not retry.is_retry("GET", 404)
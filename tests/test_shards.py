@@ -0,0 +1,80 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from totvs.shards import Shard, plan_shards, run_shards, shard_days, split_window
+
+
+def ts(day, hour=0, minute=0, second=0):
+    return datetime(2025, 12, day, hour, minute, second, tzinfo=timezone.utc)
+
+
+def test_split_window_has_no_gaps_or_overlaps():
+    parts = split_window(ts(1), ts(9, 23, 59, 59), 2)
+    assert parts[0] == (ts(1), ts(2, 23, 59, 59))
+    assert parts[-1] == (ts(9), ts(9, 23, 59, 59))
+    for (_, end), (start, _) in zip(parts, parts[1:]):
+        assert start - end == timedelta(seconds=1)
+    assert len(parts) == 5
+
+
+def test_split_window_single_day():
+    assert split_window(ts(1), ts(1, 23, 59, 59), 7) == [(ts(1), ts(1, 23, 59, 59))]
+
+
+@pytest.mark.parametrize(
+    "total, days, expected",
+    [
+        (None, 9, 1),       # total desconhecido: fatias de 1 dia
+        (0, 9, 7),
+        (90_000, 9, 1),     # 10k itens/dia
+        (9_000, 9, 7),      # 1k itens/dia: limitado a MAX_SHARD_DAYS
+        (30_000, 10, 3),
+    ],
+)
+def test_shard_days(total, days, expected):
+    assert shard_days(total, days, target_items=10_000) == expected
+
+
+def test_plan_shards_skips_empty_branches_and_sizes_per_branch():
+    totals = {1: 90_000, 2: 0, 3: None}
+    shards = plan_shards([1, 2, 3], "2025-12-01T00:00:00Z", "2025-12-09T23:59:59Z",
+                         count_items=lambda s: totals[s.branch], target_items=10_000)
+    assert {s.branch for s in shards} == {1, 3}
+    assert sum(1 for s in shards if s.branch == 1) == 9
+    assert str(shards[0]) == "1 2025-12-01..2025-12-01"
+
+
+def test_plan_shards_rejects_bad_window():
+    with pytest.raises(ValueError):
+        plan_shards([1], "ontem", "hoje", count_items=lambda s: 1)
+
+
+def test_run_shards_keeps_order_and_bounds_in_flight():
+    shards = [Shard(1, ts(d), ts(d, 23, 59, 59)) for d in range(1, 9)]
+    lock = threading.Lock()
+    running = peak = 0
+
+    def fetch(shard):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        try:
+            return [{"day": shard.start.day, "n": n} for n in range(2)]
+        finally:
+            with lock:
+                running -= 1
+
+    items = list(run_shards(shards, fetch, max_workers=3))
+    assert [i["day"] for i in items] == [d for d in range(1, 9) for _ in range(2)]
+    assert peak <= 3
+
+
+def test_run_shards_propagates_errors():
+    def fetch(shard):
+        raise RuntimeError("falhou")
+
+    with pytest.raises(RuntimeError):
+        list(run_shards([Shard(1, ts(1), ts(1))], fetch))
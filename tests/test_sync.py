@@ -0,0 +1,85 @@
+import pytest
+
+from totvs.rate_limit import UnlimitedLimiter
+from totvs.sync import SyncStore, filter_key, format_ts, parse_ts, sync_endpoint
+
+URL = "https://h.example/api/totvsmoda/sales-order/v2/orders/search"
+
+
+class FakeResponse:
+    status_code = 200
+    headers: dict = {}
+
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """Responde com `pages` (lista de listas de itens) e guarda os corpos."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.bodies = []
+
+    def post(self, url, json, timeout):
+        self.bodies.append(json)
+        items = self.pages[json["page"] - 1] if json["page"] <= len(self.pages) else []
+        return FakeResponse({"items": items, "hasNext": json["page"] < len(self.pages)})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr("totvs.rate_limit.limiter_for", lambda url: UnlimitedLimiter())
+    s = SyncStore(str(tmp_path / "sync.sqlite"))
+    yield s
+    s.close()
+
+
+def test_parse_and_format_ts_round_trip():
+    dt = parse_ts("2025-09-01T10:00:00.5-03:00")
+    assert format_ts(dt) == "2025-09-01T13:00:00.500Z"
+    assert parse_ts("lixo") is None and parse_ts(None) is None
+
+
+def test_filter_key_ignores_key_order():
+    assert filter_key({"a": 1, "b": [2]}) == filter_key({"b": [2], "a": 1})
+
+
+def test_merge_upserts_by_natural_key(store):
+    assert store.merge("ds", [{"code": 1, "v": "a"}, {"code": 2, "v": "b"}], ["code"]) == (2, 0)
+    assert store.merge("ds", [{"code": 2, "v": "c"}, {"code": 3, "v": "d"}], ["code"]) == (1, 1)
+    assert store.count("ds") == 3
+    assert store.load_keys("ds", ["2", "9"]) == {"2": {"code": 2, "v": "c"}}
+
+
+def test_sync_advances_watermark_and_requests_only_the_delta(store):
+    first = FakeSession([
+        [{"code": 1, "maxChangeFilterDate": "2025-09-01T10:00:00Z"}],
+        [{"code": 2, "maxChangeFilterDate": "2025-09-02T10:00:00Z"}],
+    ])
+    stats = sync_endpoint(URL, {"filter": {}}, dataset="ds", key_fields=["code"],
+                          initial_start="2025-01-01T00:00:00Z", store=store, session=first)
+    assert stats["fetched"] == 2 and stats["watermark"] == "2025-09-02T10:00:00.000Z"
+    assert first.bodies[0]["filter"]["change"]["startDate"] == "2025-01-01T00:00:00.000Z"
+
+    second = FakeSession([[{"code": 2, "maxChangeFilterDate": "2025-09-03T10:00:00Z"}]])
+    stats = sync_endpoint(URL, {"filter": {}}, dataset="ds", key_fields=["code"],
+                          initial_start="2025-01-01T00:00:00Z", store=store, session=second)
+    # marca d'água menos a sobreposição de 5 minutos
+    assert second.bodies[0]["filter"]["change"]["startDate"] == "2025-09-02T09:55:00.000Z"
+    assert (stats["inserted"], stats["updated"]) == (0, 1)
+    assert store.count("ds") == 2
+
+
+def test_empty_dataset_ignores_watermark(store):
+    store.set_watermark(URL, filter_key({"filter": {}}), "2025-09-02T10:00:00.000Z")
+    session = FakeSession([])
+    sync_endpoint(URL, {"filter": {}}, dataset="novo", key_fields=["code"],
+                  initial_start="2025-01-01T00:00:00Z", store=store, session=session)
+    assert session.bodies[0]["filter"]["change"]["startDate"] == "2025-01-01T00:00:00.000Z"
@@ -0,0 +1,235 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import aiohttp
+
+from auth.config import TOKEN
+from totvs.fixtures import record, record_dir, rewrite_url
+from totvs.rate_limit import THROTTLE_STATUS, host_key, limiter_for
+from totvs.retry import DEFAULT_RETRY, RetryPolicy
+from totvs.session import auth_headers
+
+# =========================
+# LIMITES DE CONEXÃO POR HOST
+# =========================
+# Compartilhados por todas as rotas/páginas que rodam no mesmo event loop.
+HOST_LIMITS = {
+    "apitotvsmoda.bhan.com.br": 8,
+    "treino.bhan.com.br:9443": 4,
+}
+DEFAULT_HOST_LIMIT = 4
+
+
+class TotvsHTTPError(RuntimeError):
+    def __init__(self, status: int, url: str, text: str):
+        super().__init__(f"HTTP {status} em {url}: {text[:500]}")
+        self.status = status
+        self.url = url
+        self.text = text
+
+
+def _has_more(data: Dict[str, Any], items: List[Any], page_size: int) -> bool:
+    has_next = data.get("hasNext")
+    if has_next is not None:
+        return bool(has_next)
+    return len(items) >= page_size
+
+
+class TotvsAsyncClient:
+    """Cliente assíncrono da API TOTVS Moda (um por event loop).
+
+    Uso:
+        async with TotvsAsyncClient() as client:
+            items = await client.fetch_all(URL, {"filter": {...}})
+    """
+
+    def __init__(
+        self,
+        token: str = TOKEN,
+        host_limits: Optional[Dict[str, int]] = None,
+        timeout: float = 60,
+        retry: RetryPolicy = DEFAULT_RETRY,
+    ):
+        self.headers = auth_headers(token)
+        self.host_limits = dict(HOST_LIMITS)
+        self.host_limits.update(host_limits or {})
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retry = retry
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "TotvsAsyncClient":
+        connector = aiohttp.TCPConnector(
+            limit=sum(self.host_limits.values()) + DEFAULT_HOST_LIMIT,
+            keepalive_timeout=60,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        host = host_key(url)
+        sem = self._semaphores.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.host_limits.get(host, DEFAULT_HOST_LIMIT))
+            self._semaphores[host] = sem
+        return sem
+
+    # =========================
+    # REQUISIÇÕES
+    # =========================
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        json: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if self._session is None:
+            raise RuntimeError("Use 'async with TotvsAsyncClient() as client'.")
+
+        limiter = limiter_for(url)
+        target = rewrite_url(url)
+        attempt = 0
+        while True:
+            await limiter.acquire_async()
+            try:
+                async with self._semaphore(url):
+                    async with self._session.request(method, target, json=json, params=params) as resp:
+                        limiter.observe(resp.status, resp.headers)
+                        retryable = attempt < self.retry.attempts and self.retry.allows(method, url)
+                        if resp.status in THROTTLE_STATUS and retryable:
+                            # mesma contagem das demais retentativas; a espera
+                            # (Retry-After) fica com o limitador, no acquire
+                            attempt += 1
+                            continue
+                        if resp.status in self.retry.status and retryable:
+                            error: Exception = TotvsHTTPError(resp.status, url, await resp.text())
+                        elif resp.status == 204:
+                            return {}
+                        elif resp.status != 200:
+                            raise TotvsHTTPError(resp.status, url, await resp.text())
+                        else:
+                            data = await resp.json(content_type=None) or {}
+                            if record_dir():
+                                record(method, url, params, json, resp.status, data)
+                            return data
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.retry.attempts:
+                    raise
+                # corpo pode ter chegado ao servidor: só repete o que é idempotente
+                if not isinstance(e, aiohttp.ClientConnectorError) and not self.retry.allows(method, url):
+                    raise
+                error = e
+
+            attempt += 1
+            delay = self.retry.delay(attempt)
+            print(f"🔁 {method} {url}: {error!s:.120} | nova tentativa {attempt} em {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.request("POST", url, json=payload)
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.request("GET", url, params=params)
+
+    # =========================
+    # PAGINAÇÃO
+    # =========================
+    async def _fetch_page(
+        self, method: str, url: str, base: Dict[str, Any], page: int, page_size: int
+    ) -> Dict[str, Any]:
+        body = dict(base)
+        body.update({"page": page, "pageSize": page_size})
+        if method.upper() == "GET":
+            return await self.get(url, params=body)
+        return await self.post(url, body)
+
+    async def paginate(
+        self,
+        url: str,
+        payload: Optional[Dict[str, Any]] = None,
+        *,
+        method: str = "POST",
+        page_size: int = 500,
+        items_key: str = "items",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Itera as respostas (página inteira) na ordem das páginas.
+
+        Quando a página 1 informa `totalPages`, as demais são buscadas em
+        paralelo numa janela de 2x o limite do host, para não acumular em
+        memória páginas que chegaram fora de ordem.
+        """
+        base = dict(payload or {})
+
+        data = await self._fetch_page(method, url, base, 1, page_size)
+        items = data.get(items_key) or []
+        if not items:
+            return
+        yield data
+
+        total_pages = data.get("totalPages") or data.get("pages")
+        if total_pages is not None:
+            last_page = int(total_pages)
+            window = 2 * self.host_limits.get(host_key(url), DEFAULT_HOST_LIMIT)
+            pending: Deque[asyncio.Future] = deque()
+            next_page = 2
+            try:
+                while next_page <= last_page or pending:
+                    while next_page <= last_page and len(pending) < window:
+                        pending.append(
+                            asyncio.ensure_future(
+                                self._fetch_page(method, url, base, next_page, page_size)
+                            )
+                        )
+                        next_page += 1
+
+                    data = await pending.popleft()
+                    if not (data.get(items_key) or []):
+                        break
+                    yield data
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            return
+
+        page = 1
+        while _has_more(data, items, page_size):
+            page += 1
+            data = await self._fetch_page(method, url, base, page, page_size)
+            items = data.get(items_key) or []
+            if not items:
+                break
+            yield data
+
+    async def fetch_all(
+        self,
+        url: str,
+        payload: Optional[Dict[str, Any]] = None,
+        *,
+        method: str = "POST",
+        page_size: int = 500,
+        items_key: str = "items",
+    ) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        async for data in self.paginate(
+            url, payload, method=method, page_size=page_size, items_key=items_key
+        ):
+            items.extend(data.get(items_key) or [])
+        return items
+
+
+async def gather_reports(*coros, return_exceptions: bool = False) -> List[Any]:
+    """Executa várias consultas (rotas/relatórios) no mesmo event loop."""
+    return await asyncio.gather(*coros, return_exceptions=return_exceptions)
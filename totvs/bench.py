@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from totvs.fixtures import FIXTURES_DIR, RECORD_ENV, STUB_ENV
+from totvs.stub_server import StubServer
+
+try:
+    import psutil
+except ImportError:  # sem psutil: pico via resource (Unix) ou nenhum (Windows)
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =========================
+# BENCHMARK OFFLINE DOS EXTRATORES
+# =========================
+# Roda cada script contra o servidor stub (sem rede, sem credenciais) e mede:
+#   páginas/s e linhas/s servidas, pico de memória (RSS) do processo filho e
+#   tempo de exportação (do último request respondido até o fim do processo).
+#
+#   python -m totvs.bench --fixtures fixtures --latency 0.05 --pages 40
+#   python -m totvs.bench fiscal-analytics/01-fiscal-moviment-boa/api.py --repeat 3
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_SCRIPTS = [
+    "fiscal-analytics/01-fiscal-moviment-boa/api.py",
+    "product/lista-produtos/02-lista-produto-preco-saldo/api.py",
+    "product/lista-produtos/03-lista-produto-preco-filtro/api.py",
+    "sale-panel/sale-panel-total/api.py",
+    "sale-panel/sale-panel-hours/api.py",
+    "tri/Vendas+Pessoa+Produto/api.py",
+]
+
+
+class PeakSampler(threading.Thread):
+    """Pico de RSS de um processo por amostragem (psutil), onde não há wait4."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self.done = threading.Event()
+
+    def run(self) -> None:
+        while not self.done.is_set():
+            try:
+                info = self.process.memory_info()
+            except psutil.Error:  # processo já terminou
+                return
+            # peak_wset (Windows) é o pico medido pelo próprio sistema
+            self.peak = max(self.peak, info.rss, getattr(info, "peak_wset", 0))
+            self.done.wait(self.interval)
+
+
+def wait_child(proc: subprocess.Popen) -> Optional[float]:
+    """Espera o filho e devolve o pico de memória dele em MB (None se não der).
+
+    wait4 (Linux e demais Unix) dá o rusage só deste filho; sem ele, vale o
+    psutil por amostragem ou o RUSAGE_CHILDREN (maior filho já esperado).
+    """
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return _maxrss_mb(usage.ru_maxrss)
+    if psutil is not None:
+        sampler = PeakSampler(proc.pid)
+        sampler.start()
+        proc.wait()
+        sampler.done.set()
+        sampler.join()
+        return round(sampler.peak / 2 ** 20, 1) if sampler.peak else None
+    proc.wait()
+    if resource is not None:
+        return _maxrss_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return None
+
+
+def _maxrss_mb(maxrss: int) -> float:
+    # ru_maxrss: KB no Linux, bytes no macOS
+    return round(maxrss / (2 ** 20 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_script(script: str, server: StubServer, timeout: float, workdir: str) -> Dict[str, Any]:
+    """Executa um extrator num processo filho apontado para o stub."""
+    env = dict(os.environ)
+    env[STUB_ENV] = server.url
+    env.pop(RECORD_ENV, None)
+    env.pop("TOTVS_DEBUG", None)
+
+    log_path = os.path.join(workdir, "output.log")
+    server.reset_stats()
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(REPO_ROOT, script)],
+            cwd=workdir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        try:
+            peak_rss_mb = wait_child(proc)
+        finally:
+            timer.cancel()
+    elapsed = time.perf_counter() - start
+
+    last = server.last_request_at
+    fetch_time = (last - start) if last else 0.0
+    return {
+        "script": script,
+        "returncode": proc.returncode,
+        "seconds": round(elapsed, 3),
+        "pages": server.requests,
+        "rows": server.rows,
+        "pages_per_s": round(server.requests / fetch_time, 1) if fetch_time > 0 else None,
+        "rows_per_s": round(server.rows / fetch_time, 1) if fetch_time > 0 else None,
+        "peak_rss_mb": peak_rss_mb,
+        "export_seconds": round(elapsed - fetch_time, 3) if last else None,
+        "log": log_path,
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'script':<58} {'ok':>3} {'s':>8} {'pág':>6} {'pág/s':>8} {'lin/s':>10} {'RSS MB':>8} {'export s':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['script'][-58:]:<58} {'✅' if r['returncode'] == 0 else '❌':>3} {r['seconds']:>8.2f} "
+            f"{r['pages']:>6} {r['pages_per_s'] or '-':>8} {r['rows_per_s'] or '-':>10} "
+            f"{r['peak_rss_mb'] or '-':>8} {r['export_seconds'] if r['export_seconds'] is not None else '-':>9}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline dos extratores TOTVS.")
+    parser.add_argument("scripts", nargs="*", help="scripts (caminho relativo à raiz do repositório)")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso fixo por requisição (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="atraso aleatório extra (s)")
+    parser.add_argument("--pages", type=int, default=None, help="total de páginas simulado por rota")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--out", default=None, help="arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    scripts = args.scripts or BENCH_SCRIPTS
+    fixtures = os.path.abspath(args.fixtures)
+    results: List[Dict[str, Any]] = []
+
+    with StubServer(fixtures, latency=args.latency, jitter=args.jitter, total_pages=args.pages) as server:
+        print(f"🧪 Stub em {server.url} (fixtures: {fixtures})")
+        for script in scripts:
+            for i in range(args.repeat):
+                workdir = tempfile.mkdtemp(prefix="totvs_bench_")
+                print(f"⏱️ {script} (rodada {i + 1}/{args.repeat})...")
+                result = run_script(script, server, args.timeout, workdir)
+                result["round"] = i + 1
+                results.append(result)
+                if result["returncode"] != 0:
+                    print(f"❌ Falhou (código {result['returncode']}); log em {result['log']}")
+
+    print()
+    print_report(results)
+
+    out = args.out or f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "generatedAt": datetime.now().isoformat(),
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "pages": args.pages,
+                "results": results,
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"\n💾 Resultados salvos em: {out}")
+    return 0 if all(r["returncode"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from auth.config import TOKEN
+
+# =========================
+# FILIAIS DO TOKEN + EXECUÇÃO POR FILIAL
+# =========================
+# O JWT da TOTVS traz as filiais liberadas na claim `branches`. Em vez de
+# rodar o mesmo script uma vez por filial, o extrator vira uma função
+# filial → DataFrame (ou {tabela: DataFrame}) e o fan_out roda todas em
+# paralelo, unindo o resultado com uma coluna de filial:
+#
+#   frames = fan_out(extrair_filial, column="branchCode")
+#
+# TOTVS_BRANCHES=1,2,5 restringe as filiais sem mexer no token.
+BRANCHES_ENV = "TOTVS_BRANCHES"
+
+Result = Union[pd.DataFrame, Dict[str, pd.DataFrame]]
+
+
+def token_claims(token: str = TOKEN) -> Dict[str, Any]:
+    """Payload do JWT (sem validar assinatura: só leitura das claims)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"TOKEN não é um JWT válido: {e}") from None
+
+
+def token_branches(token: str = TOKEN) -> List[int]:
+    """Filiais da claim `branches` (ou da variável TOTVS_BRANCHES)."""
+    raw = os.environ.get(BRANCHES_ENV)
+    values = raw.split(",") if raw else token_claims(token).get("branches") or []
+    branches = []
+    for value in values:
+        value = str(value).strip()
+        if value:
+            branches.append(int(value) if value.isdigit() else value)
+    return branches
+
+
+def union(results: Sequence[Tuple[Any, Result]], column: str = "branchCode") -> Result:
+    """Empilha os resultados por filial; a coluna de filial entra na frente
+    das tabelas que ainda não a têm."""
+
+    def tagged(df: pd.DataFrame, branch: Any) -> pd.DataFrame:
+        if column in df.columns:
+            return df
+        return df.assign(**{column: branch})[[column, *df.columns]]
+
+    if not results:
+        return pd.DataFrame()
+    if isinstance(results[0][1], pd.DataFrame):
+        return pd.concat([tagged(df, b) for b, df in results], ignore_index=True)
+
+    names: List[str] = []
+    for _, tables in results:
+        names.extend(n for n in tables if n not in names)
+    return {
+        name: pd.concat(
+            [tagged(tables[name], b) for b, tables in results if name in tables], ignore_index=True
+        )
+        for name in names
+    }
+
+
+class BranchesFailed(RuntimeError):
+    """Uma ou mais filiais falharam; `failures` traz (filial, exceção)."""
+
+    def __init__(self, failures: Sequence[Tuple[Any, BaseException]]):
+        self.failures = list(failures)
+        detail = "; ".join(f"filial {b}: {e}" for b, e in self.failures)
+        super().__init__(f"{len(self.failures)} filial(is) falharam, resultado incompleto ({detail})")
+
+
+def fan_out(
+    extract: Callable[[Any], Result],
+    branches: Optional[Sequence[Any]] = None,
+    max_workers: int = 4,
+    column: str = "branchCode",
+) -> Result:
+    """Roda `extract` por filial em paralelo e une os resultados.
+
+    Todas as filiais rodam até o fim; se alguma falhar, levanta
+    BranchesFailed (um RuntimeError) em vez de devolver um resultado sem ela.
+    """
+    branches = list(branches) if branches is not None else token_branches()
+    print(f"🏢 Filiais: {', '.join(map(str, branches))}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(branches) or 1)), thread_name_prefix="filial") as pool:
+        futures = [pool.submit(extract, b) for b in branches]
+    outputs = [f.exception() or f.result() for f in futures]
+    return _finish(branches, outputs, column)
+
+
+async def fan_out_async(
+    extract: Callable[[Any], Awaitable[Result]],
+    branches: Optional[Sequence[Any]] = None,
+    column: str = "branchCode",
+) -> Result:
+    """Versão asyncio do fan_out (o limite de conexões fica com o cliente)."""
+    branches = list(branches) if branches is not None else token_branches()
+    print(f"🏢 Filiais: {', '.join(map(str, branches))}")
+    outputs = await asyncio.gather(*(extract(b) for b in branches), return_exceptions=True)
+    return _finish(branches, outputs, column)
+
+
+def _finish(branches: Sequence[Any], outputs: Sequence[Union[Result, BaseException]], column: str) -> Result:
+    if not branches:
+        raise RuntimeError("Nenhuma filial para consultar.")
+    failures = []
+    for branch, out in zip(branches, outputs):
+        if not isinstance(out, BaseException):
+            continue
+        if not isinstance(out, Exception):
+            raise out  # cancelamento / interrupção
+        print(f"❌ Filial {branch} falhou: {out}")
+        failures.append((branch, out))
+    if failures:
+        raise BranchesFailed(failures) from failures[0][1]
+    return union(list(zip(branches, outputs)), column)
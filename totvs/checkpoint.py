@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+CHECKPOINT_ROOT = ".checkpoints"
+# Idade máxima (s) de um checkpoint para ser reaproveitado; mais velho que
+# isso, os dados podem ter mudado no servidor e a paginação recomeça do zero
+DEFAULT_MAX_AGE = 24 * 3600
+META_FILE = "checkpoint.json"
+
+
+class PageCheckpoint:
+    """Guarda em disco cada página concluída de uma paginação.
+
+    A chave (rota + filtros) identifica a consulta: rodar de novo o mesmo
+    script com os mesmos filtros reaproveita as páginas já baixadas e volta a
+    pedir à API só a partir da página que falhou. Chame `clear()` quando a
+    paginação terminar com sucesso.
+
+    Checkpoint com mais de `max_age` segundos (ou sem data de criação) é
+    descartado ao abrir; max_age=None reaproveita sem limite.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        key: Any,
+        root: str = CHECKPOINT_ROOT,
+        max_age: Optional[float] = DEFAULT_MAX_AGE,
+    ):
+        raw = json.dumps(key, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(root, f"{name}_{digest}")
+        self.max_age = max_age
+        if max_age is not None and os.path.isdir(self.dir):
+            age = self.age()
+            if age is None or age > max_age:
+                desc = "sem data" if age is None else f"{age / 3600:.1f} h"
+                print(f"🧹 Checkpoint {name} expirado ({desc}); baixando de novo.")
+                self.clear()
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.dir, META_FILE)
+
+    def age(self) -> Optional[float]:
+        """Segundos desde a criação do checkpoint (None se não houver)."""
+        try:
+            with open(self._meta_path(), encoding="utf-8") as f:
+                created = float(json.load(f)["created"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return max(0.0, time.time() - created)
+
+    def _path(self, page: int) -> str:
+        return os.path.join(self.dir, f"page_{page:06d}.json.gz")
+
+    def load(self, page: int) -> Optional[Dict[str, Any]]:
+        path = self._path(page)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, EOFError, ValueError):
+            # arquivo truncado (processo morto no meio da escrita): baixa de novo
+            return None
+
+    def save(self, page: int, data: Dict[str, Any]) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        meta = self._meta_path()
+        if not os.path.exists(meta):
+            # páginas podem ser salvas em paralelo: tmp próprio por thread
+            tmp = f"{meta}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time()}, f)
+            os.replace(tmp, meta)
+        path = self._path(page)
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=1) as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def pages(self) -> List[int]:
+        if not os.path.isdir(self.dir):
+            return []
+        return sorted(
+            int(name[len("page_"):-len(".json.gz")])
+            for name in os.listdir(self.dir)
+            if name.startswith("page_") and name.endswith(".json.gz")
+        )
+
+    def clear(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
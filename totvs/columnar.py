@@ -0,0 +1,181 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from totvs.mapping import FieldMap
+
+# =========================
+# TABELAS COLUNARES POR PÁGINA
+# =========================
+# Uma página da API costuma virar várias tabelas (produto + saldos +
+# localizações, preço + promoções...). PageTables alimenta todos os FieldMap
+# com os mesmos itens e, ao fim de cada página, converte as colunas em um
+# RecordBatch do Arrow por tabela; os buffers Python são liberados a cada
+# página e o resultado final é montado sem passar por listas de dicts.
+#
+#   tables = PageTables({"produtos": PRODUTOS, "saldos": SALDOS})
+#   for page in paginas:
+#       tables.add_page(page["items"])
+#   df_saldos = tables.frame("saldos")
+ARROW_TYPES = {
+    "int64": pa.int64(),
+    "Int64": pa.int64(),
+    "float64": pa.float64(),
+    "Float64": pa.float64(),
+    "string": pa.string(),
+    "str": pa.string(),
+    "bool": pa.bool_(),
+    "boolean": pa.bool_(),
+}
+
+
+# Inteiros com nulos voltam do Arrow como Int64 (e não float64 com NaN)
+PANDAS_INT_TYPES = {
+    pa.int8(): pd.Int64Dtype(),
+    pa.int16(): pd.Int64Dtype(),
+    pa.int32(): pd.Int64Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+
+def to_array(values: List[Any], dtype: Optional[str] = None) -> Optional[pa.Array]:
+    """Coluna Python → Array do Arrow; None se os tipos forem mistos (int + texto)."""
+    try:
+        return pa.array(values, type=ARROW_TYPES.get(dtype) if dtype else None, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+
+
+def _as_text(values: List[Any]) -> pa.Array:
+    return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def unified_schema(schemas: List[pa.Schema]) -> Tuple[pa.Schema, List[str]]:
+    """Um tipo por coluna para todas as páginas, com promoção permissiva
+    (int + float → float, null + x → x); devolve também as colunas sem tipo
+    comum (int + string), que ficam como texto no schema."""
+    fields, mixed = [], []
+    for i, name in enumerate(schemas[0].names):
+        try:
+            field = pa.unify_schemas(
+                [pa.schema([s.field(i)]) for s in schemas], promote_options="permissive"
+            ).field(0)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            field = pa.field(name, pa.string())
+            mixed.append(name)
+        fields.append(field)
+    return pa.schema(fields), mixed
+
+
+def cast_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """`table` no `schema` (coluna que o Arrow não converte vira texto via str())."""
+    if table.schema == schema:
+        return table
+    columns = []
+    for column, field in zip(table.columns, schema):
+        if column.type == field.type:
+            columns.append(column)
+            continue
+        try:
+            columns.append(column.cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            if field.type != pa.string():
+                raise
+            columns.append(_as_text(column.to_pylist()))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def record_batch(
+    fmap: FieldMap, clear: bool = True, mixed: Optional[Dict[str, List[Any]]] = None
+) -> pa.RecordBatch:
+    """Esvazia os buffers de `fmap` em um RecordBatch (colunas na ordem do spec).
+
+    Coluna com tipos mistos entra no lote como texto; os valores originais
+    vão para `mixed` (coluna → valores), se informado.
+    """
+    columns = fmap.columns_dict()
+    arrays = []
+    for name, values in columns.items():
+        array = to_array(values, fmap.dtypes.get(name))
+        if array is None:
+            array = _as_text(values)
+            if mixed is not None:
+                mixed[name] = values
+        arrays.append(array)
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(columns))
+    if clear:
+        fmap.clear()
+    return batch
+
+
+class PageTables:
+    """Várias tabelas (FieldMap) alimentadas pelos mesmos itens, página a página.
+
+    O Arrow exige um tipo por coluna; coluna com tipos mistos (numa página ou
+    entre páginas) fica como texto em table(), mas frame() a devolve como
+    object com os valores originais, como um DataFrame montado de dicts.
+    """
+
+    def __init__(self, tables: Mapping[str, FieldMap], keep: bool = True):
+        self.maps = dict(tables)
+        # keep=False: só devolve os lotes de cada página (quem chama grava/descarta)
+        self.keep = keep
+        self.batches: Dict[str, List[pa.RecordBatch]] = {name: [] for name in self.maps}
+        # valores originais das colunas mistas, por página: {tabela: [{coluna: valores}]}
+        self.mixed: Dict[str, List[Dict[str, List[Any]]]] = {name: [] for name in self.maps}
+        self.pages = 0
+
+    def copy(self) -> "PageTables":
+        """Mesmas tabelas, vazias (para montar outra extração em paralelo)."""
+        return PageTables({name: fmap.copy() for name, fmap in self.maps.items()}, keep=self.keep)
+
+    def add_page(self, items: Iterable[Dict[str, Any]]) -> Dict[str, pa.RecordBatch]:
+        """Explode a página em todas as tabelas; devolve o RecordBatch de cada uma."""
+        items = items if isinstance(items, list) else list(items)
+        page: Dict[str, pa.RecordBatch] = {}
+        for name, fmap in self.maps.items():
+            fmap.extend(items)
+            mixed: Dict[str, List[Any]] = {}
+            page[name] = record_batch(fmap, mixed=mixed)
+            if self.keep:
+                self.batches[name].append(page[name])
+                self.mixed[name].append(mixed)
+        self.pages += 1
+        return page
+
+    def rows(self, name: str) -> int:
+        return sum(b.num_rows for b in self.batches[name])
+
+    def _unify(self, name: str) -> Tuple[pa.Table, List[str]]:
+        batches = self.batches[name]
+        if not batches:
+            fmap = self.maps[name]
+            return pa.table({c: pa.array([], type=pa.null()) for c in fmap.columns}), []
+        tables = [pa.Table.from_batches([b]) for b in batches]
+        schema, mixed = unified_schema([t.schema for t in tables])
+        mixed += [c for page in self.mixed[name] for c in page if c not in mixed]
+        return pa.concat_tables([cast_table(t, schema) for t in tables]), mixed
+
+    def table(self, name: str) -> pa.Table:
+        """Tabela Arrow com todas as páginas, em um schema só (colunas mistas
+        como texto)."""
+        return self._unify(name)[0]
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """DataFrame da tabela: inteiros com nulos como Int64 e colunas mistas
+        como object com os valores originais."""
+        table, mixed = self._unify(name)
+        df = table.to_pandas()
+        for field, column in zip(table.schema, table.columns):
+            if field.name in mixed:
+                values: List[Any] = []
+                for batch, page in zip(self.batches[name], self.mixed[name]):
+                    values += page[field.name] if field.name in page else batch.column(field.name).to_pylist()
+                df[field.name] = pd.Series(values, dtype=object)
+            elif pa.types.is_integer(field.type) and column.null_count:
+                df[field.name] = column.to_pandas(types_mapper=PANDAS_INT_TYPES.get)
+        return df
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        return {name: self.frame(name) for name in self.maps}
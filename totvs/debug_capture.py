@@ -0,0 +1,83 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Optional
+
+# =========================
+# CAPTURA DE DEBUG (opcional)
+# =========================
+# Desligada por padrão. Com TOTVS_DEBUG=1 as respostas cruas vão para
+# debug/<nome>_<AAAAmmdd_HHMMSS>.ndjson.gz (uma linha JSON por captura),
+# gravadas por uma thread de fundo: a paginação não espera pela serialização
+# nem pelo disco.
+DEBUG_ENV = "TOTVS_DEBUG"
+DEBUG_DIR = "debug"
+
+_STOP = object()
+
+
+def debug_enabled() -> bool:
+    return os.environ.get(DEBUG_ENV, "").strip().lower() in ("1", "true", "yes", "sim", "on")
+
+
+class DebugCapture:
+    """Grava respostas cruas em NDJSON gzip numa thread separada.
+
+    Uso:
+        debug = DebugCapture("pedido-compra")
+        debug.capture(data, tag="purchase", page=page)
+        if debug.enabled:
+            ...  # prints caros de estrutura/amostra
+    """
+
+    def __init__(
+        self,
+        name: str,
+        enabled: Optional[bool] = None,
+        root: str = DEBUG_DIR,
+        max_pending: int = 32,
+    ):
+        self.name = name
+        self.enabled = debug_enabled() if enabled is None else enabled
+        self.path: Optional[str] = None
+        self.count = 0
+        if not self.enabled:
+            return
+
+        os.makedirs(root, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = os.path.join(root, f"{name}_{stamp}.ndjson.gz")
+
+        # fila limitada: se o disco não acompanhar, quem captura espera (memória fixa)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._writer, name=f"debug-{name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        print(f"🐞 Debug ligado: capturas em {self.path}")
+
+    def _writer(self) -> None:
+        with gzip.open(self.path, "wt", encoding="utf-8", compresslevel=1) as f:
+            while True:
+                record = self._queue.get()
+                if record is _STOP:
+                    break
+                f.write(json.dumps(record, ensure_ascii=False, default=str))
+                f.write("\n")
+
+    def capture(self, data: Any, tag: Optional[str] = None, **meta: Any) -> None:
+        if not self.enabled:
+            return
+        record = {"tag": tag, **meta, "captured_at": datetime.now().isoformat(), "data": data}
+        self._queue.put(record)
+        self.count += 1
+
+    def close(self) -> None:
+        if not self.enabled or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        print(f"🐞 {self.count} captura(s) de debug salvas em: {self.path}")
@@ -0,0 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import requests
+
+from totvs.session import get_session
+from totvs.streaming import post_items
+from totvs.sync import SyncStore, sync_endpoint
+
+# =========================
+# CACHE LOCAL DE DIMENSÕES (PESSOAS / PRODUTOS)
+# =========================
+# Cadastros mudam pouco, mas as rotas *-fiscal-movement devolvem a dimensão
+# inteira a cada execução. Aqui o cadastro fica em .sync/totvs_sync.sqlite
+# (tabela records, via SyncStore) e cada execução só pede o que mudou desde
+# a última marca d'água (filter.change das rotas de cadastro):
+#
+#   sync_dimensions(["pessoas_pf", "pessoas_pj"])       # delta
+#   items, missing = resolve_dimension(["pessoas_pf", "pessoas_pj"], codigos)
+#
+# A primeira sincronização baixa tudo que mudou desde INITIAL_START. Códigos
+# pedidos que não estão no cache são buscados pela lista de códigos do
+# cadastro (personCodeList/productCodeList) e gravados; o que continuar
+# faltando não existe no cadastro.
+#
+# Sem cache, fetch_codes busca uma lista de códigos direto no cadastro, em
+# lotes grandes de personCodeList/productCodeList pedidos em paralelo; um
+# lote com erro não descarta os demais:
+#
+#   items, failed = fetch_codes(URL_INDIVIDUALS, range(200, 300), {"expand": "addresses"})
+BASE_URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda"
+URL_INDIVIDUALS = f"{BASE_URL}/person/v2/individuals/search"
+URL_LEGAL_ENTITIES = f"{BASE_URL}/person/v2/legal-entities/search"
+URL_PRODUCTS = f"{BASE_URL}/product/v2/products/search"
+
+INITIAL_START = "2000-01-01T00:00:00Z"
+
+PERSON_CHANGE = {"inPerson": True, "inAddress": True, "inClassification": True}
+
+DIMENSIONS: Dict[str, Dict[str, Any]] = {
+    "pessoas_pf": {
+        "url": URL_INDIVIDUALS,
+        "payload": {"filter": {"change": PERSON_CHANGE}, "expand": "addresses,classifications"},
+        "key_fields": ["code"],
+        "code_filter": "personCodeList",
+    },
+    "pessoas_pj": {
+        "url": URL_LEGAL_ENTITIES,
+        "payload": {"filter": {"change": PERSON_CHANGE}, "expand": "addresses,classifications"},
+        "key_fields": ["code"],
+        "code_filter": "personCodeList",
+    },
+    "produtos": {
+        "url": URL_PRODUCTS,
+        "payload": {
+            "filter": {"change": {"inProduct": True, "inClassification": True}},
+            "expand": "classifications",
+        },
+        "key_fields": ["productCode"],
+        "code_filter": "productCodeList",
+    },
+}
+
+# Códigos por requisição na busca por lista de códigos
+CODES_PER_REQUEST = 500
+
+
+def sync_dimensions(
+    names: Sequence[str],
+    *,
+    initial_start: str = INITIAL_START,
+    page_size: int = 1000,
+    session: Optional[requests.Session] = None,
+) -> List[Dict[str, Any]]:
+    """Aplica no cache o delta de cada dimensão; devolve as estatísticas.
+
+    Abre a própria conexão SQLite: pode rodar em uma thread separada.
+    """
+    store = SyncStore()
+    results = []
+    try:
+        for name in names:
+            dim = DIMENSIONS[name]
+            stats = sync_endpoint(
+                dim["url"],
+                dim["payload"],
+                dataset=name,
+                key_fields=dim["key_fields"],
+                initial_start=initial_start,
+                page_size=page_size,
+                store=store,
+                session=session,
+            )
+            stats["cached"] = store.count(name)
+            print(
+                f"🗂️ Cache {name}: +{stats['inserted']} novos, {stats['updated']} alterados "
+                f"({stats['cached']} no cache)"
+            )
+            results.append(stats)
+    finally:
+        store.close()
+    return results
+
+
+def load_dimension(
+    names: Sequence[str], keys: Iterable[Any]
+) -> Tuple[List[Dict[str, Any]], Set[str]]:
+    """Registros das chaves pedidas (procura nas dimensões na ordem dada).
+
+    Devolve (registros, chaves sem cadastro no cache).
+    """
+    missing = {str(k) for k in keys}
+    items: List[Dict[str, Any]] = []
+    store = SyncStore()
+    try:
+        for name in names:
+            if not missing:
+                break
+            found = store.load_keys(name, sorted(missing))
+            items.extend(found.values())
+            missing.difference_update(found)
+    finally:
+        store.close()
+    return items, missing
+
+
+def _api_code(key: str) -> Any:
+    return int(key) if key.lstrip("-").isdigit() else key
+
+
+def fetch_codes(
+    url: str,
+    codes: Iterable[Any],
+    body: Optional[Dict[str, Any]] = None,
+    *,
+    code_filter: str = "personCodeList",
+    chunk_size: int = CODES_PER_REQUEST,
+    max_workers: int = 4,
+    page_size: int = 1000,
+    timeout: int = 60,
+    session: Optional[requests.Session] = None,
+) -> Tuple[List[Dict[str, Any]], List[Tuple[List[Any], Exception]]]:
+    """Itens do cadastro para os códigos informados e os lotes que falharam.
+
+    Os códigos vão em lotes de `chunk_size` no filtro `code_filter` (somado
+    ao filtro de `body`); até `max_workers` lotes em paralelo, cada um
+    paginado até hasNext=False. Os itens saem na ordem dos lotes e, dentro
+    do lote, na ordem da API. Devolve (itens, [(códigos do lote, erro)]).
+    """
+    session = session or get_session()
+    body = body or {}
+    codes = list(dict.fromkeys(codes))
+    chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+
+    def fetch(chunk: List[Any]) -> List[Dict[str, Any]]:
+        try:
+            return fetch_chunk(chunk)
+        except (requests.RequestException, ValueError) as e:
+            failed.append((chunk, e))
+            return []
+
+    def fetch_chunk(chunk: List[Any]) -> List[Dict[str, Any]]:
+        payload = dict(body, filter={**(body.get("filter") or {}), code_filter: chunk}, pageSize=page_size)
+        items: List[Dict[str, Any]] = []
+        page = 1
+        while True:
+            with post_items(url, dict(payload, page=page), session=session, timeout=timeout) as resp:
+                before = len(items)
+                items.extend(resp)
+                if len(items) == before or not resp.get("hasNext", False):
+                    return items
+            page += 1
+
+    failed: List[Tuple[List[Any], Exception]] = []
+    if not chunks:
+        return [], failed
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="codes") as pool:
+        items = [item for part in pool.map(fetch, chunks) for item in part]
+    failed.sort(key=lambda f: chunks.index(f[0]))
+    return items, failed
+
+
+def fetch_missing(
+    names: Sequence[str],
+    keys: Iterable[str],
+    *,
+    page_size: int = 1000,
+    timeout: int = 60,
+    session: Optional[requests.Session] = None,
+) -> int:
+    """Busca no cadastro só as chaves informadas e grava no cache; devolve quantas vieram."""
+    codes = [_api_code(k) for k in sorted(set(keys))]
+    store = SyncStore()
+    fetched = 0
+    try:
+        for name in names:
+            dim = DIMENSIONS[name]
+            items, failed = fetch_codes(
+                dim["url"],
+                codes,
+                {"expand": dim["payload"].get("expand")},
+                code_filter=dim["code_filter"],
+                page_size=page_size,
+                timeout=timeout,
+                session=session,
+            )
+            if items:
+                store.merge(name, items, dim["key_fields"])
+            fetched += len(items)
+            if failed:
+                # os lotes que deram certo já estão no cache
+                raise failed[0][1]
+    finally:
+        store.close()
+    return fetched
+
+
+def resolve_dimension(
+    names: Sequence[str],
+    keys: Iterable[Any],
+    session: Optional[requests.Session] = None,
+) -> Tuple[List[Dict[str, Any]], Set[str]]:
+    """Registros das chaves pedidas: cache primeiro, cadastro para as ausentes.
+
+    Devolve (registros, chaves que não existem no cadastro).
+    """
+    keys = {str(k) for k in keys}
+    items, missing = load_dimension(names, keys)
+    if missing:
+        fetch_missing(names, missing, session=session)
+        items, missing = load_dimension(names, keys)
+    return items, missing
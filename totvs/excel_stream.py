@@ -0,0 +1,143 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+import xlsxwriter
+
+# Limite de linhas de uma aba do Excel (inclui o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_576
+# Limite do nome de aba no Excel
+SHEET_NAME_MAX = 31
+
+
+def _cell(value: Any) -> Any:
+    """Converte valores do pandas/JSON para algo que o xlsxwriter grava."""
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # Excel não tem fuso: grava o horário local do próprio valor
+        return value.replace(tzinfo=None)
+    if hasattr(value, "item") and not isinstance(value, (str, bytes, date)):
+        return value.item()  # escalares numpy
+    return value
+
+
+class StreamingExcelWriter:
+    """Excel gravado linha a linha (xlsxwriter em constant_memory).
+
+    Cada linha vai direto para o arquivo temporário da aba, então a memória
+    não cresce com o tamanho do relatório. Ao atingir EXCEL_MAX_ROWS a aba
+    continua em "<nome>_2", "<nome>_3"...
+
+    Uso:
+        with StreamingExcelWriter("saida.xlsx") as xl:
+            xl.add_sheet("Movimentos", ["A", "B"])
+            for row in gerador:
+                xl.write_row(row)
+    """
+
+    def __init__(self, filename: str, max_rows: int = EXCEL_MAX_ROWS):
+        self.filename = filename
+        self.max_rows = max_rows
+        self.workbook = xlsxwriter.Workbook(
+            filename,
+            {"constant_memory": True, "strings_to_urls": False, "strings_to_numbers": False},
+        )
+        self.date_format = self.workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        self.header_format = self.workbook.add_format({"bold": True})
+
+        self._sheet = None
+        self._base_name = ""
+        self._part = 0
+        self._row = 0
+        self.columns: List[str] = []
+        self.rows_written = 0
+
+    # === ABAS ===
+    def add_sheet(self, name: str, columns: Optional[Sequence[str]] = None) -> None:
+        self._base_name = name
+        self._part = 0
+        self.columns = list(columns or [])
+        self._new_sheet()
+
+    def _new_sheet(self) -> None:
+        self._part += 1
+        suffix = "" if self._part == 1 else f"_{self._part}"
+        name = self._base_name[: SHEET_NAME_MAX - len(suffix)] + suffix
+        self._sheet = self.workbook.add_worksheet(name)
+        self._row = 0
+        if self.columns:
+            self._sheet.write_row(0, 0, self.columns, self.header_format)
+            self._row = 1
+
+    # === LINHAS ===
+    def write_row(self, row: Any) -> None:
+        """Grava uma linha (dict com as colunas da aba, ou sequência na ordem delas)."""
+        if self._sheet is None:
+            raise RuntimeError("Chame add_sheet() antes de gravar linhas.")
+
+        if isinstance(row, dict):
+            if not self.columns:
+                self.columns = list(row.keys())
+                self._sheet.write_row(0, 0, self.columns, self.header_format)
+                self._row = 1
+            values = [row.get(c) for c in self.columns]
+        else:
+            values = list(row)
+
+        if self._row >= self.max_rows:
+            self._new_sheet()
+
+        for col, value in enumerate(values):
+            value = _cell(value)
+            if value is None:
+                continue
+            if isinstance(value, (datetime, date)):
+                self._sheet.write_datetime(self._row, col, value, self.date_format)
+            else:
+                self._sheet.write(self._row, col, value)
+        self._row += 1
+        self.rows_written += 1
+
+    def write_rows(self, rows: Iterable[Any]) -> int:
+        n = 0
+        for row in rows:
+            self.write_row(row)
+            n += 1
+        return n
+
+    def write_dataframe(self, df: pd.DataFrame, sheet_name: str) -> int:
+        """Grava um DataFrame sem montar a planilha inteira em memória."""
+        self.add_sheet(sheet_name, [str(c) for c in df.columns])
+        return self.write_rows(df.itertuples(index=False, name=None))
+
+    def close(self) -> None:
+        self.workbook.close()
+
+    def __enter__(self) -> "StreamingExcelWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_excel_stream(filename: str, sheets: Dict[str, Any]) -> str:
+    """Atalho: {aba: DataFrame | iterável de dicts} → arquivo .xlsx."""
+    with StreamingExcelWriter(filename) as xl:
+        for name, data in sheets.items():
+            if isinstance(data, pd.DataFrame):
+                xl.write_dataframe(data, name)
+            else:
+                xl.add_sheet(name)
+                xl.write_rows(data)
+    return filename
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+# =========================
+# GRAVAÇÃO / REPRODUÇÃO DE RESPOSTAS
+# =========================
+# TOTVS_RECORD=fixtures  → cada resposta da API é gravada em
+#   fixtures/<host>/<MÉTODO>_<rota>/page_<NNNN>_<chave>.json
+#   (chave = hash do filtro/parâmetros sem a página: filiais e filtros
+#   diferentes não sobrescrevem as páginas umas das outras)
+# TOTVS_STUB_URL=http://127.0.0.1:8765 → as requisições vão para o servidor
+#   local (python -m totvs.stub_server) em vez da API; o host original segue
+#   como primeiro segmento do caminho para o stub saber qual rota responder.
+RECORD_ENV = "TOTVS_RECORD"
+STUB_ENV = "TOTVS_STUB_URL"
+FIXTURES_DIR = "fixtures"
+
+_PAGE_KEYS = ("page", "Page")
+_LOCK = threading.Lock()
+
+
+def record_dir() -> Optional[str]:
+    return os.environ.get(RECORD_ENV) or None
+
+
+def stub_url() -> Optional[str]:
+    return os.environ.get(STUB_ENV) or None
+
+
+def rewrite_url(url: str) -> str:
+    """https://host/api/... → <stub>/host/api/... (sem stub, devolve a própria URL)."""
+    stub = stub_url()
+    if not stub:
+        return url
+    parts = urlsplit(url)
+    base = urlsplit(stub)
+    path = f"{base.path.rstrip('/')}/{parts.netloc}{parts.path}"
+    return urlunsplit((base.scheme, base.netloc, path, parts.query, parts.fragment))
+
+
+def route_dir(root: str, method: str, host: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return os.path.join(root, host.replace(":", "_"), f"{method.upper()}_{slug}")
+
+
+def page_of(params: Optional[Dict[str, Any]], body: Any) -> int:
+    """Número da página pedida (corpo do POST ou query do GET); 1 se não houver."""
+    for source in (body if isinstance(body, dict) else None, params):
+        if not source:
+            continue
+        for key in _PAGE_KEYS:
+            if key in source:
+                try:
+                    return int(source[key])
+                except (TypeError, ValueError):
+                    pass
+    return 1
+
+
+def query_values(params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Parâmetros de query como o servidor os vê: texto, último valor de uma
+    lista, sem os None (que o requests nem envia)."""
+    query: Dict[str, str] = {}
+    for k, v in (params or {}).items():
+        if isinstance(v, (list, tuple)):
+            v = v[-1] if v else None
+        if v is not None:
+            query[str(k)] = str(v)
+    return query
+
+
+def request_key(params: Optional[Dict[str, Any]], body: Any) -> str:
+    """Hash curto da requisição sem o número da página (filtro, filial, pageSize...).
+
+    Os parâmetros de query entram como texto (query_values): page=2 gravado
+    pelo cliente assíncrono e "2" lido da URL pelo stub dão a mesma chave.
+    """
+
+    def strip(source: Any) -> Any:
+        if not isinstance(source, dict):
+            return source
+        return {k: v for k, v in source.items() if k not in _PAGE_KEYS}
+
+    raw = json.dumps([strip(query_values(params)), strip(body)], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def record(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    body: Any,
+    status: int,
+    data: Any,
+    root: Optional[str] = None,
+) -> Optional[str]:
+    """Grava um par requisição/resposta; devolve o caminho do arquivo."""
+    root = root or record_dir()
+    if not root:
+        return None
+
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(query_values(params))
+    page = page_of(query, body)
+    key = request_key(query, body)
+
+    folder = route_dir(root, method, parts.netloc, parts.path)
+    path = os.path.join(folder, f"page_{page:04d}_{key}.json")
+    fixture = {
+        "key": key,
+        "method": method.upper(),
+        "host": parts.netloc,
+        "path": parts.path,
+        "params": query,
+        "body": body,
+        "page": page,
+        "status": status,
+        "response": data,
+    }
+    with _LOCK:
+        os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, default=str)
+    return path
+
+
+def record_response(resp, *args, **kwargs):
+    """Hook de resposta do requests (session.hooks["response"])."""
+    req = resp.request
+    try:
+        body = json.loads(req.body) if req.body else None
+    except (TypeError, ValueError):
+        body = None
+    try:
+        data = resp.json()
+    except ValueError:
+        return resp
+    record(req.method, req.url, None, body, resp.status_code, data)
+    return resp
@@ -0,0 +1,125 @@
+from typing import Iterable, List, Tuple
+
+import pandas as pd
+
+# =========================
+# AGREGAÇÕES VETORIZADAS
+# =========================
+# Substituem o padrão groupby(...).agg({"col": lambda s: " | ".join(...)})
+# que chama uma função Python por grupo: a limpeza (str/strip/vazios) e a
+# deduplicação são feitas na coluna inteira, e o agrupamento só concatena
+# valores já únicos e ordenados.
+
+
+def join_unique(df: pd.DataFrame, key: str, column: str, sep: str = " | ") -> pd.Series:
+    """Valores distintos de `column` por `key`, ordenados e unidos por `sep`.
+
+    Mesmo resultado de aplicar por grupo:
+        " | ".join(sorted({str(v).strip() for v in grupo.dropna()} - {""})) or None
+    Grupos sem valor ficam de fora (o reindex de quem chama devolve NaN/None).
+    """
+    values = df[column]
+    mask = values.notna() & df[key].notna()
+    part = pd.DataFrame(
+        {
+            key: df.loc[mask, key].to_numpy(),
+            column: values[mask].astype(str).str.strip().to_numpy(dtype=object),
+        }
+    )
+    part = part[part[column] != ""].drop_duplicates()
+    part = part.sort_values([key, column], kind="stable")
+    return part.groupby(key, sort=False)[column].agg(sep.join)
+
+
+def group_first_join(
+    df: pd.DataFrame,
+    key: str,
+    first: Iterable[str],
+    joined: Iterable[str],
+    sep: str = " | ",
+) -> pd.DataFrame:
+    """Uma linha por `key`: primeiro valor não nulo de `first` e valores
+    distintos unidos de `joined` (colunas na ordem first + joined)."""
+    first = list(first)
+    joined = list(joined)
+    out = df.groupby(key, as_index=False)[first].first()
+    columns: List[str] = [key] + first
+    for column in joined:
+        merged = out[key].map(join_unique(df, key, column, sep))
+        # lista str/None: o pandas infere o dtype como no agg com função Python
+        values = [v if isinstance(v, str) else None for v in merged.tolist()]
+        out[column] = pd.Series(values, index=out.index)
+        columns.append(column)
+    return out[columns]
+
+
+# =========================
+# CHAVES DE JOIN (CÓDIGOS)
+# =========================
+# Códigos da API (pessoa, produto, operação...) chegam como int, float (coluna
+# com nulos) ou texto. Em vez de converter tudo para string a cada merge, a
+# chave é validada uma vez e vira Int64 (nulo onde vazio). Se algum valor não
+# for um inteiro "canônico" (zeros à esquerda, letras, espaços internos), a
+# coluna fica como texto sem espaços, igual ao comportamento anterior.
+INT_CODE = r"-?(?:0|[1-9][0-9]{0,17})"
+
+
+def code_key(values: pd.Series) -> pd.Series:
+    """Normaliza uma coluna de códigos: Int64 quando possível, senão texto."""
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return values.astype("string")
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype("Int64")
+    if pd.api.types.is_float_dtype(values.dtype):
+        present = values.dropna()
+        if present.abs().lt(1e18).all() and present.eq(present.round()).all():
+            return values.astype("Int64")
+    text = values.astype("string").str.strip()
+    if text.dropna().str.fullmatch(INT_CODE).all():
+        return text.astype("Int64")
+    return text
+
+
+def align_keys(left: pd.Series, right: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """As duas chaves no mesmo tipo (Int64 nos dois lados, ou texto nos dois)."""
+    left, right = code_key(left), code_key(right)
+    if left.dtype != right.dtype:
+        left = left.astype("string").str.strip()
+        right = right.astype("string").str.strip()
+    return left, right
+
+
+def lookup(
+    df: pd.DataFrame,
+    key: str,
+    dim: pd.DataFrame,
+    dim_key: str,
+    suffix: str = "_y",
+    keep_dim_key: bool = False,
+) -> pd.DataFrame:
+    """Left join de `df` com uma dimensão de chave única, por índice.
+
+    Equivale a df.merge(dim, how="left", left_on=key, right_on=dim_key,
+    suffixes=("", suffix)) com a coluna `dim_key` removida (ou mantida com
+    keep_dim_key=True), mas posiciona as linhas da dimensão com get_indexer
+    sobre a chave inteira em vez de fazer um hash join de strings.
+    """
+    left_key, right_key = align_keys(df[key], dim[dim_key])
+    present = right_key.notna().to_numpy()
+    index = pd.Index(right_key[present])
+    if not index.is_unique:
+        raise ValueError(f"Chave '{dim_key}' repetida na dimensão; agregue antes do lookup.")
+
+    positions = index.get_indexer(left_key)
+    right = dim.loc[present].reset_index(drop=True)
+    if not keep_dim_key:
+        right = right.drop(columns=[dim_key])
+    else:
+        right[dim_key] = right_key[present].to_numpy()
+    right = right.reindex(positions)  # -1 → linha vazia (sem match)
+    right.index = df.index
+    right.columns = [f"{c}{suffix}" if c in df.columns else c for c in right.columns]
+
+    out = df.copy()
+    out[key] = left_key
+    return pd.concat([out, right], axis=1).reset_index(drop=True)
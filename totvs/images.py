@@ -0,0 +1,325 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import requests
+from PIL import Image
+
+from totvs.session import get_session
+from totvs.streaming import post_items
+
+# =========================
+# PIPELINE DE IMAGENS DE PRODUTO
+# =========================
+# A image/v2/product/search devolve as imagens em base64 dentro do JSON. Em
+# vez de juntar todos os lotes em memória e só depois decodificar, cada lote
+# de códigos é buscado em paralelo (no máximo `max_workers` lotes em voo),
+# decodificado e gravado assim que chega, e o base64 é descartado na hora.
+# A resposta é lida em fluxo (totvs.streaming): cada item é guardado no
+# armazém pela própria thread do lote enquanto o resto do corpo ainda chega,
+# então só um base64 por lote existe em memória de cada vez.
+# As miniaturas são geradas em um pool de processos (PIL usa CPU e segura o
+# GIL), a partir do arquivo já gravado: só caminhos entram no processo, e
+# voltam o caminho da miniatura gravada ou, em memória, os bytes do JPEG.
+#
+#   produtos, imagens = run_pipeline(URL, codes, "images-totvs")
+#
+# As imagens ficam em um armazém por conteúdo (ImageStore): o arquivo é o
+# sha256 dos bytes, e o manifest.json liga produto/imageCode ao hash. A mesma
+# foto em várias cores/tamanhos é gravada uma vez, e imagem que não mudou
+# (mesmo base64 da execução anterior) não é decodificada, gravada nem
+# reprocessada na miniatura.
+BATCH_SIZE = 50
+THUMB_SIZE = (80, 80)
+
+# Miniaturas embutidas no Excel: altura da linha (pontos) e o tamanho final
+# da imagem na célula (px), sem x_scale/y_scale no insert_image
+EXCEL_ROW_HEIGHT = 80
+EXCEL_THUMB_SIZE = (96, 96)
+
+PRODUCT_FIELDS = ("productCode", "productName", "referencialCode", "colorName", "sizeName")
+IMAGE_FIELDS = ("imageCode", "imageName", "imageDescription", "typeImageName")
+
+
+def image_payload(codes: Sequence[int], type_codes: Sequence[int] = (1,), quantity: int = 1) -> Dict[str, Any]:
+    return {
+        "filter": {"productCodeList": list(codes), "typeImageCodeList": list(type_codes)},
+        "option": {"quantityImageResult": quantity},
+    }
+
+
+def fetch_batches(
+    url: str,
+    codes: Sequence[int],
+    *,
+    payload: Callable[[Sequence[int]], Dict[str, Any]] = image_payload,
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = 4,
+    session: Optional[requests.Session] = None,
+    timeout: int = 90,
+    on_item: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Itens de cada lote de códigos, na ordem dos lotes.
+
+    Até `max_workers` lotes em voo; o próximo só é pedido quando o mais
+    antigo é consumido, então a memória fica limitada aos lotes em voo.
+    `on_item` roda na thread do lote, para cada item assim que é lido.
+    """
+    session = session or get_session()
+    batches = [codes[i:i + batch_size] for i in range(0, len(codes), batch_size)]
+
+    def fetch(batch: Sequence[int]) -> List[Dict[str, Any]]:
+        try:
+            with post_items(url, payload(batch), session=session, timeout=timeout) as page:
+                return [on_item(item) if on_item else item for item in page]
+        except requests.HTTPError as e:
+            resp = e.response
+            raise RuntimeError(f"HTTP {resp.status_code} no lote {batch[0]}..{batch[-1]}: {resp.text[:500]}") from None
+        except ValueError as e:
+            raise RuntimeError(f"{e} (lote {batch[0]}..{batch[-1]})") from None
+        except requests.RequestException as e:
+            raise RuntimeError(f"Erro de conexão no lote {batch[0]}..{batch[-1]}: {e}") from e
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="imagens") as pool:
+        pending: Deque[Future] = deque()
+        try:
+            for batch in batches:
+                pending.append(pool.submit(fetch, batch))
+                if len(pending) >= max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _save_thumbnail(src: str, dst: Any, size: Tuple[int, int]) -> None:
+    with Image.open(src) as image:
+        image.thumbnail(size)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(dst, "JPEG")
+
+
+def make_thumbnail(src: str, dst: str, size: Tuple[int, int] = THUMB_SIZE) -> str:
+    """Miniatura JPEG de `src` em `dst` (roda no pool de processos)."""
+    _save_thumbnail(src, dst, size)
+    return dst
+
+
+def thumbnail_bytes(src: str, size: Tuple[int, int] = EXCEL_THUMB_SIZE) -> bytes:
+    """Miniatura JPEG de `src` em memória (roda no pool de processos)."""
+    buffer = BytesIO()
+    _save_thumbnail(src, buffer, size)
+    return buffer.getvalue()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    if os.path.exists(path):
+        return
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ImageStore:
+    """Imagens por conteúdo: objects/<aa>/<sha256>.jpg + manifest.json.
+
+    O manifesto guarda, por "produto/imageCode", o sha256 dos bytes e um
+    sha1 do texto base64 recebido; base64 igual ao da última execução
+    dispensa até a decodificação. Thread-safe.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.stats = {"unchanged": 0, "written": 0, "shared": 0}
+        self._lock = threading.Lock()
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest: Dict[str, Dict[str, str]] = json.load(f).get("images", {})
+        except FileNotFoundError:
+            self.manifest = {}
+
+    @staticmethod
+    def key(product_code: Any, image_code: Any) -> str:
+        return f"{product_code}/{image_code}"
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.jpg")
+
+    def thumb_path(self, digest: str, size: Tuple[int, int]) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}_{size[0]}x{size[1]}.jpg")
+
+    def put(self, key: str, image_base64: str) -> str:
+        """Grava a imagem (se ainda não existir) e devolve o sha256."""
+        source = hashlib.sha1(image_base64.encode("ascii")).hexdigest()
+        with self._lock:
+            entry = self.manifest.get(key)
+        if entry and entry.get("source") == source and os.path.exists(self.object_path(entry["sha256"])):
+            with self._lock:
+                self.stats["unchanged"] += 1
+            return entry["sha256"]
+
+        data = base64.b64decode(image_base64)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        shared = os.path.exists(path)
+        if not shared:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as img_file:
+                img_file.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            self.stats["shared" if shared else "written"] += 1
+            self.manifest[key] = {"sha256": digest, "source": source}
+        return digest
+
+    def save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "images": self.manifest}, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+
+def store_images(item: Dict[str, Any], store: ImageStore) -> Dict[str, Any]:
+    """Guarda as imagens do item no armazém, trocando o base64 por "sha256"."""
+    for img in item.get("images") or []:
+        if "imageFile" not in img:
+            continue  # já guardada
+        image_base64 = img.pop("imageFile")
+        img["sha256"] = None
+        try:
+            if image_base64:
+                img["sha256"] = store.put(store.key(item.get("productCode"), img.get("imageCode")), image_base64)
+        except (binascii.Error, ValueError, OSError) as e:
+            print(f"⚠️ Erro ao salvar imagem {item.get('productCode')}_{img.get('imageCode')}: {e}")
+    return item
+
+
+def save_batch(items: List[Dict[str, Any]], store: ImageStore) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Linhas (produtos, imagens) do lote; imagens ainda em base64 são guardadas aqui."""
+    produtos, imagens = [], []
+    for item in items:
+        store_images(item, store)
+        product_code = item.get("productCode")
+        produtos.append({f: item.get(f) for f in PRODUCT_FIELDS})
+
+        for img in item.get("images") or []:
+            digest = img.get("sha256")
+            imagens.append({
+                "productCode": product_code,
+                **{f: img.get(f) for f in IMAGE_FIELDS},
+                "imagePath": store.object_path(digest) if digest else None,
+                "thumbnailPath": None,
+                "_digest": digest,
+            })
+    return produtos, imagens
+
+
+def run_pipeline(
+    url: str,
+    codes: Sequence[int],
+    img_dir: str,
+    *,
+    thumb_size: Optional[Tuple[int, int]] = THUMB_SIZE,
+    in_memory: bool = False,
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = 4,
+    thumb_workers: Optional[int] = None,
+    on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    session: Optional[requests.Session] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Busca, guarda e gera miniaturas de todos os `codes`; devolve (produtos, imagens).
+
+    Imagens e miniaturas já existentes no armazém (`img_dir`) são
+    reaproveitadas; thumb_size=None não gera miniaturas. Com in_memory=True
+    os processos devolvem os bytes da miniatura (coluna "thumbnailData", para
+    insert_image(image_data=...)) e a cópia em disco é só gravada, em segundo
+    plano, nunca relida. `on_batch` recebe os itens de cada lote já sem o
+    base64 (ex.: debug).
+    """
+    store = ImageStore(img_dir)
+    produtos: List[Dict[str, Any]] = []
+    imagens: List[Dict[str, Any]] = []
+    thumbs: Dict[str, Future] = {}  # uma miniatura por hash
+    waiting: List[Tuple[Dict[str, Any], str]] = []
+
+    procs = ProcessPoolExecutor(max_workers=thumb_workers) if thumb_size else None
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="miniaturas") if procs and in_memory else None
+    try:
+        for number, items in enumerate(
+            fetch_batches(
+                url,
+                codes,
+                batch_size=batch_size,
+                max_workers=max_workers,
+                session=session,
+                on_item=lambda item: store_images(item, store),
+            ),
+            start=1,
+        ):
+            batch_produtos, batch_imagens = save_batch(items, store)
+            for row in batch_imagens:
+                digest = row.pop("_digest")
+                if not digest or procs is None:
+                    continue
+                dst = store.thumb_path(digest, thumb_size)
+                if in_memory:
+                    if digest not in thumbs:
+                        thumbs[digest] = procs.submit(thumbnail_bytes, store.object_path(digest), thumb_size)
+                    waiting.append((row, digest))
+                elif os.path.exists(dst):
+                    row["thumbnailPath"] = dst
+                else:
+                    if digest not in thumbs:
+                        thumbs[digest] = procs.submit(make_thumbnail, store.object_path(digest), dst, thumb_size)
+                    waiting.append((row, digest))
+            produtos.extend(batch_produtos)
+            imagens.extend(batch_imagens)
+            if on_batch is not None:
+                on_batch(items)
+            print(f"📦 Lote {number}: {len(batch_produtos)} produtos, {len(batch_imagens)} imagens")
+
+        cached = set()
+        for row, digest in waiting:
+            try:
+                result = thumbs[digest].result()
+            except Exception as e:
+                print(f"⚠️ Erro na miniatura de {row['productCode']}_{row['imageCode']}: {e}")
+                continue
+            if writer is None:
+                row["thumbnailPath"] = result
+                continue
+            row["thumbnailData"] = result
+            if digest not in cached:
+                cached.add(digest)
+                writer.submit(_write_file, store.thumb_path(digest, thumb_size), result)
+    finally:
+        if procs is not None:
+            procs.shutdown(cancel_futures=True)
+        if writer is not None:
+            writer.shutdown()
+        store.save()
+
+    print(
+        f"🗃️ Armazém: {store.stats['written']} imagens novas, {store.stats['shared']} repetidas, "
+        f"{store.stats['unchanged']} sem alteração, {len(thumbs)} miniaturas geradas"
+    )
+
+    image_columns = ["productCode", *IMAGE_FIELDS, "imagePath", "thumbnailPath"]
+    if writer is not None:
+        image_columns.append("thumbnailData")
+    return pd.DataFrame(produtos, columns=list(PRODUCT_FIELDS)), pd.DataFrame(imagens, columns=image_columns)
@@ -0,0 +1,450 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from totvs.columnar import PageTables
+from totvs.mapping import FieldMap
+from totvs.rate_limit import THROTTLE_STATUS, AdaptiveConcurrency, rate_limited
+from totvs.retry import DEFAULT_RETRY, RetryPolicy
+from totvs.session import get_session
+from totvs.sync import SYNC_DB, SyncStore, format_ts, parse_ts
+from totvs.warehouse import BatchSink
+
+# =========================
+# KARDEX EM ALTO VOLUME
+# =========================
+# A rota kardex-movement responde um produto por chamada. Em vez de varrer
+# uma faixa de códigos às cegas (a maioria volta 204), os códigos vêm da
+# product-codes/search da filial (por padrão, só os que tiveram estoque
+# alterado na janela). As chamadas passam por um AdaptiveConcurrency (o
+# número de requisições simultâneas acompanha a latência e os erros), os
+# códigos que falharem são repetidos em novas rodadas e as respostas viram
+# RecordBatches a cada `batch_size` produtos, gravados direto em Parquet:
+#
+#   codes = discover_product_codes(2, START, END)
+#   with BatchSink({"branch": 2}) as sink:
+#       stats = extract_kardex(2, codes, START, END, sink=sink)
+BASE_URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda"
+URL_KARDEX = f"{BASE_URL}/product/v2/kardex-movement"
+URL_PRODUCT_CODES = f"{BASE_URL}/product/v2/product-codes/search"
+
+# Produtos por RecordBatch (e por escrita no Parquet)
+BATCH_SIZE = 200
+
+# dtypes fixos: o schema do Parquet não muda entre lotes
+KARDEX_PRODUTOS = FieldMap({
+    "branchCode": ("branchCode", "Int64"),
+    "balanceType": ("balanceType", "Int64"),
+    "productCode": ("productCode", "Int64"),
+    "productDescription": ("productDescription", "string"),
+    "groupSequenceCode": ("groupSequenceCode", "string"),
+    "groupCode": ("groupCode", "string"),
+    "groupDescription": ("groupDescription", "string"),
+    "colorCode": ("colorCode", "string"),
+    "colorDescription": ("colorDescription", "string"),
+    "sizeDescription": ("sizeDescription", "string"),
+    "previousBalance": ("previousBalance", "float64"),
+})
+
+KARDEX_MOVIMENTOS = FieldMap(
+    {"productCode": ("productCode", "Int64")},
+    explode=("movements", {
+        "movementDate": ("movementDate", "string"),
+        "historyCode": ("historyCode", "Int64"),
+        "historyDescription": ("historyDescription", "string"),
+        "operationCode": ("operationCode", "Int64"),
+        "operationDescription": ("operationDescription", "string"),
+        "documentType": ("documentType", "Int64"),
+        "documentNumber": ("documentNumber", "string"),
+        "unitValue": ("unitValue", "float64"),
+        "inQuantity": ("inQuantity", "float64"),
+        "outQuantity": ("outQuantity", "float64"),
+        "balance": ("balance", "float64"),
+    }),
+    keep_empty=False,
+)
+
+
+def kardex_tables(keep: bool = True) -> PageTables:
+    """Tabelas kardex_produtos / kardex_movimentos com buffers próprios."""
+    return PageTables(
+        {"kardex_produtos": KARDEX_PRODUTOS.copy(), "kardex_movimentos": KARDEX_MOVIMENTOS.copy()},
+        keep=keep,
+    )
+
+
+def discover_product_codes(
+    branch: int,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    *,
+    page_size: int = 1000,
+    session: Optional[requests.Session] = None,
+    timeout: int = 60,
+) -> List[int]:
+    """Códigos de produto ativos na filial, na ordem da API.
+
+    Com `start`/`end`, só os que tiveram estoque alterado na filial dentro
+    da janela (os únicos com movimento no kardex).
+    """
+    session = session or get_session()
+    filt: Dict[str, Any] = {"branchInfo": {"branchCode": branch, "isActive": True}}
+    if start and end:
+        filt["change"] = {
+            "startDate": start,
+            "endDate": end,
+            "inStock": True,
+            "branchStockCodeList": [branch],
+        }
+
+    codes: Dict[int, None] = {}
+    page = 1
+    while True:
+        body = {"filter": filt, "order": "productCode", "page": page, "pageSize": page_size}
+        resp = rate_limited(session.post, URL_PRODUCT_CODES, json=body, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json() or {}
+        items = data.get("items") or []
+        if not items:
+            break
+        codes.update((item["productCode"], None) for item in items if item.get("productCode") is not None)
+        if not data.get("hasNext", False):
+            break
+        page += 1
+    return list(codes)
+
+
+def fetch_kardex(
+    branch: int,
+    code: int,
+    start: str,
+    end: str,
+    *,
+    balance_type: int = 1,
+    session: Optional[requests.Session] = None,
+    timeout: int = 60,
+) -> Optional[Dict[str, Any]]:
+    """Kardex de um produto na filial (None quando a API responde 204)."""
+    session = session or get_session()
+    params = {
+        "BranchCode": branch,
+        "ProductCode": code,
+        "StartDate": start,
+        "EndDate": end,
+        "BalanceType": balance_type,
+    }
+    resp = rate_limited(session.get, URL_KARDEX, params=params, timeout=timeout)
+    if resp.status_code == 204:
+        return None
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _transient(error: Exception) -> bool:
+    """Erro que vale repetir (conexão, timeout, 5xx, 429); 4xx é definitivo."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status in THROTTLE_STATUS
+    return isinstance(error, (requests.RequestException, ValueError))
+
+
+def _bounded(pool: ThreadPoolExecutor, fn: Callable[[Any], Any], args: Iterable[Any], window: int) -> Iterator[Any]:
+    """pool.map sem ordem e com no máximo `window` tarefas em voo (memória limitada)."""
+    pending: set = set()
+    for arg in args:
+        pending.add(pool.submit(fn, arg))
+        if len(pending) >= window:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def extract_kardex(
+    branch: int,
+    codes: Iterable[int],
+    start: str,
+    end: str,
+    *,
+    tables: Optional[PageTables] = None,
+    sink: Optional[BatchSink] = None,
+    gate: Optional[AdaptiveConcurrency] = None,
+    max_workers: int = 32,
+    rounds: int = 3,
+    batch_size: int = BATCH_SIZE,
+    balance_type: int = 1,
+    retry: RetryPolicy = DEFAULT_RETRY,
+    session: Optional[requests.Session] = None,
+    timeout: int = 60,
+) -> Dict[str, Any]:
+    """Kardex de todos os `codes` da filial; devolve as estatísticas.
+
+    As linhas vão para `tables` (kardex_tables() se omitido) e, com `sink`,
+    para o Parquet a cada lote. Um `gate` compartilhado entre filiais mantém
+    a concorrência total sob controle. Códigos com erro transitório são
+    repetidos até `rounds` vezes (com backoff); os que sobrarem, e os de
+    erro 4xx, voltam em stats["failed"].
+    """
+    session = session or get_session()
+    gate = gate or AdaptiveConcurrency(maximum=max_workers)
+    tables = tables if tables is not None else kardex_tables()
+
+    stats: Dict[str, Any] = {
+        "branch": branch,
+        "codes": 0,
+        "products": 0,
+        "empty": 0,
+        "movements": 0,
+        "retried": 0,
+        "failed": [],
+    }
+    pending: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        if not pending:
+            return
+        page = tables.add_page(pending)
+        pending.clear()
+        if sink is not None:
+            sink.write_page(page)
+
+    def one(code: int) -> Tuple[int, Optional[Dict[str, Any]], Optional[Exception]]:
+        with gate.slot() as slot:
+            try:
+                return code, fetch_kardex(
+                    branch, code, start, end, balance_type=balance_type, session=session, timeout=timeout
+                ), None
+            except (requests.RequestException, ValueError) as e:
+                slot.ok = not _transient(e)  # 4xx não é sinal de sobrecarga
+                return code, None, e
+
+    started = time.monotonic()
+    todo = list(dict.fromkeys(codes))
+    stats["codes"] = len(todo)
+    errors: Dict[int, str] = {}
+    for attempt in range(rounds + 1):
+        if attempt:
+            delay = retry.delay(attempt)
+            stats["retried"] += len(todo)
+            print(f"🔁 Filial {branch}: repetindo {len(todo)} código(s) em {delay:.1f}s (rodada {attempt}/{rounds})")
+            time.sleep(delay)
+
+        transient: List[int] = []
+        with ThreadPoolExecutor(max_workers=gate.maximum, thread_name_prefix="kardex") as pool:
+            for code, data, error in _bounded(pool, one, todo, 2 * gate.maximum):
+                if error is not None:
+                    errors[code] = str(error)
+                    if _transient(error):
+                        transient.append(code)
+                    continue
+                errors.pop(code, None)
+                if data is None:
+                    stats["empty"] += 1
+                    continue
+                pending.append(data)
+                stats["products"] += 1
+                stats["movements"] += len(data.get("movements") or [])
+                if len(pending) >= batch_size:
+                    flush()
+        todo = transient
+        if not todo:
+            break
+    flush()
+
+    stats["failed"] = sorted(errors)
+    stats["errors"] = errors
+    stats["seconds"] = round(time.monotonic() - started, 2)
+    stats["peak_workers"] = gate.peak
+    print(
+        f"📦 Filial {branch}: {stats['products']} produtos com kardex, {stats['empty']} sem movimento, "
+        f"{len(stats['failed'])} com erro ({stats['seconds']}s, até {gate.peak} simultâneas)"
+    )
+    return stats
+
+
+# =========================
+# KARDEX INCREMENTAL (SALDO CORRENTE LOCAL)
+# =========================
+# O kardex de uma janela traz o previousBalance e, por movimento,
+# inQuantity/outQuantity/balance. Guardando o último saldo de cada produto
+# por filial (tabela kardex_balances no mesmo SQLite do SyncStore) e a data
+# até onde a filial já foi lida (marca d'água), a atualização diária só pede
+# os produtos com estoque alterado desde então e só os movimentos novos:
+#
+#   produtos, movimentos, stats = refresh_kardex(2)
+#
+# O saldo corrente é recalculado localmente (saldo guardado + soma acumulada
+# de entradas - saídas, por produto) e conferido com a coluna `balance` do
+# servidor (balanceDiff). Saldos e marca d'água só são gravados quando todos
+# os produtos da janela vieram: uma falha apenas repete a mesma janela.
+# As janelas são de dias fechados (até ontem 23:59:59), para não cortar um
+# dia ao meio entre duas execuções.
+class KardexStore(SyncStore):
+    """SyncStore + último saldo conhecido por filial/produto/tipo de saldo."""
+
+    def __init__(self, path: str = SYNC_DB):
+        super().__init__(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS kardex_balances (
+                branch       INTEGER NOT NULL,
+                balance_type INTEGER NOT NULL,
+                product      INTEGER NOT NULL,
+                balance      REAL NOT NULL,
+                as_of        TEXT NOT NULL,
+                PRIMARY KEY (branch, balance_type, product)
+            );
+            """
+        )
+
+    @staticmethod
+    def watermark_key(branch: int, balance_type: int) -> str:
+        return f"branch={branch}|balanceType={balance_type}"
+
+    def load_balances(self, branch: int, balance_type: int, products: Iterable[int]) -> Dict[int, float]:
+        products = [int(p) for p in dict.fromkeys(products)]
+        found: Dict[int, float] = {}
+        for i in range(0, len(products), 500):
+            chunk = products[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(
+                self.conn.execute(
+                    f"SELECT product, balance FROM kardex_balances "
+                    f"WHERE branch = ? AND balance_type = ? AND product IN ({marks})",
+                    [branch, balance_type, *chunk],
+                )
+            )
+        return found
+
+    def commit_window(
+        self, branch: int, balance_type: int, balances: Dict[int, float], as_of: str
+    ) -> None:
+        """Grava os saldos e avança a marca d'água da filial na mesma transação."""
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO kardex_balances (branch, balance_type, product, balance, as_of)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (branch, balance_type, product)
+                DO UPDATE SET balance = excluded.balance, as_of = excluded.as_of
+                """,
+                [(branch, balance_type, int(p), float(b), as_of) for p, b in balances.items()],
+            )
+            self.conn.execute(
+                """
+                INSERT INTO watermarks (endpoint, filter_key, watermark, synced_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (endpoint, filter_key)
+                DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at
+                """,
+                (URL_KARDEX, self.watermark_key(branch, balance_type), as_of,
+                 format_ts(datetime.now(timezone.utc))),
+            )
+
+
+def running_balance(movements: pd.DataFrame, opening: pd.Series) -> pd.DataFrame:
+    """Saldo corrente por produto: abertura + soma acumulada de entradas - saídas.
+
+    `movements` na ordem da API (movimentos de cada produto em sequência);
+    `opening` é o saldo de abertura indexado por productCode. Acrescenta
+    runningBalance e balanceDiff (runningBalance - balance do servidor).
+    """
+    out = movements.copy()
+    if out.empty:
+        return out.assign(runningBalance=pd.Series(dtype="float64"), balanceDiff=pd.Series(dtype="float64"))
+    delta = out["inQuantity"].fillna(0) - out["outQuantity"].fillna(0)
+    start = out["productCode"].map(opening).fillna(0).astype("float64")
+    out["runningBalance"] = start + delta.groupby(out["productCode"], sort=False).cumsum()
+    out["balanceDiff"] = (out["runningBalance"] - out["balance"]).round(6)
+    return out
+
+
+def closed_day_end(now: Optional[datetime] = None) -> str:
+    """Fim do último dia fechado (ontem 23:59:59 UTC)."""
+    now = now or datetime.now(timezone.utc)
+    yesterday = (now - timedelta(days=1)).date()
+    return f"{yesterday:%Y-%m-%d}T23:59:59Z"
+
+
+def refresh_kardex(
+    branch: int,
+    *,
+    initial_start: str,
+    end: Optional[str] = None,
+    balance_type: int = 1,
+    tolerance: float = 1e-6,
+    store: Optional[KardexStore] = None,
+    **extract_kwargs: Any,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """Movimentos da filial desde a marca d'água, com saldo corrente conferido.
+
+    Na primeira execução a janela começa em `initial_start`. Devolve
+    (produtos, movimentos, stats); `extract_kwargs` segue para extract_kardex
+    (gate, sink, session...).
+    """
+    own_store = store is None
+    store = store or KardexStore()
+    try:
+        watermark = store.get_watermark(URL_KARDEX, store.watermark_key(branch, balance_type))
+        start_dt = parse_ts(watermark) + timedelta(seconds=1) if watermark else parse_ts(initial_start)
+        end = end or closed_day_end()
+        start = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if start_dt > parse_ts(end):
+            print(f"✅ Filial {branch}: kardex já atualizado até {watermark}")
+            empty = kardex_tables()
+            return empty.frame("kardex_produtos"), running_balance(
+                empty.frame("kardex_movimentos"), pd.Series(dtype="float64")
+            ), {"branch": branch, "start": start, "end": end, "codes": 0, "failed": [], "errors": {}, "mismatches": 0}
+
+        session = extract_kwargs.get("session")
+        codes = discover_product_codes(branch, start, end, session=session)
+        print(f"🔎 Filial {branch}: {len(codes)} produtos alterados entre {start} e {end}")
+
+        tables = kardex_tables()
+        stats = extract_kardex(branch, codes, start, end, tables=tables, balance_type=balance_type, **extract_kwargs)
+        produtos = tables.frame("kardex_produtos")
+        movimentos = tables.frame("kardex_movimentos")
+
+        # abertura: saldo guardado; produto novo usa o previousBalance do servidor
+        previous = produtos.set_index("productCode")["previousBalance"].astype("float64")
+        stored = pd.Series(store.load_balances(branch, balance_type, previous.index), dtype="float64")
+        opening = stored.reindex(previous.index).fillna(previous)
+        produtos["storedBalance"] = produtos["productCode"].map(stored).astype("float64")
+        produtos["openingDiff"] = (previous.to_numpy() - produtos["storedBalance"]).round(6)
+
+        movimentos = running_balance(movimentos, opening)
+        bad_mov = movimentos["balanceDiff"].abs() > tolerance
+        bad_open = produtos["openingDiff"].abs() > tolerance
+
+        # fechamento: saldo local; produto divergente fica com o do servidor
+        last = movimentos.groupby("productCode", sort=False)[["runningBalance", "balance"]].last()
+        diverged = last.index.isin(movimentos.loc[bad_mov, "productCode"].unique())
+        closing = opening.copy()
+        closing.update(last["runningBalance"].where(~diverged, last["balance"]))
+        produtos["closingBalance"] = produtos["productCode"].map(closing)
+        stats.update(
+            start=start,
+            end=end,
+            mismatches=int(bad_mov.sum()),
+            opening_mismatches=int(bad_open.sum()),
+        )
+        if stats["mismatches"]:
+            print(f"⚠️ Filial {branch}: {stats['mismatches']} movimentos com saldo diferente do servidor")
+        if stats["opening_mismatches"]:
+            print(f"⚠️ Filial {branch}: {stats['opening_mismatches']} produtos com abertura diferente do saldo guardado")
+
+        if stats["failed"]:
+            print(f"⚠️ Filial {branch}: {len(stats['failed'])} produtos com erro; saldos e marca d'água não avançam")
+        else:
+            store.commit_window(branch, balance_type, closing.dropna().to_dict(), end)
+        return produtos, movimentos, stats
+    finally:
+        if own_store:
+            store.close()
@@ -0,0 +1,213 @@
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+# =========================
+# MAPEAMENTO DECLARATIVO DE CAMPOS
+# =========================
+# Em vez de montar um dict por linha com item.get(...) e depois chamar
+# pd.DataFrame(rows), cada rota descreve suas colunas uma vez:
+#
+#   MOVIMENTOS = FieldMap({
+#       "Codigo_Empresa": "branchCode",
+#       "Cidade": "address.cityName",            # caminho aninhado
+#       "Banco": "payments.0.cardInformation.cardOperatorName",  # índice de lista
+#       "QTD": ("quantity", "float64"),         # (caminho, dtype)
+#       "Total": lambda item: ...,              # campo calculado
+#       "Ano": Const("Atual"),                  # valor fixo
+#   }, explode=("classifications", {"ClassificacaoCodigo": "code"}))
+#
+# O spec é compilado em uma função Python que percorre os itens e faz
+# append direto nas listas de cada coluna (sem dict intermediário).
+# Com `explode`, cada elemento da lista aninhada vira uma linha; item sem
+# elementos gera uma linha com as colunas da lista vazias (None), ou nenhuma
+# linha com keep_empty=False. Listas dentro de listas usam vários níveis:
+#
+#   explode=[("prices", {"priceCode": "priceCode"}),
+#            ("informationOtherPromotions", {"promo_code": "code"})]
+#
+# O caminho de cada nível é relativo ao elemento do nível anterior (ou uma
+# função elemento → lista) e os campos do nível, relativos ao seu elemento.
+#
+# Os valores de uma linha são todos calculados antes dos appends: um item
+# malformado que levante exceção não deixa as colunas desalinhadas. Caminho
+# que passa por um valor que não é dict (ou lista, para índices) dá None, e
+# "lista" de explode que não é lista conta como vazia, como safe_dict/safe_list.
+class Const:
+    """Valor fixo repetido em todas as linhas."""
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+Spec = Union[str, Tuple[str, Optional[str]], Const, Callable[[Dict[str, Any]], Any]]
+Level = Tuple[Union[str, Callable[[Dict[str, Any]], Any]], Mapping[str, Spec]]
+
+_ONE_EMPTY: Tuple[Dict[str, Any]] = ({},)
+
+
+def _split(path: str) -> List[Union[str, int]]:
+    return [int(p) if p.isdigit() else p for p in path.split(".")]
+
+
+class _Compiler:
+    """Gera o código da função extratora, reaproveitando prefixos de caminho."""
+
+    def __init__(self, prefix: str = "n"):
+        self.prefix = prefix
+        self.lines: List[str] = []
+        self.names: Dict[Tuple, str] = {}
+
+    def node(self, root: str, segments: Sequence[Union[str, int]], indent: str) -> str:
+        """Variável local com o valor do prefixo `segments` (ou None)."""
+        if not segments:
+            return root
+        key = (root, tuple(segments))
+        if key in self.names:
+            return self.names[key]
+        parent = self.node(root, segments[:-1], indent)
+        name = f"{self.prefix}{len(self.names)}"
+        self.lines.append(f"{indent}{name} = {_access(parent, segments[-1])}")
+        self.names[key] = name
+        return name
+
+    def value(self, root: str, path: str, indent: str) -> str:
+        segments = _split(path)
+        parent = self.node(root, segments[:-1], indent)
+        return f"({_access(parent, segments[-1])})"
+
+
+def _access(parent: str, seg: Union[str, int]) -> str:
+    """Acesso a um segmento que vira None quando o valor não é dict/lista
+    (como safe_dict/safe_list nos scripts)."""
+    if isinstance(seg, int):
+        return f"{parent}[{seg}] if isinstance({parent}, list) and len({parent}) > {seg} else None"
+    return f"{parent}.get({seg!r}) if isinstance({parent}, dict) else None"
+
+
+class FieldMap:
+    """Extrator de colunas compilado a partir de um spec {coluna: caminho}."""
+
+    def __init__(
+        self,
+        fields: Mapping[str, Spec],
+        explode: Optional[Union[Level, Sequence[Level]]] = None,
+        keep_empty: bool = True,
+    ):
+        self.fields = dict(fields)
+        self.keep_empty = keep_empty
+        if explode and not isinstance(explode, list):
+            explode = [explode]
+        self.levels: List[Tuple[Any, Dict[str, Spec]]] = [(p, dict(f)) for p, f in (explode or [])]
+        self.columns: List[str] = list(self.fields) + [c for _, f in self.levels for c in f]
+        self.dtypes: Dict[str, str] = {}
+        self._funcs: List[Callable[[Dict[str, Any]], Any]] = []
+        self._consts: List[Any] = []
+        self._extract = self._compile()
+        self._buffers: List[List[Any]] = [[] for _ in self.columns]
+
+    # === COMPILAÇÃO ===
+    def _expr(self, comp: _Compiler, column: str, spec: Spec, root: str, indent: str) -> str:
+        if isinstance(spec, Const):
+            self._consts.append(spec.value)
+            return f"_consts[{len(self._consts) - 1}]"
+        if callable(spec):
+            self._funcs.append(spec)
+            return f"f{len(self._funcs) - 1}({root})"
+        if isinstance(spec, tuple):
+            spec, dtype = spec
+            if dtype:
+                self.dtypes[column] = dtype
+        return comp.value(root, spec, indent)
+
+    def _source(self, comp: _Compiler, root: str, path: Any, indent: str) -> str:
+        """Expressão da lista de um nível de explode (caminho ou função)."""
+        if callable(path):
+            self._funcs.append(path)
+            return f"f{len(self._funcs) - 1}({root})"
+        return comp.node(root, _split(path), indent)
+
+    def _compile(self) -> Callable:
+        indent = " " * 8
+        comp = _Compiler("n")
+        exprs = [self._expr(comp, c, s, "item", indent) for c, s in self.fields.items()]
+        source = self._source(comp, "item", self.levels[0][0], indent) if self.levels else None
+        # valores do item calculados uma vez, antes dos laços das listas explodidas
+        lines = comp.lines + [f"{indent}v{i} = {expr}" for i, expr in enumerate(exprs)]
+        values = [f"v{i}" for i in range(len(exprs))]
+
+        fallback = "_ONE_EMPTY" if self.keep_empty else "()"
+        for level, (_, fields) in enumerate(self.levels, start=1):
+            elem, seq = f"e{level}", f"l{level}"
+            lines.append(f"{indent}{seq} = {source}")
+            lines.append(f"{indent}for {elem} in ({seq} if isinstance({seq}, (list, tuple)) and {seq} else {fallback}):")
+            indent += " " * 4
+            sub = _Compiler(f"s{level}_")
+            sub_exprs = [self._expr(sub, c, s, elem, indent) for c, s in fields.items()]
+            if level < len(self.levels):
+                source = self._source(sub, elem, self.levels[level][0], indent)
+            lines += sub.lines + [f"{indent}w{level}_{j} = {expr}" for j, expr in enumerate(sub_exprs)]
+            values += [f"w{level}_{j}" for j in range(len(sub_exprs))]
+        append_indent = indent
+
+        src = ["def _extract(items, buffers, funcs):"]
+        src.append("    " + ", ".join(f"a{i}" for i in range(len(self.columns))) + ", = [b.append for b in buffers]")
+        if self._funcs:
+            src.append("    " + ", ".join(f"f{i}" for i in range(len(self._funcs))) + ", = funcs")
+        src.append("    rows = 0")
+        src.append("    for item in items:")
+        src.append("        if not item:")
+        src.append("            continue")
+        src += lines
+        src += [f"{append_indent}a{i}({value})" for i, value in enumerate(values)]
+        src.append(f"{append_indent}rows += 1")
+        src.append("    return rows")
+
+        self.source = "\n".join(src)
+        namespace: Dict[str, Any] = {"_ONE_EMPTY": _ONE_EMPTY, "_consts": self._consts}
+        exec(compile(self.source, "<totvs.mapping>", "exec"), namespace)
+        return namespace["_extract"]
+
+    # === USO ===
+    def copy(self) -> "FieldMap":
+        """Mesmo extrator compilado com buffers próprios (um por thread)."""
+        clone = object.__new__(FieldMap)
+        clone.__dict__.update(self.__dict__)
+        clone._buffers = [[] for _ in self.columns]
+        return clone
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Acrescenta as linhas de `items` aos buffers; devolve quantas linhas."""
+        return self._extract(items, self._buffers, self._funcs)
+
+    def __len__(self) -> int:
+        return len(self._buffers[0]) if self._buffers else 0
+
+    def clear(self) -> None:
+        self._buffers = [[] for _ in self.columns]
+
+    def columns_dict(self) -> Dict[str, List[Any]]:
+        return dict(zip(self.columns, self._buffers))
+
+    def frame(self, clear: bool = True) -> pd.DataFrame:
+        """DataFrame com as colunas na ordem do spec (dtypes aplicados)."""
+        data = {}
+        for column, values in zip(self.columns, self._buffers):
+            dtype = self.dtypes.get(column)
+            data[column] = pd.Series(values, dtype=dtype) if dtype else values
+        df = pd.DataFrame(data, columns=self.columns)
+        if clear:
+            self.clear()
+        return df
+
+    def to_frame(self, items: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+        """Atalho: extrai `items` e devolve o DataFrame."""
+        self.extend(items)
+        return self.frame()
+
+    def row(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Uma linha como dict (para quem ainda acumula listas de dicts)."""
+        buffers: List[List[Any]] = [[] for _ in self.columns]
+        self._extract((item,), buffers, self._funcs)
+        return {c: (b[0] if b else None) for c, b in zip(self.columns, buffers)}
+
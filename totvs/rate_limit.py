@@ -0,0 +1,265 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+from totvs.fixtures import stub_url
+
+# =========================
+# ORÇAMENTO POR HOST (requisições/segundo)
+# =========================
+# `max_rate` é o teto que o limitador nunca ultrapassa; `rate` é o ponto de
+# partida. A taxa sobe aos poucos enquanto o servidor responde bem e cai pela
+# metade a cada 429/503. O limitador não repete requisições: isso fica com uma
+# camada só, o Retry da sessão (ou o laço do cliente assíncrono).
+HOST_BUDGETS: Dict[str, Dict[str, float]] = {
+    "apitotvsmoda.bhan.com.br": {"rate": 5.0, "max_rate": 20.0},
+    "treino.bhan.com.br:9443": {"rate": 2.0, "max_rate": 5.0},
+}
+DEFAULT_BUDGET = {"rate": 3.0, "max_rate": 10.0}
+
+THROTTLE_STATUS = (429, 503)
+
+
+def host_key(url: str) -> str:
+    # "treino.bhan.com.br:9443" mantém a porta; hosts na 443 ficam sem ela
+    return urlsplit(url).netloc
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Token bucket com taxa adaptativa (aumento aditivo, queda multiplicativa).
+
+    Thread-safe; `acquire` bloqueia a thread e `acquire_async` só suspende a
+    corrotina, então o mesmo limitador serve scripts síncronos e o cliente
+    assíncrono.
+    """
+
+    def __init__(
+        self,
+        rate: float = 3.0,
+        max_rate: float = 10.0,
+        min_rate: float = 0.2,
+        burst: Optional[float] = None,
+        increase: float = 0.2,
+        decrease: float = 0.5,
+    ):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.increase = increase
+        self.decrease = decrease
+
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Reserva um token e devolve quantos segundos esperar por ele."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+
+            wait = 0.0
+            if self._tokens < 0:
+                wait = -self._tokens / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> float:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def observe(self, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Ajusta a taxa a partir do status (e do Retry-After) da resposta."""
+        with self._lock:
+            if status in THROTTLE_STATUS:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.burst = max(1.0, min(self.burst, self.rate))
+                self._tokens = min(self._tokens, 0.0)
+
+                delay = parse_retry_after((headers or {}).get("Retry-After"))
+                if delay is None:
+                    delay = 1.0 / self.rate
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            elif status < 500:
+                # aumento aditivo: ~`increase` req/s a cada `rate` respostas boas
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+                self.burst = max(self.burst, min(self.rate, self.max_rate))
+
+
+class UnlimitedLimiter:
+    """Limitador que não espera: reprodução pelo stub (TOTVS_STUB_URL), onde o
+    orçamento do host real só mediria o limitador, e não o extrator."""
+
+    def acquire(self) -> float:
+        return 0.0
+
+    async def acquire_async(self) -> float:
+        return 0.0
+
+    def observe(self, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        pass
+
+
+_LIMITERS: Dict[str, AdaptiveRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+_UNLIMITED = UnlimitedLimiter()
+
+
+def limiter_for(url: str) -> AdaptiveRateLimiter:
+    """Limitador compartilhado (por processo) do host da URL."""
+    if stub_url():
+        return _UNLIMITED
+    host = host_key(url)
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(host)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(**HOST_BUDGETS.get(host, DEFAULT_BUDGET))
+            _LIMITERS[host] = limiter
+        return limiter
+
+
+def rate_limited(send: Callable[..., Any], url: str, *args, **kwargs) -> Any:
+    """Chama `send(url, ...)` respeitando o limitador do host.
+
+    O limitador só ajusta a taxa: quem repete 429/503 (depois do Retry-After)
+    é o Retry do urllib3 da sessão (totvs.retry). As respostas 429/503 que ele
+    já repetiu também reduzem a taxa, para as próximas chamadas do host.
+
+    Ex.: rate_limited(session.get, URL, headers=HEADERS, params=params, timeout=60)
+    """
+    limiter = limiter_for(url)
+    limiter.acquire()
+    resp = send(url, *args, **kwargs)
+    retries = getattr(getattr(resp, "raw", None), "retries", None)
+    for retried in getattr(retries, "history", ()):
+        if retried.status in THROTTLE_STATUS:
+            limiter.observe(retried.status)
+    limiter.observe(resp.status_code, resp.headers)
+    return resp
+
+
+# =========================
+# CONCORRÊNCIA ADAPTATIVA (requisições simultâneas)
+# =========================
+# O limitador acima controla requisições/segundo; aqui o controle é de quantas
+# ficam em voo ao mesmo tempo. O pool de threads pode ter `maximum` workers,
+# mas só `limit` passam pelo portão: o limite sobe 1 a cada `limit` respostas
+# boas e cai pela metade em erro ou quando a latência (média móvel) passa de
+# `latency_factor` vezes a melhor já observada, no máximo uma queda por janela.
+class AdaptiveConcurrency:
+    """Portão com limite de concorrência ajustado pela latência e pelos erros.
+
+    Uso (thread-safe):
+        gate = AdaptiveConcurrency(initial=4, maximum=32)
+        with gate.slot() as slot:
+            resp = session.get(...)
+            slot.ok = resp.status_code < 500
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        latency_factor: float = 2.0,
+        smoothing: float = 0.2,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.peak = self.limit
+
+        self.active = 0
+        self.latency: Optional[float] = None   # média móvel (s)
+        self.baseline: Optional[float] = None  # menor média móvel vista
+        self._good = 0
+        self._since_cut = 0
+        self._cooldown = 0  # respostas a esperar antes de outra queda
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, ok: bool, elapsed: float) -> None:
+        with self._cond:
+            self.active -= 1
+            if ok:
+                self.latency = elapsed if self.latency is None else (
+                    (1 - self.smoothing) * self.latency + self.smoothing * elapsed
+                )
+                self.baseline = self.latency if self.baseline is None else min(self.baseline, self.latency)
+
+            self._since_cut += 1
+            slow = ok and self.latency is not None and self.latency > self.baseline * self.latency_factor
+            if (not ok or slow) and self._since_cut >= self._cooldown:
+                # queda multiplicativa; as respostas ainda em voo (do limite
+                # antigo) não contam, e a média recomeça com as novas
+                self._cooldown = self.limit
+                self.limit = max(self.minimum, self.limit // 2)
+                self.latency = None
+                self._good = 0
+                self._since_cut = 0
+            elif ok and not slow:
+                self._good += 1
+                if self._good >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._good = 0
+                    self.peak = max(self.peak, self.limit)
+            self._cond.notify_all()
+
+    def slot(self) -> "_Slot":
+        return _Slot(self)
+
+
+class _Slot:
+    """Uma vaga no portão; `ok` (padrão True) diz se a resposta foi boa."""
+
+    def __init__(self, gate: AdaptiveConcurrency):
+        self.gate = gate
+        self.ok = True
+
+    def __enter__(self) -> "_Slot":
+        self.gate.acquire()
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.gate.release(self.ok and exc_type is None, time.monotonic() - self._start)
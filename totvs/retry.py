@@ -0,0 +1,94 @@
+import random
+from typing import FrozenSet, Optional, Tuple
+from urllib.parse import urlsplit
+
+from urllib3.util.retry import Retry
+
+# =========================
+# POLÍTICA DE RETENTATIVA
+# =========================
+# GET é repetível sempre. POST só nas rotas de busca (*/search, *-search):
+# um */create repetido depois de um timeout, com o servidor já tendo gravado,
+# criaria o registro duas vezes. Erro de conexão (nada enviado) é repetido
+# para qualquer método. 429/503 são repetidos só aqui (respeitando o
+# Retry-After); o limitador de taxa (totvs.rate_limit) apenas reduz a taxa.
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset({"GET"})
+SEARCH_METHODS = frozenset({"POST"})
+SEARCH_SUFFIX = "search"  # .../search, .../item-detail-search
+
+
+def is_search_url(url: Optional[str]) -> bool:
+    return bool(url) and urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1].endswith(SEARCH_SUFFIX)
+
+
+class SearchRetry(Retry):
+    """Retry do urllib3 que só repete os métodos de SEARCH_METHODS em */search."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if (
+            method
+            and method.upper() in SEARCH_METHODS
+            and method.upper() not in RETRY_METHODS
+            and not is_search_url(url)
+            and not (error and self._is_connection_error(error))
+        ):
+            # sem nova tentativa: esgota na hora (a resposta/erro original sobe)
+            return Retry.increment(self.new(total=0), method, url, response, error, _pool, _stacktrace)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter: base * 2^(n-1) + U(0, jitter), até `cap`."""
+
+    def __init__(
+        self,
+        attempts: int = 5,
+        base: float = 0.5,
+        cap: float = 30.0,
+        jitter: float = 1.0,
+        status: Tuple[int, ...] = RETRY_STATUS,
+        methods: FrozenSet[str] = RETRY_METHODS,
+        search_methods: FrozenSet[str] = SEARCH_METHODS,
+    ):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+        self.status = status
+        self.methods = methods
+        self.search_methods = search_methods
+
+    def allows(self, method: str, url: str) -> bool:
+        """Se a requisição pode ser repetida depois de enviada (5xx/timeout)."""
+        method = method.upper()
+        return method in self.methods or (method in self.search_methods and is_search_url(url))
+
+    def delay(self, attempt: int) -> float:
+        """Espera antes da retentativa `attempt` (1 = primeira retentativa)."""
+        backoff = self.base * (2 ** (attempt - 1))
+        return min(self.cap, backoff + random.uniform(0, self.jitter))
+
+    def to_urllib3(self) -> Retry:
+        """Mesma política para o HTTPAdapter das sessões `requests`.
+
+        Cobre erros de conexão, timeouts de leitura, 429 e os status 5xx.
+        """
+        return SearchRetry(
+            total=self.attempts,
+            connect=self.attempts,
+            read=self.attempts,
+            status=self.attempts,
+            backoff_factor=self.base,
+            backoff_max=self.cap,
+            backoff_jitter=self.jitter,
+            status_forcelist=self.status,
+            allowed_methods=self.methods | self.search_methods,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+
+DEFAULT_RETRY = RetryPolicy()
+# Para chamadas que gravam (*/create...): nenhuma retentativa
+NO_RETRY = RetryPolicy(attempts=0, search_methods=frozenset())
@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from auth.config import TOKEN
+from totvs.fixtures import record_dir, record_response, rewrite_url, stub_url
+from totvs.retry import DEFAULT_RETRY, RetryPolicy
+
+# =========================
+# POOL DE CONEXÕES
+# =========================
+# Um pool por host (apitotvsmoda, treino:9443, ...); cada pool mantém até
+# POOL_MAXSIZE conexões keep-alive, o suficiente para os scripts que usam
+# ThreadPoolExecutor não abrirem/fecharem TLS a cada página.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+
+
+def auth_headers(token: str = TOKEN) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    }
+
+
+class StubAdapter(HTTPAdapter):
+    """Desvia as requisições para o servidor de fixtures (TOTVS_STUB_URL)."""
+
+    def send(self, request, **kwargs):
+        stubbed = request.copy()
+        stubbed.url = rewrite_url(request.url)
+        resp = super().send(stubbed, **kwargs)
+        resp.request = request  # hooks/gravação continuam vendo a URL original
+        return resp
+
+
+def make_session(
+    token: str = TOKEN,
+    pool_maxsize: int = POOL_MAXSIZE,
+    headers: Optional[Dict[str, str]] = None,
+    retry: RetryPolicy = DEFAULT_RETRY,
+) -> requests.Session:
+    """Nova sessão com pool keep-alive, compressão negociada e retentativas
+    (5xx, timeouts e erros de conexão) com backoff exponencial + jitter."""
+    s = requests.Session()
+    s.headers.update(auth_headers(token))
+    if headers:
+        s.headers.update(headers)
+
+    adapter_cls = StubAdapter if stub_url() else HTTPAdapter
+    adapter = adapter_cls(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry.to_urllib3(),
+    )
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+
+    if record_dir():
+        s.hooks["response"].append(record_response)
+    return s
+
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Sessão compartilhada pelo processo inteiro (criada na primeira chamada)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = make_session()
+        return _SESSION
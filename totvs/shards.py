@@ -0,0 +1,131 @@
+import math
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from totvs.sync import parse_ts
+
+# =========================
+# FATIAMENTO DE JANELAS DE DATA
+# =========================
+# Uma janela grande (START..END) vira fatias filial × período, buscadas em
+# paralelo; cada fatia tem poucas páginas, e a paginação profunda do servidor
+# (cada vez mais lenta conforme o número da página) não acontece.
+#
+#   shards = plan_shards(BRANCH_CODE_LIST, START, END, count_items=contar)
+#   df = MAPA.to_frame(run_shards(shards, buscar_fatia, max_workers=4))
+#
+# O tamanho da fatia (1 a 7 dias) é escolhido por filial a partir do
+# totalItems que a API informa para a janela inteira (uma consulta com
+# pageSize=1): filiais com muito movimento viram fatias de um dia, filiais
+# pequenas ficam com fatias semanais.
+TS_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Itens desejados por fatia (≈ páginas × pageSize)
+DEFAULT_TARGET_ITEMS = 10_000
+MAX_SHARD_DAYS = 7
+
+
+class Shard(NamedTuple):
+    branch: Any
+    start: datetime
+    end: datetime
+
+    @property
+    def start_str(self) -> str:
+        return self.start.strftime(TS_FORMAT)
+
+    @property
+    def end_str(self) -> str:
+        return self.end.strftime(TS_FORMAT)
+
+    def __str__(self) -> str:
+        return f"{self.branch} {self.start:%Y-%m-%d}..{self.end:%Y-%m-%d}"
+
+
+def split_window(start: datetime, end: datetime, days: int) -> List[tuple]:
+    """Fatias [início, fim] de `days` dias, sem sobreposição (fim = próximo início - 1s)."""
+    step = timedelta(days=days)
+    parts = []
+    cur = start
+    while cur <= end:
+        nxt = cur + step
+        parts.append((cur, min(nxt - timedelta(seconds=1), end)))
+        cur = nxt
+    return parts
+
+
+def shard_days(
+    total_items: Optional[int],
+    window_days: float,
+    target_items: int = DEFAULT_TARGET_ITEMS,
+    max_days: int = MAX_SHARD_DAYS,
+) -> int:
+    """Dias por fatia para ~`target_items` itens (1 dia se o total é desconhecido)."""
+    if not total_items:
+        return 1 if total_items is None else max_days
+    per_day = total_items / max(window_days, 1.0)
+    return max(1, min(max_days, int(target_items // per_day)))
+
+
+def plan_shards(
+    branches: Sequence[Any],
+    start: str,
+    end: str,
+    count_items: Callable[[Shard], Optional[int]],
+    target_items: int = DEFAULT_TARGET_ITEMS,
+    max_days: int = MAX_SHARD_DAYS,
+) -> List[Shard]:
+    """Fatias filial × período; filial com totalItems = 0 fica de fora."""
+    start_dt, end_dt = parse_ts(start), parse_ts(end)
+    if start_dt is None or end_dt is None:
+        raise ValueError(f"Janela inválida: {start!r} .. {end!r}")
+    window_days = math.ceil((end_dt - start_dt).total_seconds() / 86400) or 1
+
+    shards: List[Shard] = []
+    for branch in branches:
+        total = count_items(Shard(branch, start_dt, end_dt))
+        if total == 0:
+            continue
+        days = shard_days(total, window_days, target_items, max_days)
+        shards.extend(Shard(branch, a, b) for a, b in split_window(start_dt, end_dt, days))
+        print(f"🧩 Filial {branch}: {total if total is not None else '?'} itens → fatias de {days} dia(s)")
+    return shards
+
+
+def branch_windows(branches: Sequence[Any], start: str, end: str) -> List[Shard]:
+    """Uma fatia por filial com a janela inteira (sem fatiar o período)."""
+    start_dt, end_dt = parse_ts(start), parse_ts(end)
+    if start_dt is None or end_dt is None:
+        raise ValueError(f"Janela inválida: {start!r} .. {end!r}")
+    return [Shard(branch, start_dt, end_dt) for branch in branches]
+
+
+def run_shards(
+    shards: Sequence[Shard],
+    fetch: Callable[[Shard], Iterable[Dict[str, Any]]],
+    max_workers: int = 4,
+) -> Iterator[Dict[str, Any]]:
+    """Busca as fatias em paralelo e entrega os itens fatia a fatia (ordem filial, data).
+
+    As fatias não se sobrepõem (fim = próximo início - 1s), então não há
+    item repetido entre elas. Só as fatias em voo ficam em memória: a
+    próxima é pedida quando a mais antiga é consumida.
+    """
+    if not shards:
+        return
+    todo = iter(shards)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards))), thread_name_prefix="shard") as pool:
+        pending: Deque[Future] = deque()
+        for shard in todo:
+            pending.append(pool.submit(lambda s: list(fetch(s)), shard))
+            if len(pending) >= max_workers:
+                break
+        while pending:
+            part = pending.popleft().result()
+            shard = next(todo, None)
+            if shard is not None:
+                pending.append(pool.submit(lambda s: list(fetch(s)), shard))
+            yield from part
+            del part
@@ -0,0 +1,129 @@
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+import urllib3
+
+from totvs.fixtures import record_dir
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+
+try:
+    import ijson
+except ImportError:  # sem ijson: cada página é lida inteira com resp.json()
+    ijson = None
+
+# =========================
+# LEITURA EM FLUXO DAS PÁGINAS */search
+# =========================
+# Com pageSize 1000 (ou imagens em base64), resp.json() guarda o corpo
+# inteiro (bytes + texto + dicts) antes do primeiro item ser usado. Aqui a
+# resposta é pedida com stream=True e o ijson monta um item de cada vez
+# enquanto o corpo ainda está chegando:
+#
+#   with post_items(URL, body) as page:
+#       for item in page:
+#           processar(item)
+#       if page.get("hasNext"):
+#           ...
+#
+# Os campos de topo da página (hasNext, totalPages, count...) ficam em
+# page.meta; como podem vir depois de "items" no JSON, só estão completos
+# ao fim da iteração. Sem o ijson instalado (ou gravando fixtures, quando o
+# hook de gravação já leu o corpo), o mesmo código funciona com resp.json().
+#
+# Um item entregue já foi processado: se a conexão cair ou o JSON quebrar no
+# meio da página, a exceção sobe depois de parte dos itens ter sido usada.
+# Quem repete a página precisa de um processamento idempotente (armazém por
+# hash, merge por chave) ou descartar o que veio da página que falhou.
+SCALAR_EVENTS = ("null", "boolean", "integer", "double", "number", "string")
+
+
+def _stream_items(raw: Any, items_key: str, meta: Dict[str, Any]) -> Iterator[Any]:
+    item_prefix = f"{items_key}.item"
+    builder = None
+    try:
+        for prefix, event, value in ijson.parse(raw, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == item_prefix and event in ("end_map", "end_array"):
+                    yield builder.value
+                    builder = None
+            elif prefix == item_prefix:
+                if event in ("start_map", "start_array"):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                else:
+                    yield value
+            elif event in SCALAR_EVENTS and prefix and "." not in prefix:
+                meta[prefix] = value
+    except ijson.JSONError as e:
+        # mesmo tipo de erro do resp.json()
+        raise ValueError(f"JSON inválido na resposta: {e}") from e
+
+
+class StreamedPage:
+    """Uma página */search lida item a item (itere uma vez só).
+
+    Com buffered=True a página inteira vem de resp.json(); senão, do
+    resp.raw pelo ijson. Em caso de erro no meio da página, `count` diz
+    quantos itens já tinham sido entregues.
+    """
+
+    def __init__(self, resp: requests.Response, items_key: str = "items", buffered: bool = False):
+        self.resp = resp
+        self.items_key = items_key
+        self.buffered = buffered or ijson is None
+        self.meta: Dict[str, Any] = {}
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            if self.buffered:
+                data = self.resp.json() or {}
+                items = data.pop(self.items_key, None) or []
+                self.meta.update(data)
+            else:
+                self.resp.raw.decode_content = True  # gzip/deflate do servidor
+                items = _stream_items(self.resp.raw, self.items_key, self.meta)
+            for item in items:
+                self.count += 1
+                yield item
+        except urllib3.exceptions.HTTPError as e:
+            # resp.raw não passa pelo requests: conexão caída no meio do corpo
+            # (IncompleteRead/ProtocolError) sobe como RequestException
+            raise requests.exceptions.ChunkedEncodingError(e) from e
+        finally:
+            self.close()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.meta.get(key, default)
+
+    def close(self) -> None:
+        self.resp.close()
+
+    def __enter__(self) -> "StreamedPage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def post_items(
+    url: str,
+    body: Dict[str, Any],
+    *,
+    session: Optional[requests.Session] = None,
+    timeout: int = 60,
+    items_key: str = "items",
+) -> StreamedPage:
+    """POST com stream=True; erros HTTP sobem antes de ler o corpo."""
+    session = session or get_session()
+    resp = rate_limited(session.post, url, json=body, timeout=timeout, stream=True)
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError:
+        resp.content  # corpo do erro (pequeno) fica disponível em e.response.text
+        resp.close()
+        raise
+    # gravando fixtures, o hook da sessão já leu o corpo inteiro (resp.json())
+    return StreamedPage(resp, items_key, buffered=bool(record_dir()))
@@ -0,0 +1,233 @@
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from totvs.fixtures import FIXTURES_DIR, page_of, request_key, route_dir
+
+# =========================
+# SERVIDOR STUB (REPRODUZ AS FIXTURES)
+# =========================
+# Uso:
+#   python -m totvs.stub_server --fixtures fixtures --latency 0.08 --pages 50
+#   TOTVS_STUB_URL=http://127.0.0.1:8765 python fiscal-analytics/01-.../api.py
+#
+# A rota é escolhida por método + host + caminho; entre as páginas gravadas
+# da rota, valem as do mesmo filtro (chave da requisição) e, se o filtro nunca
+# foi gravado (ou a fixture é antiga, sem chave), todas as da rota. Com
+# --pages N as páginas gravadas são repetidas em ciclo até N, reescrevendo
+# hasNext/totalPages, para simular volumes maiores que o gravado.
+DEFAULT_PORT = 8765
+
+
+def items_key(body: Any) -> Optional[str]:
+    """Chave da lista paginada ("items", ou "dataRow" no painel de vendas)."""
+    if not isinstance(body, dict):
+        return None
+    if "items" in body:
+        return "items"
+    for key, value in body.items():
+        if isinstance(value, list):
+            return key
+    return None
+
+
+class FixtureStore:
+    """Índice das fixtures gravadas: (método, host, caminho) → páginas."""
+
+    def __init__(self, root: str = FIXTURES_DIR):
+        self.root = root
+        self._routes: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def pages(self, method: str, host: str, path: str) -> List[Dict[str, Any]]:
+        folder = route_dir(self.root, method, host, path)
+        with self._lock:
+            cached = self._routes.get(folder)
+            if cached is not None:
+                return cached
+            pages = []
+            if os.path.isdir(folder):
+                for name in sorted(os.listdir(folder)):
+                    if name.endswith(".json"):
+                        with open(os.path.join(folder, name), encoding="utf-8") as f:
+                            pages.append(json.load(f))
+            self._routes[folder] = pages
+            return pages
+
+    def matching(self, method: str, host: str, path: str, key: str) -> List[Dict[str, Any]]:
+        """Páginas gravadas com o mesmo filtro; todas as da rota se não houver."""
+        pages = self.pages(method, host, path)
+        return [p for p in pages if p.get("key") == key] or pages
+
+
+def build_response(
+    pages: List[Dict[str, Any]], page: int, total_pages: Optional[int] = None
+) -> Tuple[int, Any]:
+    """Resposta (status, corpo) para a página pedida."""
+    if not pages:
+        return 404, {"message": "Nenhuma fixture gravada para esta rota."}
+
+    if total_pages is None:
+        for fixture in pages:
+            if fixture.get("page") == page:
+                return fixture.get("status", 200), fixture.get("response")
+        # além do gravado: página vazia e fim da paginação
+        last = pages[-1].get("response")
+        key = items_key(last)
+        if key:
+            return 200, dict(last, **{key: []}, hasNext=False, count=0)
+        return pages[-1].get("status", 200), last
+
+    template = pages[(page - 1) % len(pages)].get("response")
+    key = items_key(template)
+    if not key:
+        return 200, template
+
+    body = copy.copy(template)
+    per_page = len(template.get(key) or [])
+    if page > total_pages:
+        body[key] = []
+    body["count"] = len(body[key])
+    body["hasNext"] = page < total_pages
+    body["totalPages"] = total_pages
+    body["totalItems"] = per_page * total_pages
+    return 200, body
+
+
+class StubServer:
+    """Servidor HTTP local que responde com as fixtures (em thread própria)."""
+
+    def __init__(
+        self,
+        root: str = FIXTURES_DIR,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        total_pages: Optional[int] = None,
+    ):
+        self.store = FixtureStore(root)
+        self.latency = latency
+        self.jitter = jitter
+        self.total_pages = total_pages
+
+        self.requests = 0
+        self.rows = 0
+        self.last_request_at: Optional[float] = None
+        self._stats_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.requests = 0
+            self.rows = 0
+            self.last_request_at = None
+
+    def _count(self, body: Any) -> None:
+        key = items_key(body)
+        rows = len(body.get(key) or []) if key else 0
+        with self._stats_lock:
+            self.requests += 1
+            self.rows += rows
+            self.last_request_at = time.perf_counter()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados
+
+            def _serve(self, method: str) -> None:
+                parts = urlsplit(self.path)
+                segments = parts.path.lstrip("/").split("/", 1)
+                host = segments[0]
+                path = "/" + (segments[1] if len(segments) > 1 else "")
+                params = dict(parse_qsl(parts.query))
+
+                body = None
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length))
+                    except ValueError:
+                        body = None
+
+                if server.latency or server.jitter:
+                    time.sleep(server.latency + random.uniform(0, server.jitter))
+
+                pages = server.store.matching(method, host, path, request_key(params, body))
+                status, payload = build_response(pages, page_of(params, body), server.total_pages)
+                server._count(payload)
+
+                raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="totvs-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor stub que reproduz as fixtures da API TOTVS.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso fixo por requisição (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="atraso aleatório extra (s)")
+    parser.add_argument("--pages", type=int, default=None, help="total de páginas simulado por rota")
+    args = parser.parse_args()
+
+    server = StubServer(args.fixtures, args.host, args.port, args.latency, args.jitter, args.pages)
+    print(f"🧪 Stub servindo {args.fixtures} em {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
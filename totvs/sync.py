@@ -0,0 +1,279 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+
+from totvs.rate_limit import rate_limited
+from totvs.session import get_session
+
+# =========================
+# SINCRONIZAÇÃO INCREMENTAL
+# =========================
+# Para cada rota + filtro guardamos a maior `maxChangeFilterDate` já vista
+# (marca d'água). A próxima execução pede só o que mudou desde então
+# (filter.change.startDate) e aplica o delta na cópia local por chave natural.
+SYNC_DIR = ".sync"
+SYNC_DB = os.path.join(SYNC_DIR, "totvs_sync.sqlite")
+
+# Recuo aplicado à marca d'água: cobre alterações gravadas no servidor com o
+# mesmo carimbo de tempo logo após a última consulta. O merge por chave torna
+# a sobreposição inofensiva.
+DEFAULT_OVERLAP = timedelta(minutes=5)
+
+WindowFn = Callable[[Dict[str, Any], str, str], Dict[str, Any]]
+
+
+def parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def format_ts(dt: datetime) -> str:
+    dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def change_window(payload: Dict[str, Any], start: str, end: str) -> Dict[str, Any]:
+    """Janela em filter.change.startDate/endDate (rotas */search em POST)."""
+    body = copy.deepcopy(payload)
+    change = body.setdefault("filter", {}).setdefault("change", {})
+    change["startDate"] = start
+    change["endDate"] = end
+    return body
+
+
+def params_window(start_key: str = "StartChangeDate", end_key: str = "EndChangeDate") -> WindowFn:
+    """Janela em parâmetros de query (rotas GET, ex.: StartChangeDate/EndChangeDate)."""
+
+    def apply(params: Dict[str, Any], start: str, end: str) -> Dict[str, Any]:
+        body = dict(params)
+        body[start_key] = start
+        body[end_key] = end
+        return body
+
+    return apply
+
+
+def filter_key(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SyncStore:
+    """Marcas d'água + cópia local dos registros (SQLite, sem dependências)."""
+
+    def __init__(self, path: str = SYNC_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                endpoint   TEXT NOT NULL,
+                filter_key TEXT NOT NULL,
+                watermark  TEXT NOT NULL,
+                synced_at  TEXT NOT NULL,
+                PRIMARY KEY (endpoint, filter_key)
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                dataset    TEXT NOT NULL,
+                key        TEXT NOT NULL,
+                changed_at TEXT,
+                payload    TEXT NOT NULL,
+                PRIMARY KEY (dataset, key)
+            );
+            """
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # === MARCA D'ÁGUA ===
+    def get_watermark(self, endpoint: str, fkey: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT watermark FROM watermarks WHERE endpoint = ? AND filter_key = ?",
+            (endpoint, fkey),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, endpoint: str, fkey: str, watermark: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO watermarks (endpoint, filter_key, watermark, synced_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (endpoint, filter_key)
+                DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at
+                """,
+                (endpoint, fkey, watermark, format_ts(datetime.now(timezone.utc))),
+            )
+
+    # === REGISTROS ===
+    def merge(
+        self,
+        dataset: str,
+        items: Iterable[Dict[str, Any]],
+        key_fields: Sequence[str],
+        change_field: str = "maxChangeFilterDate",
+    ) -> Tuple[int, int]:
+        """Upsert por chave natural; devolve (inseridos, atualizados)."""
+        rows = []
+        for item in items:
+            key = "|".join(str(item.get(f)) for f in key_fields)
+            rows.append((dataset, key, item.get(change_field), json.dumps(item, ensure_ascii=False)))
+        if not rows:
+            return 0, 0
+
+        existing = set()
+        keys = [r[1] for r in rows]
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            existing.update(
+                k for (k,) in self.conn.execute(
+                    f"SELECT key FROM records WHERE dataset = ? AND key IN ({marks})",
+                    [dataset, *chunk],
+                )
+            )
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO records (dataset, key, changed_at, payload)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (dataset, key) DO UPDATE SET
+                    changed_at = excluded.changed_at,
+                    payload = excluded.payload
+                """,
+                rows,
+            )
+
+        updated = len(set(keys) & existing)
+        return len(set(keys)) - updated, updated
+
+    def load(self, dataset: str) -> List[Dict[str, Any]]:
+        return [
+            json.loads(payload)
+            for (payload,) in self.conn.execute(
+                "SELECT payload FROM records WHERE dataset = ? ORDER BY key", (dataset,)
+            )
+        ]
+
+    def load_keys(self, dataset: str, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Registros de `dataset` só das chaves pedidas (ausentes ficam de fora)."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for key, payload in self.conn.execute(
+                f"SELECT key, payload FROM records WHERE dataset = ? AND key IN ({marks})",
+                [dataset, *chunk],
+            ):
+                found[key] = json.loads(payload)
+        return found
+
+    def count(self, dataset: str) -> int:
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM records WHERE dataset = ?", (dataset,)).fetchone()
+        return n
+
+
+def sync_endpoint(
+    url: str,
+    payload: Dict[str, Any],
+    *,
+    dataset: str,
+    key_fields: Sequence[str],
+    initial_start: str,
+    window: WindowFn = change_window,
+    method: str = "POST",
+    change_field: str = "maxChangeFilterDate",
+    page_size: int = 500,
+    overlap: timedelta = DEFAULT_OVERLAP,
+    store: Optional[SyncStore] = None,
+    session: Optional[requests.Session] = None,
+    timeout: int = 60,
+    on_page: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Baixa só o que mudou desde a última execução e aplica em `dataset`.
+
+    `payload` é o corpo (POST) ou os parâmetros (GET) sem a janela de datas
+    e sem paginação; `window` injeta o intervalo. Na primeira execução a
+    janela começa em `initial_start`. A marca d'água só avança quando a
+    paginação termina, então uma falha no meio apenas repete a mesma janela.
+    """
+    store = store or SyncStore()
+    session = session or get_session()
+
+    fkey = filter_key(payload)
+    watermark = store.get_watermark(url, fkey)
+    if watermark and store.count(dataset) == 0:
+        # cópia local vazia (dataset novo/renomeado): a marca d'água não vale
+        watermark = None
+    if watermark:
+        start_dt = parse_ts(watermark) - overlap
+    else:
+        start_dt = parse_ts(initial_start)
+    end_dt = datetime.now(timezone.utc)
+
+    start, end = format_ts(start_dt), format_ts(end_dt)
+    body = window(payload, start, end)
+
+    fetched = inserted = updated = 0
+    max_change = parse_ts(watermark)
+    page = 1
+    while True:
+        if method.upper() == "GET":
+            params = dict(body, Page=page, PageSize=page_size)
+            resp = rate_limited(session.get, url, params=params, timeout=timeout)
+        else:
+            resp = rate_limited(
+                session.post, url, json=dict(body, page=page, pageSize=page_size), timeout=timeout
+            )
+        resp.raise_for_status()
+        data = resp.json() or {}
+
+        if on_page is not None:
+            on_page(page, data)
+
+        items = data.get("items") or []
+        if not items:
+            break
+
+        ins, upd = store.merge(dataset, items, key_fields, change_field)
+        fetched += len(items)
+        inserted += ins
+        updated += upd
+
+        for item in items:
+            changed = parse_ts(item.get(change_field))
+            if changed is not None and (max_change is None or changed > max_change):
+                max_change = changed
+
+        if not data.get("hasNext", False):
+            break
+        page += 1
+
+    if max_change is not None:
+        store.set_watermark(url, fkey, format_ts(max_change))
+
+    return {
+        "dataset": dataset,
+        "start": start,
+        "end": end,
+        "fetched": fetched,
+        "inserted": inserted,
+        "updated": updated,
+        "watermark": format_ts(max_change) if max_change else None,
+    }
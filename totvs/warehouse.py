@@ -0,0 +1,181 @@
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Mapping, Optional
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# =========================
+# ARMAZÉM LOCAL (PARQUET + DUCKDB)
+# =========================
+# Cada tabela achatada vira um dataset Parquet particionado no estilo Hive:
+#   warehouse/<tabela>/branch=<filial>/date=<AAAA-MM-DD>/part-0.parquet
+# e o catalog.duckdb expõe uma VIEW por tabela para consultar entre execuções.
+WAREHOUSE_DIR = "warehouse"
+CATALOG_FILE = "catalog.duckdb"
+
+# O DuckDB não aceita dois CREATE OR REPLACE VIEW simultâneos no mesmo
+# catálogo (write-write conflict): threads de filiais atualizam uma de cada vez
+_CATALOG_LOCK = threading.Lock()
+
+
+def _table_dir(table: str, root: str) -> str:
+    return os.path.join(root, table)
+
+
+def write_table(
+    df: pd.DataFrame,
+    table: str,
+    *,
+    branch_col: Optional[str] = None,
+    date_col: Optional[str] = None,
+    root: str = WAREHOUSE_DIR,
+) -> str:
+    """Grava `df` em warehouse/<table>/ e atualiza o catálogo DuckDB.
+
+    Com `branch_col`/`date_col` o dataset é particionado por filial/dia e só
+    as partições presentes em `df` são substituídas (re-extrair um período
+    não duplica linhas). Sem partições, a tabela inteira é substituída
+    (dimensões como pessoas e produtos).
+    """
+    path = _table_dir(table, root)
+    out = df.copy(deep=False)
+
+    partitions: List[str] = []
+    if branch_col:
+        out["branch"] = out[branch_col].astype("string").fillna("NA")
+        partitions.append("branch")
+    if date_col:
+        dates = pd.to_datetime(out[date_col], errors="coerce", utc=True)
+        out["date"] = dates.dt.strftime("%Y-%m-%d").fillna("NA")
+        partitions.append("date")
+
+    arrow_table = pa.Table.from_pandas(out, preserve_index=False)
+
+    if partitions:
+        ds.write_dataset(
+            arrow_table,
+            path,
+            format="parquet",
+            partitioning=partitions,
+            partitioning_flavor="hive",
+            existing_data_behavior="delete_matching",
+            basename_template="part-{i}.parquet",
+        )
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+        ds.write_dataset(
+            arrow_table,
+            path,
+            format="parquet",
+            basename_template="part-{i}.parquet",
+        )
+
+    refresh_catalog(root)
+    return path
+
+
+class BatchSink:
+    """Grava RecordBatches em Parquet à medida que chegam (sem montar DataFrame).
+
+    Cada tabela vai para warehouse/<tabela>/<k>=<v>/.../part-0.parquet, com as
+    partições fixas da execução (ex.: {"branch": 2, "period": "2025-10-30_2025-10-31"}).
+    O arquivo é escrito ao lado (.tmp) e só substitui a partição no close():
+    uma execução interrompida não apaga os dados anteriores. Thread-safe.
+
+        with BatchSink({"branch": 2}) as sink:
+            for page in paginas:
+                sink.write_page(tables.add_page(page["items"]))
+    """
+
+    def __init__(self, partition: Optional[Mapping[str, Any]] = None, root: str = WAREHOUSE_DIR):
+        self.partition = dict(partition or {})
+        self.root = root
+        self.rows: Dict[str, int] = {}
+        self._writers: Dict[str, pq.ParquetWriter] = {}
+        self._lock = threading.Lock()
+
+    def path(self, table: str) -> str:
+        parts = [f"{k}={v}" for k, v in self.partition.items()]
+        return os.path.join(_table_dir(table, self.root), *parts, "part-0.parquet")
+
+    def write(self, table: str, batch: pa.RecordBatch) -> None:
+        if batch.num_rows == 0:
+            return
+        with self._lock:
+            writer = self._writers.get(table)
+            if writer is None:
+                path = self.path(table)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(path + ".tmp", batch.schema)
+                self._writers[table] = writer
+            elif batch.schema != writer.schema:
+                # o schema vem do primeiro lote; fixe os dtypes no FieldMap
+                batch = batch.cast(writer.schema)
+            writer.write_batch(batch)
+            self.rows[table] = self.rows.get(table, 0) + batch.num_rows
+
+    def write_page(self, page: Mapping[str, pa.RecordBatch]) -> None:
+        for table, batch in page.items():
+            self.write(table, batch)
+
+    def close(self) -> None:
+        with self._lock:
+            writers, self._writers = self._writers, {}
+        for table, writer in writers.items():
+            writer.close()
+            os.replace(self.path(table) + ".tmp", self.path(table))
+        if writers:
+            refresh_catalog(self.root)
+
+    def abort(self) -> None:
+        """Descarta o que foi escrito (a partição anterior fica intacta)."""
+        with self._lock:
+            writers, self._writers = self._writers, {}
+        for table, writer in writers.items():
+            writer.close()
+            os.remove(self.path(table) + ".tmp")
+
+    def __enter__(self) -> "BatchSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def refresh_catalog(root: str = WAREHOUSE_DIR) -> str:
+    """(Re)cria no catalog.duckdb uma VIEW por tabela do armazém."""
+    os.makedirs(root, exist_ok=True)
+    catalog = os.path.join(root, CATALOG_FILE)
+
+    with _CATALOG_LOCK:
+        _create_views(catalog, root)
+    return catalog
+
+
+def _create_views(catalog: str, root: str) -> None:
+    con = duckdb.connect(catalog)
+    try:
+        for table in sorted(os.listdir(root)):
+            path = _table_dir(table, root)
+            if not os.path.isdir(path):
+                continue
+            glob = os.path.abspath(os.path.join(path, "**", "*.parquet")).replace("'", "''")
+            con.execute(
+                f'CREATE OR REPLACE VIEW "{table}" AS '
+                f"SELECT * FROM read_parquet('{glob}', hive_partitioning = true, union_by_name = true)"
+            )
+    finally:
+        con.close()
+
+
+def connect(root: str = WAREHOUSE_DIR, read_only: bool = True) -> duckdb.DuckDBPyConnection:
+    """Conexão com o catálogo, ex.: connect().sql('SELECT * FROM movimentos').df()"""
+    return duckdb.connect(os.path.join(root, CATALOG_FILE), read_only=read_only)
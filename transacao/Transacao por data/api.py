@@ -1,6 +1,5 @@
 import requests
 import pandas as pd
-import json
 from datetime import datetime, timezone
 import sys
 import os
@@ -8,6 +7,14 @@ import os
 # === IMPORTA TOKEN DE AUTH ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+
+# Sessão HTTP compartilhada (pool keep-alive)
+session = get_session()
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Transacao por data")
 
 # === CONFIGURAÇÕES DA API ===
 URL = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/general/v2/transactions"
@@ -28,7 +35,7 @@ print("🚀 Iniciando consulta detalhada da transação TOTVS...")
 print(f"📄 Parâmetros: {PARAMS}")
 
 # === REQUISIÇÃO ===
-response = requests.get(URL, headers=headers, params=PARAMS)
+response = session.get(URL, headers=headers, params=PARAMS)
 print(f"📡 Status HTTP: {response.status_code}")
 
 if response.status_code != 200:
@@ -43,17 +50,15 @@ except requests.exceptions.JSONDecodeError:
     sys.exit(1)
 
 # === DEBUG: SALVAR JSON CRU (opcional, útil para inspeção) ===
-debug_file = f"debug_transaction_{PARAMS['TransactionCode']}.json"
-with open(debug_file, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-print(f"💾 Resposta completa salva em: {debug_file}")
+debug.capture(data, tag="transaction")
 
 # === DEBUG: INSPEÇÃO DE CHAVES ===
-print("🔍 Estrutura principal da resposta:")
-for key, value in data.items():
-    tipo = type(value).__name__
-    tamanho = len(value) if isinstance(value, (list, dict)) else "-"
-    print(f"   - {key} ({tipo}) tamanho: {tamanho}")
+if debug.enabled:
+    print("🔍 Estrutura principal da resposta:")
+    for key, value in data.items():
+        tipo = type(value).__name__
+        tamanho = len(value) if isinstance(value, (list, dict)) else "-"
+        print(f"   - {key} ({tipo}) tamanho: {tamanho}")
 
 print("-" * 60)
 
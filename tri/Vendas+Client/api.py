@@ -1,12 +1,17 @@
 import os, sys
 import json
-import requests
 import pandas as pd
 from datetime import datetime
 
 # === IMPORTA TOKEN ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from auth.config import TOKEN
+from totvs.session import get_session
+from totvs.debug_capture import DebugCapture
+from totvs.frames import code_key, lookup
+
+# Captura de debug (liga com TOTVS_DEBUG=1)
+debug = DebugCapture("Vendas+Client")
 
 URL_SALES = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/branch-sale"
 URL_OPS   = "https://apitotvsmoda.bhan.com.br/api/totvsmoda/analytics/v2/operation-fiscal-movement/search"
@@ -25,14 +30,12 @@ def fetch_pages(
     base_json=None,
     page_size=500,
     items_key="items",
-    debug=False,
     debug_prefix="response"
 ):
     """Itera páginas e retorna (items, resumo_paginas). Suporta GET (params) e POST (json).
-       Se debug=True: salva JSON por página na raiz + mostra estrutura e amostra.
+       Com TOTVS_DEBUG=1: captura o JSON de cada página + mostra estrutura e amostra.
     """
-    s = requests.Session()
-    s.headers.update(headers)
+    s = get_session()
 
     items_all, pages = [], []
     page = 1
@@ -43,23 +46,19 @@ def fetch_pages(
 
         if method.upper() == "GET":
             params.update({"page": page, "pageSize": page_size})
-            r = s.get(url, params=params)
+            r = s.get(url, params=params, headers=headers)
         else:
             payload.update({"page": page, "pageSize": page_size})
-            r = s.post(url, json=payload)
+            r = s.post(url, json=payload, headers=headers)
 
         if r.status_code != 200:
             raise RuntimeError(f"HTTP {r.status_code} em {url}: {r.text[:500]}")
 
         data = r.json()
 
-        # === DEBUG: SALVAR JSON + MOSTRAR ESTRUTURA + AMOSTRA (NA RAIZ) ===
-        if debug:
-            debug_file = f"{debug_prefix}_page_{page}.json"
-            with open(debug_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-
-            print(f"\n💾 Resposta salva em: {debug_file}")
+        # === DEBUG: CAPTURA + ESTRUTURA + AMOSTRA (só com TOTVS_DEBUG=1) ===
+        debug.capture(data, tag=debug_prefix, page=page)
+        if debug.enabled:
             print("🔍 Estrutura da resposta:")
             for key, value in data.items():
                 tipo = type(value).__name__
@@ -95,9 +94,6 @@ def fetch_pages(
 
     return items_all, pages
 
-def norm_code(x: pd.Series) -> pd.Series:
-    return x.astype("string").str.strip()
-
 def main():
     # ===== 1) VENDAS =====
     sales_params = {
@@ -111,7 +107,7 @@ def main():
         headers=headers,
         base_params=sales_params,
         page_size=1000,
-        debug=True,                 # ✅ LIGA DEBUG
+        debug_prefix="sales",
     )
 
     df_sales = pd.DataFrame([{
@@ -142,23 +138,25 @@ def main():
         headers=headers,
         base_json=ops_payload,
         page_size=500,
-        debug=True,                 # ✅ LIGA DEBUG
+        debug_prefix="operations",
     )
 
     df_ops = pd.DataFrame([{
         "code": i.get("code"),
         "Nome Operação": i.get("name"),
         "Modelo": i.get("model"),
-    } for i in ops_items]).drop_duplicates(subset=["code"], keep="first")
+    } for i in ops_items])
 
     if df_ops.empty:
         raise SystemExit("⚠️ Sem operações para o período/filtro.")
 
     # ===== 3) JOIN =====
-    df_sales["operationCode"] = norm_code(df_sales["operationCode"])
-    df_ops["code"] = norm_code(df_ops["code"])
+    # chaves validadas uma vez (Int64; texto se houver código não numérico)
+    df_sales["operationCode"] = code_key(df_sales["operationCode"])
+    df_ops["code"] = code_key(df_ops["code"])
+    df_ops = df_ops.drop_duplicates(subset=["code"], keep="first")
 
-    df_join = df_sales.merge(df_ops, left_on="operationCode", right_on="code", how="left")
+    df_join = lookup(df_sales, "operationCode", df_ops, "code", keep_dim_key=True)
 
     # ===== 4) EXPORT =====
     date_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
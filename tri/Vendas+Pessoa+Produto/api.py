@@ -1,14 +1,23 @@
 import os
 import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
 import requests
 
-# === IMPORTA TOKEN ===
+# === IMPORTA SESSÃO (TOKEN + POOL KEEP-ALIVE) ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
-from auth.config import TOKEN  # noqa: E402
+from totvs.checkpoint import PageCheckpoint  # noqa: E402
+from totvs.dimensions import resolve_dimension, sync_dimensions  # noqa: E402
+from totvs.excel_stream import StreamingExcelWriter  # noqa: E402
+from totvs.frames import code_key, group_first_join, lookup  # noqa: E402
+from totvs.mapping import FieldMap  # noqa: E402
+from totvs.session import get_session  # noqa: E402
+from totvs.shards import Shard, plan_shards, run_shards  # noqa: E402
+from totvs.warehouse import CATALOG_FILE, WAREHOUSE_DIR, write_table  # noqa: E402
 
 # =========================
 # CONFIG
@@ -21,15 +30,31 @@ BRANCH_CODE_LIST = [5]
 START = "2025-12-01T00:00:00Z"
 END = "2025-12-16T23:59:59Z"
 PAGE_SIZE = 500
+# Páginas buscadas em paralelo após a página 1 (1 = sequencial)
+MAX_WORKERS = 4
+# Salva as páginas baixadas em .checkpoints/ para retomar após uma falha
+RESUME = True
+# Movimentos, pessoas e produtos buscados ao mesmo tempo (False = um após o outro)
+PARALLEL_FETCH = True
+# Movimentos em fatias filial × período (1 a 7 dias, conforme o totalItems de
+# cada filial), buscadas em paralelo; False = uma janela única START..END
+SHARD_WINDOW = True
+SHARD_WORKERS = 4
+SHARD_TARGET_ITEMS = 20 * PAGE_SIZE
+# Pessoas e produtos do cache local de cadastro (.sync/), atualizado só com o
+# que mudou; a primeira execução baixa o cadastro inteiro. Códigos dos
+# movimentos fora do cache são buscados no cadastro em lotes (lista de
+# códigos por requisição); se um lote falhar, vale a busca completa.
+USE_DIMENSION_CACHE = True
+
+# Destino: Parquet + DuckDB em warehouse/ (consultável entre execuções);
+# o Excel é só uma exportação opcional
+WRITE_WAREHOUSE = True
+EXPORT_EXCEL = True
 
 # Produtos: filtro opcional (se não quiser, coloque None)
 CLASSIFICATION_TYPE_CODE_LIST = [102]
 
-HEADERS = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json",
-}
-
 # =========================
 # ORDENAR LINHAS (REGISTROS)
 # =========================
@@ -89,12 +114,6 @@ COL_ORDER = [
 ]
 
 
-def make_session() -> requests.Session:
-    s = requests.Session()
-    s.headers.update(HEADERS)
-    return s
-
-
 def paginate_post(
     session: requests.Session,
     url: str,
@@ -102,9 +121,23 @@ def paginate_post(
     option_payload: Optional[Dict[str, Any]] = None,
     page_size: int = 100,
     timeout: int = 60,
+    max_workers: int = 1,
+    checkpoint: Optional[PageCheckpoint] = None,
 ) -> Iterable[Dict[str, Any]]:
-    page = 1
-    while True:
+    """Itera os itens de todas as páginas, sempre na ordem das páginas.
+
+    Com max_workers > 1 e `totalPages` informado na página 1, as páginas
+    2..N são buscadas em paralelo com no máximo `max_workers` requisições
+    em voo. Com `checkpoint`, cada página concluída fica salva em disco e
+    uma nova execução retoma da página que falhou.
+    """
+
+    def fetch_page(page: int) -> Dict[str, Any]:
+        if checkpoint is not None:
+            cached = checkpoint.load(page)
+            if cached is not None:
+                return cached
+
         payload: Dict[str, Any] = {
             "filter": filter_payload,
             "page": page,
@@ -115,60 +148,302 @@ def paginate_post(
 
         resp = session.post(url, json=payload, timeout=timeout)
         resp.raise_for_status()
-
         data = resp.json() or {}
-        items = data.get("items") or []
-        if not items:
-            break
 
-        for it in items:
-            yield it
+        if checkpoint is not None:
+            checkpoint.save(page, data)
+        return data
 
-        total_pages = data.get("totalPages")
-        has_next = bool(data.get("hasNext", False))
+    yield from walk_pages(fetch_page, max_workers)
+
+    # paginação completa: o checkpoint não é mais necessário
+    if checkpoint is not None:
+        checkpoint.clear()
+
+
+def walk_pages(
+    fetch_page: Callable[[int], Dict[str, Any]],
+    max_workers: int = 1,
+) -> Iterable[Dict[str, Any]]:
+    data = fetch_page(1)
+    items = data.get("items") or []
+    if not items:
+        return
+
+    yield from items
+
+    total_pages = data.get("totalPages")
+
+    # === MODO PARALELO: totalPages conhecido ===
+    if max_workers > 1 and total_pages is not None:
+        last_page = int(total_pages)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending: Deque[Future] = deque()
+        next_page = 2
+        try:
+            while next_page <= last_page and len(pending) < max_workers:
+                pending.append(executor.submit(fetch_page, next_page))
+                next_page += 1
+
+            while pending:
+                data = pending.popleft().result()
+                if next_page <= last_page:
+                    pending.append(executor.submit(fetch_page, next_page))
+                    next_page += 1
+
+                items = data.get("items") or []
+                if not items:
+                    break
+                yield from items
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return
 
+    # === MODO SEQUENCIAL ===
+    page = 1
+    while True:
         if total_pages is not None:
             if page >= int(total_pages):
                 break
         else:
-            if not has_next:
+            if not bool(data.get("hasNext", False)):
                 break
 
         page += 1
+        data = fetch_page(page)
+        items = data.get("items") or []
+        if not items:
+            break
+
+        yield from items
+
+        total_pages = data.get("totalPages")
+
+
+# =========================
+# MAPEAMENTO DAS COLUNAS
+# =========================
+MOVEMENTS_MAP = FieldMap({
+    "Codigo_Empresa": "branchCode",
+    "Codigo_pessoa": "personCode",
+    "Representante": "representativeCode",
+    "Data": "movementDate",
+    "Operacao": "operationCode",
+    "Tipo": "operationModel",
+    "Codigo_comprador": "buyerCode",
+    "Codigo_vendedor": "sellerCode",
+    "Valor_Bruto": "grossValue",
+    "Desconto": "discountValue",
+    "Valor_liquido": "netValue",
+    "SKU": "productCode",
+    "Estoque": "stockCode",
+    "QTD": "quantity",
+})
+
+# Uma linha por classificação da pessoa (pessoa sem classificação: 1 linha vazia)
+PEOPLE_MAP = FieldMap(
+    {
+        "Codigo": "code",
+        "CPF/CNPJ": "cpfCnpj",
+        "Nome": "name",
+        "TipoPessoa": "personType",
+        "Inativo": "isInactive",
+        "Nascimento": "individual.birthDate",
+        "EstadoCivil": "individual.maritalStatus",
+        "Genero": "individual.gender",
+        "Logradouro": "address.publicPlace",
+        "Endereco": "address.address",
+        "Numero": "address.addressNumber",
+        "Bairro": "address.neighborhood",
+        "Cidade": "address.cityName",
+        "UF": "address.stateAbbreviation",
+        "CEP": "address.cep",
+        "Pais": "address.countryName",
+    },
+    explode=(
+        "classifications",
+        {
+            "ClassificacaoTipo": "typeName",
+            "ClassificacaoCodigo": "code",
+            "ClassificacaoNome": "name",
+        },
+    ),
+)
+
+# Uma linha por classificação do produto (produto sem classificação: 1 linha vazia)
+PRODUCTS_MAP = FieldMap(
+    {
+        "CodigoProduto": "productCode",
+        "NomeProduto": "name",
+        "Referencia": "referenceCode",
+        "Codigo_Barra": "productSku",
+        "CodigoCor": "colorCode",
+        "NomeCor": "colorName",
+        "Tamanho": "sizeName",
+    },
+    explode=(
+        "classifications",
+        {
+            "Classificacao_Codigo": "code",
+            "Colecao": "description",
+        },
+    ),
+)
+
+
+# Mesmas colunas, lidas do cadastro (person/v2 e product/v2) guardado no cache.
+# Os campos usados são os mesmos da rota *-fiscal-movement (sizeName,
+# description, personType); o nome do cadastro só entra quando o registro
+# não traz o campo da rota de movimento.
+def cpf_cnpj(person: Dict[str, Any]) -> Any:
+    return person.get("cpf") or person.get("cnpj")
+
+
+def person_type(person: Dict[str, Any]) -> Any:
+    if person.get("personType") is not None:
+        return person["personType"]
+    return "J" if "cnpj" in person else "F"
+
+
+def size_name(product: Dict[str, Any]) -> Any:
+    return product["sizeName"] if product.get("sizeName") is not None else product.get("size")
+
+
+def classification_description(classification: Dict[str, Any]) -> Any:
+    if classification.get("description") is not None:
+        return classification["description"]
+    return classification.get("name")
+
+
+def product_classifications(product: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Classificações do produto (só os tipos de CLASSIFICATION_TYPE_CODE_LIST)."""
+    classifications = product.get("classifications") or []
+    if not CLASSIFICATION_TYPE_CODE_LIST:
+        return classifications
+    types = {str(t) for t in CLASSIFICATION_TYPE_CODE_LIST}
+    return [c for c in classifications if str(c.get("type")) in types]
+
+
+PEOPLE_CACHE_MAP = FieldMap(
+    {
+        "Codigo": "code",
+        "CPF/CNPJ": cpf_cnpj,
+        "Nome": "name",
+        "TipoPessoa": person_type,
+        "Inativo": "isInactive",
+        "Nascimento": "birthDate",
+        "EstadoCivil": "maritalStatus",
+        "Genero": "gender",
+        "Logradouro": "addresses.0.publicPlace",
+        "Endereco": "addresses.0.address",
+        "Numero": "addresses.0.addressNumber",
+        "Bairro": "addresses.0.neighborhood",
+        "Cidade": "addresses.0.cityName",
+        "UF": "addresses.0.stateAbbreviation",
+        "CEP": "addresses.0.cep",
+        "Pais": "addresses.0.countryName",
+    },
+    explode=(
+        "classifications",
+        {
+            "ClassificacaoTipo": "typeName",
+            "ClassificacaoCodigo": "code",
+            "ClassificacaoNome": "name",
+        },
+    ),
+)
+
+PRODUCTS_CACHE_MAP = FieldMap(
+    {
+        "CodigoProduto": "productCode",
+        "NomeProduto": "productName",
+        "Referencia": "referenceCode",
+        "Codigo_Barra": "productSku",
+        "CodigoCor": "colorCode",
+        "NomeCor": "colorName",
+        "Tamanho": size_name,
+    },
+    explode=(
+        product_classifications,
+        {
+            "Classificacao_Codigo": "code",
+            "Colecao": classification_description,
+        },
+    ),
+)
+
+
+def valid_product_code(pc: Any) -> bool:
+    """Descarta produto sem código ou com código 0."""
+    if pc is None:
+        return False
+    try:
+        return int(pc) != 0
+    except (TypeError, ValueError):
+        return False
 
 
 # =========================
 # MOVIMENTOS
 # =========================
-def fetch_movements(session: requests.Session) -> pd.DataFrame:
-    filt = {
-        "branchCodeList": BRANCH_CODE_LIST,
-        "startMovementDate": START,
-        "endMovementDate": END,
+def movement_filter(branches: List[int], start: str, end: str) -> Dict[str, Any]:
+    return {
+        "branchCodeList": branches,
+        "startMovementDate": start,
+        "endMovementDate": end,
     }
 
-    rows: List[Dict[str, Any]] = []
-    for item in paginate_post(session, URL_MOV, filt, page_size=PAGE_SIZE):
-        rows.append(
-            {
-                "Codigo_Empresa": item.get("branchCode"),
-                "Codigo_pessoa": item.get("personCode"),
-                "Representante": item.get("representativeCode"),
-                "Data": item.get("movementDate"),
-                "Operacao": item.get("operationCode"),
-                "Tipo": item.get("operationModel"),
-                "Codigo_comprador": item.get("buyerCode"),
-                "Codigo_vendedor": item.get("sellerCode"),
-                "Valor_Bruto": item.get("grossValue"),
-                "Desconto": item.get("discountValue"),
-                "Valor_liquido": item.get("netValue"),
-                "SKU": item.get("productCode"),
-                "Estoque": item.get("stockCode"),
-                "QTD": item.get("quantity"),
-            }
-        )
 
-    return pd.DataFrame(rows)
+def count_movements(session: requests.Session, shard: Shard) -> Optional[int]:
+    """totalItems da janela (uma página com pageSize=1); None se a consulta falhar."""
+    payload = {
+        "filter": movement_filter([shard.branch], shard.start_str, shard.end_str),
+        "page": 1,
+        "pageSize": 1,
+    }
+    try:
+        resp = session.post(URL_MOV, json=payload, timeout=60)
+        resp.raise_for_status()
+        total = (resp.json() or {}).get("totalItems")
+        return int(total) if total is not None else None
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Filial {shard.branch}: total não disponível ({e}); fatias de 1 dia.")
+        return None
+
+
+def fetch_movement_pages(
+    session: requests.Session, filt: Dict[str, Any], max_workers: int
+) -> Iterable[Dict[str, Any]]:
+    checkpoint = None
+    if RESUME:
+        checkpoint = PageCheckpoint("movimentos", {"url": URL_MOV, "filter": filt, "pageSize": PAGE_SIZE})
+    return paginate_post(
+        session, URL_MOV, filt, page_size=PAGE_SIZE, max_workers=max_workers, checkpoint=checkpoint
+    )
+
+
+def fetch_movements(session: requests.Session) -> pd.DataFrame:
+    if not SHARD_WINDOW:
+        filt = movement_filter(BRANCH_CODE_LIST, START, END)
+        return MOVEMENTS_MAP.to_frame(fetch_movement_pages(session, filt, MAX_WORKERS))
+
+    # fatias disjuntas (filial × período): não há item repetido entre elas
+    shards = plan_shards(
+        BRANCH_CODE_LIST,
+        START,
+        END,
+        count_items=lambda shard: count_movements(session, shard),
+        target_items=SHARD_TARGET_ITEMS,
+    )
+    print(f"🧩 Movimentos: {len(shards)} fatia(s), {SHARD_WORKERS} em paralelo")
+    items = run_shards(
+        shards,
+        lambda shard: fetch_movement_pages(
+            session, movement_filter([shard.branch], shard.start_str, shard.end_str), max_workers=1
+        ),
+        max_workers=SHARD_WORKERS,
+    )
+    return MOVEMENTS_MAP.to_frame(items)
 
 
 # =========================
@@ -181,53 +456,13 @@ def fetch_people_exploded(session: requests.Session) -> pd.DataFrame:
         "endMovementDate": END,
     }
 
-    rows: List[Dict[str, Any]] = []
-    for item in paginate_post(session, URL_PEO, filt, page_size=PAGE_SIZE):
-        addr = item.get("address") or {}
-        ind = item.get("individual") or {}
-        classifications = item.get("classifications") or []
-
-        base = {
-            "Codigo": item.get("code"),
-            "CPF/CNPJ": item.get("cpfCnpj"),
-            "Nome": item.get("name"),
-            "TipoPessoa": item.get("personType"),
-            "Inativo": item.get("isInactive"),
-            "Nascimento": ind.get("birthDate"),
-            "EstadoCivil": ind.get("maritalStatus"),
-            "Genero": ind.get("gender"),
-            "Logradouro": addr.get("publicPlace"),
-            "Endereco": addr.get("address"),
-            "Numero": addr.get("addressNumber"),
-            "Bairro": addr.get("neighborhood"),
-            "Cidade": addr.get("cityName"),
-            "UF": addr.get("stateAbbreviation"),
-            "CEP": addr.get("cep"),
-            "Pais": addr.get("countryName"),
-        }
-
-        if classifications:
-            for cls in classifications:
-                rows.append(
-                    {
-                        **base,
-                        "ClassificacaoTipo": cls.get("typeName"),
-                        "ClassificacaoCodigo": cls.get("code"),
-                        "ClassificacaoNome": cls.get("name"),
-                    }
-                )
-        
-        else:
-            rows.append(
-                {
-                    **base,
-                    "ClassificacaoTipo": None,
-                    "ClassificacaoCodigo": None,
-                    "ClassificacaoNome": None,
-                }
-            )
-
-    return pd.DataFrame(rows)
+    checkpoint = None
+    if RESUME:
+        checkpoint = PageCheckpoint("pessoas", {"url": URL_PEO, "filter": filt, "pageSize": PAGE_SIZE})
+    items = paginate_post(
+        session, URL_PEO, filt, page_size=PAGE_SIZE, max_workers=MAX_WORKERS, checkpoint=checkpoint
+    )
+    return PEOPLE_MAP.to_frame(items)
 
 
 def aggregate_people_for_join(df_people: pd.DataFrame) -> pd.DataFrame:
@@ -235,35 +470,30 @@ def aggregate_people_for_join(df_people: pd.DataFrame) -> pd.DataFrame:
         return df_people
 
     df = df_people.copy()
-    df["Codigo"] = df["Codigo"].astype("string").str.strip()
-
-    def join_unique(series: pd.Series) -> Optional[str]:
-        vals = [str(x).strip() for x in series.dropna().astype(str).tolist()]
-        vals = [v for v in vals if v]
-        return " | ".join(sorted(set(vals))) if vals else None
-
-    return (
-        df.groupby("Codigo", as_index=False)
-        .agg(
-            {
-                "CPF/CNPJ": "first",
-                "Nome": "first",
-                "TipoPessoa": "first",
-                "Inativo": "first",
-                "Nascimento": "first",
-                "EstadoCivil": "first",
-                "Genero": "first",
-                "Logradouro": "first",
-                "Endereco": "first",
-                "Numero": "first",
-                "Bairro": "first",
-                "Cidade": "first",
-                "UF": "first",
-                "CEP": "first",
-                "Pais": "first",
-  
-            }
-        )
+    df["Codigo"] = code_key(df["Codigo"])
+
+    # classificações ficam de fora do join (uma linha por pessoa)
+    return group_first_join(
+        df,
+        "Codigo",
+        first=[
+            "CPF/CNPJ",
+            "Nome",
+            "TipoPessoa",
+            "Inativo",
+            "Nascimento",
+            "EstadoCivil",
+            "Genero",
+            "Logradouro",
+            "Endereco",
+            "Numero",
+            "Bairro",
+            "Cidade",
+            "UF",
+            "CEP",
+            "Pais",
+        ],
+        joined=[],
     )
 
 
@@ -281,48 +511,20 @@ def fetch_products_exploded(session: requests.Session) -> pd.DataFrame:
     if CLASSIFICATION_TYPE_CODE_LIST:
         option = {"classificationTypeCodeList": CLASSIFICATION_TYPE_CODE_LIST}
 
-    rows: List[Dict[str, Any]] = []
-    for item in paginate_post(session, URL_PROD, filt, option_payload=option, page_size=PAGE_SIZE):
-        pc = item.get("productCode")
-        if pc is None:
-            continue
-        try:
-            if int(pc) == 0:
-                continue
-        except (TypeError, ValueError):
-            continue
-
-        classifications = item.get("classifications") or []
-        base = {
-            "CodigoProduto": item.get("productCode"),
-            "NomeProduto": item.get("name"),
-            "Referencia": item.get("referenceCode"),
-            "Codigo_Barra": item.get("productSku"),
-            "CodigoCor": item.get("colorCode"),
-            "NomeCor": item.get("colorName"),
-            "Tamanho": item.get("sizeName"),
-        }
-
-
-        if classifications:
-            for cls in classifications:
-                rows.append(
-                    {
-                        **base,
-                        "Classificacao_Codigo": cls.get("code"),
-                        "Colecao": cls.get("description"),
-                    }
-                )
-        else:
-            rows.append(
-                {
-                    **base,
-                    "Classificacao_Codigo": None,
-                    "Colecao": None,
-                }
-            )
-
-    return pd.DataFrame(rows)
+    checkpoint = None
+    if RESUME:
+        key = {"url": URL_PROD, "filter": filt, "option": option, "pageSize": PAGE_SIZE}
+        checkpoint = PageCheckpoint("produtos", key)
+    items = paginate_post(
+        session,
+        URL_PROD,
+        filt,
+        option_payload=option,
+        page_size=PAGE_SIZE,
+        max_workers=MAX_WORKERS,
+        checkpoint=checkpoint,
+    )
+    return PRODUCTS_MAP.to_frame(item for item in items if valid_product_code(item.get("productCode")))
 
 
 def aggregate_products_for_join(df_products: pd.DataFrame) -> pd.DataFrame:
@@ -330,30 +532,74 @@ def aggregate_products_for_join(df_products: pd.DataFrame) -> pd.DataFrame:
         return df_products
 
     df = df_products.copy()
-    df["CodigoProduto"] = df["CodigoProduto"].astype("string").str.strip()
-
-    def join_unique(series: pd.Series) -> Optional[str]:
-        vals = [str(x).strip() for x in series.dropna().astype(str).tolist()]
-        vals = [v for v in vals if v]
-        return " | ".join(sorted(set(vals))) if vals else None
-
-    return (
-        df.groupby("CodigoProduto", as_index=False)
-        .agg(
-            {
-                "NomeProduto": "first",
-                "Referencia": "first",
-                "Codigo_Barra": "first",
-                "CodigoCor": "first",
-                "NomeCor": "first",
-                "Tamanho": "first",
-                "Classificacao_Codigo": join_unique,
-                "Colecao": join_unique,
-            }
-        )
+    df["CodigoProduto"] = code_key(df["CodigoProduto"])
+
+    # classificações distintas do produto unidas por " | "
+    return group_first_join(
+        df,
+        "CodigoProduto",
+        first=["NomeProduto", "Referencia", "Codigo_Barra", "CodigoCor", "NomeCor", "Tamanho"],
+        joined=["Classificacao_Codigo", "Colecao"],
     )
 
 
+def fetch_people_dimension(session: requests.Session) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Pessoas explodidas + agregadas (roda na thread própria em main)."""
+    df_peo = fetch_people_exploded(session)
+    return df_peo, aggregate_people_for_join(df_peo)
+
+
+def fetch_products_dimension(session: requests.Session) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Produtos explodidos + agregados (roda na thread própria em main)."""
+    df_prod = fetch_products_exploded(session)
+    return df_prod, aggregate_products_for_join(df_prod)
+
+
+# =========================
+# DIMENSÕES VIA CACHE LOCAL
+# =========================
+def cache_synced(future: Future, name: str) -> bool:
+    """Espera a sincronização do cache; em caso de erro avisa e devolve False."""
+    try:
+        future.result()
+        return True
+    except Exception as e:
+        print(f"⚠️ Falha ao atualizar o cache de {name} ({e}); usando a busca completa.")
+        return False
+
+
+def people_dimension_from_cache(
+    session: requests.Session, person_codes: pd.Series
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Pessoas dos movimentos lidas do cache de cadastro."""
+    codes = code_key(person_codes).dropna().unique()
+    try:
+        items, missing = resolve_dimension(["pessoas_pf", "pessoas_pj"], codes, session=session)
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Falha ao buscar pessoas fora do cache ({e}); usando a busca completa.")
+        return fetch_people_dimension(session)
+    if missing:
+        print(f"⚠️ {len(missing)} código(s) de pessoa sem cadastro.")
+    df_peo = PEOPLE_CACHE_MAP.to_frame(items)
+    return df_peo, aggregate_people_for_join(df_peo)
+
+
+def products_dimension_from_cache(
+    session: requests.Session, skus: pd.Series
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Produtos dos movimentos lidos do cache de cadastro."""
+    codes = [c for c in code_key(skus).dropna().unique() if valid_product_code(c)]
+    try:
+        items, missing = resolve_dimension(["produtos"], codes, session=session)
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Falha ao buscar produtos fora do cache ({e}); usando a busca completa.")
+        return fetch_products_dimension(session)
+    if missing:
+        print(f"⚠️ {len(missing)} código(s) de produto sem cadastro.")
+    df_prod = PRODUCTS_CACHE_MAP.to_frame(items)
+    return df_prod, aggregate_products_for_join(df_prod)
+
+
 # =========================
 # EXPORT + UTIL
 # =========================
@@ -384,61 +630,69 @@ def sort_rows(df: pd.DataFrame) -> pd.DataFrame:
 def export_excel(df: pd.DataFrame, prefix: str) -> str:
     date_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     filename = f"{prefix}_{date_now}.xlsx"
-    with pd.ExcelWriter(filename, engine="xlsxwriter") as writer:
-        df.to_excel(writer, sheet_name="Dados", index=False)
+    # constant_memory: linha a linha, com nova aba ao passar de 1.048.576 linhas
+    with StreamingExcelWriter(filename) as xl:
+        xl.write_dataframe(df, "Dados")
     return filename
 
 
 def main():
-    session = make_session()
+    session = get_session()
+
+    # 1) Movimentos, pessoas e produtos: buscas independentes sobre o mesmo
+    #    filtro, em paralelo; as dimensões são agregadas na própria thread
+    #    enquanto os movimentos ainda paginam
+    #    (com o cache, as threads das dimensões só aplicam o delta do cadastro)
+    pool = ThreadPoolExecutor(max_workers=3 if PARALLEL_FETCH else 1, thread_name_prefix="tri")
+    try:
+        fut_mov = pool.submit(fetch_movements, session)
+        if USE_DIMENSION_CACHE:
+            fut_peo = pool.submit(sync_dimensions, ["pessoas_pf", "pessoas_pj"], session=session)
+            fut_prod = pool.submit(sync_dimensions, ["produtos"], session=session)
+        else:
+            fut_peo = pool.submit(fetch_people_dimension, session)
+            fut_prod = pool.submit(fetch_products_dimension, session)
+
+        df_mov = fut_mov.result()
+        if df_mov.empty:
+            print("⚠️ Nenhum movimento encontrado. Nada a exportar.")
+            return
+
+        if USE_DIMENSION_CACHE:
+            # 2) Pessoas (agregado)
+            if cache_synced(fut_peo, "pessoas"):
+                df_peo, df_peo_agg = people_dimension_from_cache(session, df_mov["Codigo_pessoa"])
+            else:
+                df_peo, df_peo_agg = fetch_people_dimension(session)
+            # 3) Produtos (agregado)
+            if cache_synced(fut_prod, "produtos"):
+                df_prod, df_prod_agg = products_dimension_from_cache(session, df_mov["SKU"])
+            else:
+                df_prod, df_prod_agg = fetch_products_dimension(session)
+        else:
+            # 2) Pessoas (agregado)
+            df_peo, df_peo_agg = fut_peo.result()
+            # 3) Produtos (agregado)
+            df_prod, df_prod_agg = fut_prod.result()
+    finally:
+        # sem movimentos (ou com erro): o que ainda não começou é cancelado
+        pool.shutdown(wait=True, cancel_futures=True)
 
-    # 1) Movimentos
-    df_mov = fetch_movements(session)
-    if df_mov.empty:
-        print("⚠️ Nenhum movimento encontrado. Nada a exportar.")
-        return
+    # Padroniza chaves (Int64; texto só se houver código não numérico)
+    df_mov["Codigo_pessoa"] = code_key(df_mov["Codigo_pessoa"])
+    df_mov["SKU"] = code_key(df_mov["SKU"])
 
-    # 2) Pessoas (agregado)
-    df_peo = fetch_people_exploded(session)
-    df_peo_agg = aggregate_people_for_join(df_peo)
-
-    # Padroniza chaves
-    df_mov["Codigo_pessoa"] = df_mov["Codigo_pessoa"].astype("string").str.strip()
-    df_mov["SKU"] = df_mov["SKU"].astype("string").str.strip()
-
-    # Join Movimentos + Pessoas
-    df_join_01 = (
-        df_mov.merge(
-            df_peo_agg,
-            how="left",
-            left_on="Codigo_pessoa",
-            right_on="Codigo",
-            suffixes=("", "_Pessoa"),
-        )
-        .drop(columns=["Codigo"], errors="ignore")
-    )
+    # Join Movimentos + Pessoas (lookup pela chave única da dimensão)
+    df_join_01 = lookup(df_mov, "Codigo_pessoa", df_peo_agg, "Codigo", suffix="_Pessoa")
 
     missing_people = int(df_join_01["CPF/CNPJ"].isna().sum()) if "CPF/CNPJ" in df_join_01.columns else 0
     print(f"📌 Movimentos: {len(df_mov)}")
     print(f"📌 Pessoas (linhas): {len(df_peo)} | agregadas: {len(df_peo_agg)}")
     print(f"✅ Join (mov + pessoas): {len(df_join_01)} | sem match pessoa: {missing_people}")
-
-    # 3) Produtos (agregado)
-    df_prod = fetch_products_exploded(session)
-    df_prod_agg = aggregate_products_for_join(df_prod)
     print(f"📌 Produtos (linhas): {len(df_prod)} | agregados: {len(df_prod_agg)}")
 
     # 4) JOIN FINAL: Movimentos (SKU) + Produtos (CodigoProduto)
-    df_final = (
-        df_join_01.merge(
-            df_prod_agg,
-            how="left",
-            left_on="SKU",
-            right_on="CodigoProduto",
-            suffixes=("", "_Produto"),
-        )
-        .drop(columns=["CodigoProduto"], errors="ignore")
-    )
+    df_final = lookup(df_join_01, "SKU", df_prod_agg, "CodigoProduto", suffix="_Produto")
 
     missing_prod = int(df_final["NomeProduto"].isna().sum()) if "NomeProduto" in df_final.columns else 0
     print(f"✅ Join final (inclui produto): {len(df_final)} | sem match produto: {missing_prod}")
@@ -447,9 +701,20 @@ def main():
     df_final = sort_rows(df_final)
     df_final = apply_column_order(df_final, COL_ORDER)
 
-    # 6) Exportar
-    out = export_excel(df_final, prefix="movimentos_pessoas_produtos")
-    print(f"✅ Excel gerado: {out}")
+    # 6) Armazém local (Parquet por filial/dia + catálogo DuckDB)
+    if WRITE_WAREHOUSE:
+        write_table(df_mov, "movimentos", branch_col="Codigo_Empresa", date_col="Data")
+        write_table(df_peo_agg, "pessoas")
+        write_table(df_prod_agg, "produtos")
+        path = write_table(
+            df_final, "movimentos_pessoas_produtos", branch_col="Codigo_Empresa", date_col="Data"
+        )
+        print(f"✅ Parquet atualizado: {path} (catálogo: {os.path.join(WAREHOUSE_DIR, CATALOG_FILE)})")
+
+    # 7) Exportar (opcional)
+    if EXPORT_EXCEL:
+        out = export_excel(df_final, prefix="movimentos_pessoas_produtos")
+        print(f"✅ Excel gerado: {out}")
 
 
 if __name__ == "__main__":